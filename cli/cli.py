@@ -1,7 +1,10 @@
+import sqlite3
 import sys
 import argparse, argcomplete
 from logger import Logger
-from cli.parser import SetupSchemasParser, ScrapeParser, ShowParser, AviationStackParser
+from cli.parser import SetupSchemasParser, ScrapeParser, EnqueueParser, ScrapeWorkerParser, IngestParser, ShowParser, \
+    ReparseParser, RefreshSummaryParser, SnapshotParser, ClimateParser, CheckIndexesParser, \
+    BenchmarkBulkLoadParser, AviationStackParser
 from pymysql.err import OperationalError
 
 UNKNOWN_DATABASE = 1049
@@ -15,7 +18,13 @@ class CommandLineInterface:
         self._parser = argparse.ArgumentParser(description="This CLI controls the Nomad List Scrapper", prog="nls",
                                                epilog=epilog,
                                                allow_abbrev=False)
-        self._parsers = {'setup-db': SetupSchemasParser(), 'scrape': ScrapeParser(), 'show': ShowParser(),
+        self._parsers = {'setup-db': SetupSchemasParser(), 'scrape': ScrapeParser(), 'enqueue': EnqueueParser(),
+                         'scrape-worker': ScrapeWorkerParser(), 'ingest': IngestParser(), 'reparse': ReparseParser(),
+                         'show': ShowParser(),
+                         'refresh-summary': RefreshSummaryParser(), 'snapshot': SnapshotParser(),
+                         'climate': ClimateParser(),
+                         'check-indexes': CheckIndexesParser(),
+                         'benchmark-bulk-load': BenchmarkBulkLoadParser(),
                          'aviation-stack': AviationStackParser()}
         self._sub_parser = self._parser.add_subparsers(dest="command")
         self._add_parsers()
@@ -53,6 +62,13 @@ class CommandLineInterface:
 
             logger.error(f"MySQL Operational Exception raised: {e}", exc_info=verbose)
             sys.exit(1)
+        except sqlite3.OperationalError as e:
+            if str(e).startswith('no such table'):
+                logger.error(f"You should run the setup-db command before start scraping the cities.", exc_info=verbose)
+                sys.exit(1)
+
+            logger.error(f"SQLite Operational Exception raised: {e}", exc_info=verbose)
+            sys.exit(1)
         except Exception as e:
             logger.error(f"Exception raised: {e}", exc_info=verbose)
             sys.exit(1)
@@ -1,13 +1,123 @@
+import sys
 import json
 import csv
+import textwrap
+from datetime import datetime
+import conf as cfg
 from tabulate import tabulate
-from db.mysql_connector import MySQLConnector
+from db.storages import get_storage, get_storage_class
+from db.bulk_load_benchmark import BulkLoadBenchmark
+from db.query_cache import QueryCache
+from db.snapshot import CitySnapshot
+from db.climate import ClimateMatrix, parse_condition, parse_months
 from scrapper.nomad_list_scrapper import NomadListScrapper
 from apis.aviation_stack import AviationStackAPI
 
 OPTIONAL_KWARGS = ['type', 'action', 'choices', 'default']
 VERBOSE_PARAM = {'name': 'verbose,v', 'positional': False, 'action': 'store_true', 'help': 'Enable verbosity.'}
 
+# Params to discover the cities of the home page.
+DISCOVERY_PARAMS = [
+    {
+        'name': 'num-of-cities,n',
+        'positional': False,
+        'type': int,
+        'help': 'Number of required cities.'
+    },
+    {
+        'name': 'scrolls,s',
+        'positional': False,
+        'type': int,
+        'help': 'Number of scrolls to make in the site to fetch the cities cities.'
+    },
+    {
+        'name': 'discovery',
+        'positional': False,
+        'type': str.lower,
+        'choices': ['selenium', 'http'],
+        'help': 'How to discover the cities of the home page. http requests the listing pages without a '
+                'browser, and falls back to selenium. Default: NOMAD_LIST_DISCOVERY or selenium.'
+    }
+]
+
+# Params to fetch, parse and store the cities.
+SCRAPE_PARAMS = [
+    {
+        'name': 'fetch-backend',
+        'positional': False,
+        'type': str.lower,
+        'choices': ['grequests', 'asyncio'],
+        'help': 'Backend used to fetch the city details pages. Default: NOMAD_LIST_FETCH_BACKEND or grequests.'
+    },
+    {
+        'name': 'http-cache',
+        'positional': False,
+        'type': str.lower,
+        'choices': ['off', 'revalidate', 'prefer-cache'],
+        'help': 'Disk cache of the city details pages. revalidate: serve the pages within the TTL and send '
+                'conditional requests for the rest. prefer-cache: serve every cached page without requests. '
+                'Default: NOMAD_LIST_HTTP_CACHE or off.'
+    },
+    {
+        'name': 'incremental',
+        'positional': False,
+        'action': 'store_true',
+        'help': 'Skip the cities whose page did not change since the last run, and rewrite only the changed tabs.'
+    },
+    {
+        'name': 'pipeline',
+        'positional': False,
+        'action': 'store_true',
+        'help': 'Fetch, parse and store the cities in concurrent stages.'
+    },
+    {
+        'name': 'fetchers',
+        'positional': False,
+        'type': int,
+        'help': 'Number of concurrent requests of the pipeline fetch stage.'
+    },
+    {
+        'name': 'parsers',
+        'positional': False,
+        'type': int,
+        'help': 'Number of processes of the pipeline parse stage. Default: number of CPUs.'
+    },
+    {
+        'name': 'writers',
+        'positional': False,
+        'type': int,
+        'help': 'Number of database writer threads. Each one writes with its own connection of the pool.'
+    },
+    {
+        'name': 'write-batch-size',
+        'positional': False,
+        'type': int,
+        'help': 'Number of cities written in each database transaction. '
+                'Default: NOMAD_LIST_MYSQL_WRITE_BATCH_SIZE or 10 (NOMAD_LIST_MYSQL_BULK_LOAD_BATCH_SIZE or 200 '
+                'with --bulk-load).'
+    },
+    {
+        'name': 'save-details',
+        'positional': False,
+        'action': 'store_true',
+        'help': 'Append the parsed details of the cities to a compressed JSONL file, to ingest them again later. '
+                'Default file: NOMAD_LIST_DETAILS_FILE or files/details.jsonl.gz.'
+    },
+    {
+        'name': 'archive-pages',
+        'positional': False,
+        'action': 'store_true',
+        'help': 'Keep the fetched city pages in the page archive, to parse them again offline with reparse.'
+    },
+    {
+        'name': 'bulk-load',
+        'positional': False,
+        'action': 'store_true',
+        'help': 'Write the attributes, weathers, photos and reviews of the cities with LOAD DATA LOCAL INFILE. '
+                'The MySQL server must allow it (local_infile=ON).'
+    }
+]
+
 
 class Parser:
     """Abstract class for the parsers who knows how to handle the different CLI commands."""
@@ -44,7 +154,7 @@ class Parser:
 
 
 class SetupSchemasParser(Parser):
-    """Parser that knows how to set up the MySQL schemas."""
+    """Parser that knows how to set up the schemas of the storage backend."""
 
     def __init__(self):
         params = [{
@@ -54,10 +164,11 @@ class SetupSchemasParser(Parser):
             'help': 'Force the database creation dropping all the existing schemas, and creating them all again. Use it carefully.'
         }]
         super().__init__(params=params,
-                         help_message='Create the necessary schemas to store the scrape data into a MySQL database.')
+                         help_message='Create the necessary schemas to store the scrape data into the database '
+                                      '(NOMAD_LIST_STORAGE: mysql or sqlite).')
 
     def parse(self, *args, **kwargs):
-        MySQLConnector.create_database(*args, **kwargs)
+        get_storage_class().create_database(*args, **kwargs)
 
 
 class ScrapeParser(Parser):
@@ -65,23 +176,104 @@ class ScrapeParser(Parser):
 
     def __init__(self):
         params = [
+            *DISCOVERY_PARAMS,
             {
-                'name': 'num-of-cities,n',
+                'name': 'resume',
                 'positional': False,
                 'type': int,
-                'help': 'Number of required cities.'
+                'help': 'Id of an interrupted run. Only its unfinished cities are scrapped again.'
             },
+            *SCRAPE_PARAMS
+        ]
+        super().__init__(params=params, help_message='Scrap specific cities from the Nomad List site.')
+
+    def parse(self, *args, **kwargs):
+        NomadListScrapper(verbose=kwargs.get('verbose')).scrap_cities(*args, **kwargs)
+
+
+class EnqueueParser(Parser):
+    """Parser that knows how to discover the cities, and put them in the work queue of the scrape workers."""
+
+    def __init__(self):
+        super().__init__(params=DISCOVERY_PARAMS,
+                         help_message='Discover the cities, and put them in the work queue of the scrape workers.')
+
+    def parse(self, *args, **kwargs):
+        NomadListScrapper(verbose=kwargs.get('verbose')).enqueue_cities(*args, **kwargs)
+
+
+class ScrapeWorkerParser(Parser):
+    """Parser that knows how to run a worker that scraps the cities of the work queue."""
+
+    def __init__(self):
+        params = [
             {
-                'name': 'scrolls,s',
+                'name': 'batch-size,b',
                 'positional': False,
                 'type': int,
-                'help': 'Number of scrolls to make in the site to fetch the cities cities.'
-            }
+                'help': 'Number of cities leased at once from the work queue.'
+            },
+            # The workers would write their gzip members in the same details file at the same time, so they don't
+            # save the details.
+            *[param for param in SCRAPE_PARAMS if param['name'] != 'save-details']
         ]
-        super().__init__(params=params, help_message='Scrap specific cities from the Nomad List site.')
+        super().__init__(params=params, help_message='Lease cities from the work queue, and scrap them.')
 
     def parse(self, *args, **kwargs):
-        NomadListScrapper(verbose=kwargs.get('verbose')).scrap_cities(*args, **kwargs)
+        NomadListScrapper(verbose=kwargs.get('verbose')).work(*args, **kwargs)
+
+
+class IngestParser(Parser):
+    """Parser that knows how to store again the cities of a details file, without scraping the site."""
+
+    def __init__(self):
+        params = [
+            {
+                'name': 'file,f',
+                'positional': False,
+                'type': str,
+                'help': 'Details file saved with --save-details. Default: NOMAD_LIST_DETAILS_FILE or '
+                        'files/details.jsonl.gz.'
+            },
+            {
+                'name': 'decoders',
+                'positional': False,
+                'type': int,
+                'help': 'Number of processes that decode the lines of the file. Default: number of CPUs.'
+            },
+            *[param for param in SCRAPE_PARAMS if param['name'] in ['writers', 'write-batch-size', 'bulk-load']]
+        ]
+        super().__init__(params=params, help_message='Store the cities of a details file in the database.')
+
+    def parse(self, *args, **kwargs):
+        NomadListScrapper(verbose=kwargs.get('verbose')).ingest(*args, **kwargs)
+
+
+class ReparseParser(Parser):
+    """Parser that knows how to run the city scrapper over the archived pages, without touching the site."""
+
+    def __init__(self):
+        params = [
+            {
+                'name': 'at',
+                'positional': False,
+                'type': datetime.fromisoformat,
+                'help': 'Date and time of the snapshot (eg: 2021-08-01T12:00). It has the last version of each page '
+                        'fetched until then. Default: now.'
+            },
+            {
+                'name': 'store',
+                'positional': False,
+                'action': 'store_true',
+                'help': 'Store the parsed cities in the database.'
+            },
+            *[param for param in SCRAPE_PARAMS
+              if param['name'] in ['parsers', 'writers', 'write-batch-size', 'bulk-load']]
+        ]
+        super().__init__(params=params, help_message='Parse the archived city pages again, fully offline.')
+
+    def parse(self, *args, **kwargs):
+        NomadListScrapper(verbose=kwargs.get('verbose')).reparse(*args, **kwargs)
 
 
 class ShowParser(Parser):
@@ -120,6 +312,12 @@ class ShowParser(Parser):
                 'type': int,
                 'help': 'To rank <rank-to>.'
             },
+            {
+                'name': 'after',
+                'positional': False,
+                'type': int,
+                'help': 'Id of the last city of the previous page. Shows the cities that come after it.'
+            },
             {
                 'name': 'sorted-by',
                 'positional': False,
@@ -141,35 +339,210 @@ class ShowParser(Parser):
                 'name': 'output,o',
                 'positional': False,
                 'type': str.lower,
-                'choices': ['table', 'json', 'csv'],
+                'choices': ['table', 'json', 'csv', 'ndjson'],
                 'default': 'table',
-                'help': 'Output format. Default: table.'
+                'help': 'Output format. Default: table. json, csv and ndjson (one json per line) are written while the '
+                        'cities are read.'
+            },
+            {
+                'name': 'no-cache',
+                'positional': False,
+                'action': 'store_true',
+                'help': 'Query the database without reading or writing the cached results.'
+            },
+            {
+                'name': 'from-snapshot',
+                'positional': False,
+                'action': 'store_true',
+                'help': 'Query the snapshot written by the snapshot command, without the database.'
+            },
+            {
+                'name': 'where,w',
+                'positional': False,
+                'type': str,
+                'action': 'append',
+                'help': 'Condition TAB:ATTRIBUTE:MIN:MAX on a value of the Scores or Cost of Living tabs, without a '
+                        'bound to leave it open (eg: cost_of_living:Nomad cost::2500, scores:Internet:0.6:). Can be '
+                        'repeated, and every condition must hold. Only with --from-snapshot.'
             },
         ]
-        self._headers = ['Rank', 'City', 'Country', 'Continent', '⭐ Overall Score', '💵 Cost', '📡 Internet', '😀 Fun',
+        self._headers = ['Id', 'Rank', 'City', 'Country', 'Continent', '⭐ Overall Score', '💵 Cost', '📡 Internet', '😀 Fun',
                          '👮 Safety']
         super().__init__(params=params, help_message='Fetch and show stored cities that match the filters.')
 
     def parse(self, *args, **kwargs):
-        presenters = {'table': self._to_table, 'json': self._to_json, 'csv': self._to_csv}
+        presenters = {'table': self._to_table, 'json': self._to_json, 'csv': self._to_csv, 'ndjson': self._to_ndjson}
+
+        if kwargs.get('where') and not kwargs.get('from_snapshot'):
+            raise ValueError("The --where conditions are only evaluated on the snapshot. Use --from-snapshot.")
+
+        output = kwargs.get('output')
+        presenter = presenters.get(output, presenters['table'])
 
-        with MySQLConnector(verbose=kwargs.get('verbose')) as mysql_connector:
-            results = mysql_connector.filter_cities_by(*args, **kwargs)
+        # The rows are written while they are read from the database, or from the snapshot.
+        with self._get_source(**kwargs) as source:
+            results = source.filter_cities_by(*args, **kwargs)
 
-        presenter = presenters.get(kwargs.get('output'), presenters['table'])
-        print('\n\n' + presenter(results), end='\n\n')
+            if output != 'ndjson':
+                sys.stdout.write('\n\n')
+            for chunk in presenter(results):
+                sys.stdout.write(chunk)
+            if output != 'ndjson':
+                sys.stdout.write('\n\n')
+
+    @staticmethod
+    def _get_source(from_snapshot=False, no_cache=False, verbose=False, **kwargs):
+        """Returns the snapshot of the cities, or the storage with the query cache if it's enabled."""
+        if from_snapshot:
+            return CitySnapshot(verbose=verbose)
+
+        query_cache = None
+        if cfg.QUERY_CACHE['mode'] != 'off' and not no_cache:
+            query_cache = QueryCache(verbose=verbose)
+
+        return get_storage(query_cache=query_cache, verbose=verbose)
+
+    def _to_dicts(self, results):
+        keys = [header.split(" ", 1)[-1] for header in self._headers]
+        return (dict(zip(keys, row)) for row in results)
 
     def _to_table(self, results):
-        return tabulate(results, headers=self._headers)
+        # The width of the columns depends on every row, so the table is the only output built in memory.
+        yield tabulate(list(results), headers=self._headers)
 
     def _to_json(self, results):
-        results_list = [{self._headers[i].split(" ", 1)[-1]: value for i, value in enumerate(row)} for row in results]
-        return json.dumps(results_list, indent=4)
+        separator = '[\n'
+        for city in self._to_dicts(results):
+            yield separator + textwrap.indent(json.dumps(city, indent=4), '    ')
+            separator = ',\n'
+
+        yield '[]' if separator == '[\n' else '\n]'
 
     def _to_csv(self, results):
-        headers = ','.join(self._headers)
-        rows = [','.join(map(str, row)) for row in results]
-        return '\n'.join([headers] + rows)
+        yield ','.join(self._headers)
+        for row in results:
+            yield '\n' + ','.join(map(str, row))
+
+    def _to_ndjson(self, results):
+        for city in self._to_dicts(results):
+            yield json.dumps(city) + '\n'
+
+
+class RefreshSummaryParser(Parser):
+    """Parser that knows how to rebuild the summary of the scores of the cities, used by the show command."""
+
+    def __init__(self):
+        super().__init__(params=[], help_message='Rebuild the summary of the scores of the cities used by show.')
+
+    def parse(self, *args, **kwargs):
+        with get_storage(verbose=kwargs.get('verbose')) as storage:
+            storage.refresh_city_scores()
+
+
+class SnapshotParser(Parser):
+    """Parser that knows how to export the stored cities to the columnar snapshot read by show --from-snapshot."""
+
+    def __init__(self):
+        super().__init__(params=[], help_message='Export the stored cities to a columnar snapshot, to show them '
+                                                 'without the database.')
+
+    def parse(self, *args, **kwargs):
+        with get_storage(verbose=kwargs.get('verbose')) as storage:
+            CitySnapshot(verbose=kwargs.get('verbose')).export(storage)
+
+
+class ClimateParser(Parser):
+    """Parser that knows how to find the cities whose monthly weather matches some conditions.
+    Then, it shows them sorted by rank, with the mean of each attribute of the conditions in the given months."""
+
+    def __init__(self):
+        params = [
+            {
+                'name': 'where,w',
+                'positional': False,
+                'type': str,
+                'action': 'append',
+                'help': 'Condition ATTRIBUTE:MIN:MAX on the monthly values of the weather, without a bound to leave it '
+                        'open (eg: Real:20:28, Humidity::60). Can be repeated, and every condition must hold.'
+            },
+            {
+                'name': 'months,m',
+                'positional': False,
+                'type': str,
+                'help': 'Numbers of the months separated by commas (eg: 3,4). The conditions must hold in each of '
+                        'them. Default: all the months.'
+            },
+            {
+                'name': 'num-of-cities,n',
+                'positional': False,
+                'type': int,
+                'help': 'Number of required cities.'
+            },
+            {
+                'name': 'output,o',
+                'positional': False,
+                'type': str.lower,
+                'choices': ['table', 'json', 'csv'],
+                'default': 'table',
+                'help': 'Output format. Default: table.'
+            },
+        ]
+        super().__init__(params=params, help_message='Find the cities whose monthly weather matches the conditions.')
+
+    def parse(self, *args, **kwargs):
+        conditions = [parse_condition(condition) for condition in kwargs.get('where') or []]
+        months = parse_months(kwargs['months']) if kwargs.get('months') else None
+
+        with get_storage(verbose=kwargs.get('verbose')) as storage:
+            climate = ClimateMatrix.from_storage(storage, conditions, months, verbose=kwargs.get('verbose'))
+
+        headers = ['Rank', 'City', 'Country', *[climate.attribute_name(attribute) for attribute, __, __ in conditions]]
+        results = list(climate.filter_cities_by(conditions, months, kwargs.get('num_of_cities')))
+
+        if kwargs.get('output') == 'json':
+            print(json.dumps([dict(zip(headers, row)) for row in results], indent=4))
+        elif kwargs.get('output') == 'csv':
+            writer = csv.writer(sys.stdout)
+            writer.writerow(headers)
+            writer.writerows(results)
+        else:
+            print(f"\n\n{tabulate(results, headers=headers)}\n\n")
+
+
+class CheckIndexesParser(Parser):
+    """Parser that knows how to check that the queries of the scrapper use the indexes of the migrations."""
+
+    def __init__(self):
+        super().__init__(params=[], help_message='Explain the main queries, and check that they use their indexes.')
+
+    def parse(self, *args, **kwargs):
+        with get_storage(verbose=kwargs.get('verbose')) as storage:
+            results = storage.check_indexes()
+
+        print(tabulate(results, headers='keys'))
+
+
+class BenchmarkBulkLoadParser(Parser):
+    """Parser that knows how to measure the bulk load of MySQL against the batch queries."""
+
+    def __init__(self):
+        params = [
+            {
+                'name': 'rows,r',
+                'positional': False,
+                'type': int,
+                'default': 100000,
+                'help': 'Number of rows written with each path. Default: 100000.'
+            }
+        ]
+        super().__init__(params=params, help_message='Write the same synthetic rows with the batch queries and with '
+                                                     'the bulk load, and show the rows per second of each one. '
+                                                     'The writes are rolled back.')
+
+    def parse(self, *args, **kwargs):
+        results = BulkLoadBenchmark(kwargs.get('rows'), verbose=kwargs.get('verbose')).run()
+
+        print(tabulate(results, headers='keys'))
 
 
 class AviationStackParser(Parser):
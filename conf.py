@@ -6,18 +6,38 @@ from dotenv import load_dotenv
 load_dotenv()
 
 NOMAD_LIST_URL = "https://nomadlist.com"
-NOMAD_LIST_SCROLL_PAUSE_TIME = 2
+NOMAD_LIST_LISTING_URL = os.getenv('NOMAD_LIST_LISTING_URL') or NOMAD_LIST_URL + "/?page={page}"
+NOMAD_LIST_DISCOVERY = os.getenv('NOMAD_LIST_DISCOVERY') or 'selenium'
+NOMAD_LIST_SCROLL_TIMEOUT = 10
+NOMAD_LIST_SCROLL_POLL = 0.2
 NOMAD_LIST_DELAY_AFTER_REQUEST = 2
 NOMAD_LIST_REQUESTS_BATCH_SIZE = 20
+NOMAD_LIST_FETCH_BACKEND = os.getenv('NOMAD_LIST_FETCH_BACKEND') or 'grequests'
+NOMAD_LIST_CONNECTIONS_PER_HOST = 10
+NOMAD_LIST_REQUEST_TIMEOUT = 30
+NOMAD_LIST_PIPELINE_QUEUE_SIZE = 50
+NOMAD_LIST_PIPELINE_WRITERS = 1
+# Pages that each parse thread keeps submitted to the parser processes.
+NOMAD_LIST_PIPELINE_PARSES_IN_FLIGHT = 2
+NOMAD_LIST_PIPELINE_REPORT_INTERVAL = 10
+RUN_JOURNAL_BATCH_SIZE = 50
+NOMAD_LIST_HTML_PARSER = os.getenv('NOMAD_LIST_HTML_PARSER') or 'lxml'
+NOMAD_LIST_RESTRICTED_PARSE = os.getenv('NOMAD_LIST_RESTRICTED_PARSE', 'true').lower() != 'false'
 
 CHROME_DRIVER_PATH = os.getenv('NOMAD_LIST_CHROME_DRIVER_PATH')
 
 LOG_FILE = "files/logs.log"
 LOG_FORMAT = '%(asctime)s-%(levelname)s-FILE:%(filename)s-FUNC:%(funcName)s-LINE:%(lineno)d-%(message)s'
 
-JSON_FILENAME = "files/data.json"
+# Compressed JSONL file with the parsed details of the cities, written with --save-details and read by ingest.
+JSON_FILENAME = os.getenv('NOMAD_LIST_DETAILS_FILE') or "files/details.jsonl.gz"
+# Lines of the details file decoded at once by each ingest decoder.
+INGEST_CHUNK_SIZE = 100
 LOGGER_LEVEL = "INFO"
-PAGE_SOURCE = "files/page_source.html"
+# Pack-file archive of the fetched pages: the home page, if LOAD_HTML_FROM_DISK, and the city pages with --archive-pages.
+PAGE_ARCHIVE = {
+    'directory': os.getenv('NOMAD_LIST_PAGE_ARCHIVE_DIRECTORY') or 'files/page_archive'
+}
 LOAD_HTML_FROM_DISK = False
 SCROLL = True
 HEADERS = {
@@ -32,6 +52,52 @@ MYSQL = {
     'database': os.getenv('NOMAD_LIST_MYSQL_DATABASE') or 'nomad_list'
 }
 
+# Number of cities written in each transaction.
+MYSQL_WRITE_BATCH_SIZE = int(os.getenv('NOMAD_LIST_MYSQL_WRITE_BATCH_SIZE') or 10)
+# Max number of ids in each identity cache of the MySQLConnector. None means unbounded.
+MYSQL_IDENTITY_CACHE_SIZE = int(os.getenv('NOMAD_LIST_MYSQL_IDENTITY_CACHE_SIZE') or 0) or None
+# Attempts to write a batch of cities if the connection is lost, or if there is a deadlock between the writers.
+MYSQL_WRITE_ATTEMPTS = 3
+# Number of cities written in each transaction of the bulk load mode, whose cost is paid once per table and batch.
+MYSQL_BULK_LOAD_BATCH_SIZE = int(os.getenv('NOMAD_LIST_MYSQL_BULK_LOAD_BATCH_SIZE') or 200)
+# Forward-only migrations of the schema, applied in the order of their version (the number of the file name).
+MYSQL_MIGRATIONS_DIR = "db/migrations"
+
+# Database of the scrapped cities: mysql, or sqlite to run the whole pipeline on one machine without services.
+STORAGE_BACKEND = os.getenv('NOMAD_LIST_STORAGE') or 'mysql'
+SQLITE = {
+    'path': os.getenv('NOMAD_LIST_SQLITE_PATH') or 'files/nomad_list.db',
+    # Seconds a writer waits for the lock of another one before failing.
+    'busy_timeout': 30
+}
+
+HTTP_CACHE = {
+    'mode': os.getenv('NOMAD_LIST_HTTP_CACHE') or 'off',
+    'directory': os.getenv('NOMAD_LIST_HTTP_CACHE_DIRECTORY') or 'files/http_cache',
+    'ttl': int(os.getenv('NOMAD_LIST_HTTP_CACHE_TTL') or 24 * 60 * 60),
+    'max_size': int(os.getenv('NOMAD_LIST_HTTP_CACHE_MAX_SIZE') or 1024 ** 3)
+}
+
+# Results of the show command, reused until the scrapper writes new data.
+QUERY_CACHE = {
+    'mode': os.getenv('NOMAD_LIST_QUERY_CACHE') or 'on',
+    'directory': os.getenv('NOMAD_LIST_QUERY_CACHE_DIRECTORY') or 'files/query_cache',
+    # Results with more rows are streamed without caching them.
+    'max_rows': int(os.getenv('NOMAD_LIST_QUERY_CACHE_MAX_ROWS') or 10000)
+}
+
+# Columnar snapshot of the stored cities, written by the snapshot command and read by show --from-snapshot.
+SNAPSHOT = {
+    'directory': os.getenv('NOMAD_LIST_SNAPSHOT_DIRECTORY') or 'files/snapshot'
+}
+
+WORK_QUEUE = {
+    'batch_size': int(os.getenv('NOMAD_LIST_WORK_QUEUE_BATCH_SIZE') or 20),
+    'lease_seconds': int(os.getenv('NOMAD_LIST_WORK_QUEUE_LEASE_SECONDS') or 10 * 60),
+    'max_attempts': int(os.getenv('NOMAD_LIST_WORK_QUEUE_MAX_ATTEMPTS') or 3),
+    'poll_interval': int(os.getenv('NOMAD_LIST_WORK_QUEUE_POLL_INTERVAL') or 30)
+}
+
 AVIATION_STACK = {
     'uri': os.getenv('AVIATION_STACK_URI') or 'http://api.aviationstack.com/v1/',
     'access_key': os.getenv('AVIATION_STACK_ACCESS_KEY') or '36117c41b6482d630207ffc137858e66',
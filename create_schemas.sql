@@ -138,3 +138,75 @@ CREATE TABLE IF NOT EXISTS photos (
   FOREIGN KEY (id_city) REFERENCES cities(id),
   UNIQUE (id_city, src)
 );
+
+CREATE TABLE IF NOT EXISTS city_fingerprints (
+  id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+  url VARCHAR(255) UNIQUE,
+  id_city INT,
+  page_hash CHAR(40),
+  tabs_hashes JSON,
+  created_on DATETIME NOT NULL DEFAULT NOW(),
+  updated_on DATETIME DEFAULT NULL ON UPDATE NOW(),
+  FOREIGN KEY (id_city) REFERENCES cities(id)
+);
+
+CREATE TABLE IF NOT EXISTS runs (
+  id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+  finished_on DATETIME DEFAULT NULL,
+  created_on DATETIME NOT NULL DEFAULT NOW(),
+  updated_on DATETIME DEFAULT NULL ON UPDATE NOW()
+);
+
+CREATE TABLE IF NOT EXISTS runs_cities (
+  id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+  id_run INT,
+  url VARCHAR(255),
+  state VARCHAR(10) CHECK (state in ('pending', 'fetched', 'stored', 'failed')),
+  created_on DATETIME NOT NULL DEFAULT NOW(),
+  updated_on DATETIME DEFAULT NULL ON UPDATE NOW(),
+  FOREIGN KEY (id_run) REFERENCES runs(id),
+  UNIQUE (id_run, url)
+);
+
+CREATE TABLE IF NOT EXISTS work_queue (
+  id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+  url VARCHAR(255) UNIQUE,
+  state VARCHAR(10) CHECK (state in ('pending', 'leased', 'done', 'failed')),
+  lease_owner VARCHAR(100),
+  lease_expires_on DATETIME DEFAULT NULL,
+  attempts INT NOT NULL DEFAULT 0,
+  created_on DATETIME NOT NULL DEFAULT NOW(),
+  updated_on DATETIME DEFAULT NULL ON UPDATE NOW(),
+  INDEX idx_work_queue_state_lease_expires_on (state, lease_expires_on),
+  INDEX idx_work_queue_lease_owner (lease_owner)
+);
+
+CREATE TABLE IF NOT EXISTS city_scores (
+  id_city INT NOT NULL PRIMARY KEY,
+  city_rank INT,
+  name VARCHAR(100),
+  country VARCHAR(50),
+  continent VARCHAR(50),
+  overall_score VARCHAR(255),
+  overall_score_value DOUBLE,
+  cost VARCHAR(255),
+  cost_value DOUBLE,
+  internet VARCHAR(255),
+  internet_value DOUBLE,
+  fun VARCHAR(255),
+  fun_value DOUBLE,
+  safety VARCHAR(255),
+  safety_value DOUBLE,
+  created_on DATETIME NOT NULL DEFAULT NOW(),
+  updated_on DATETIME DEFAULT NULL ON UPDATE NOW(),
+  FOREIGN KEY (id_city) REFERENCES cities(id),
+  INDEX idx_city_scores_rank (city_rank),
+  INDEX idx_city_scores_name_rank (name, city_rank),
+  INDEX idx_city_scores_country_rank (country, city_rank),
+  INDEX idx_city_scores_continent_rank (continent, city_rank),
+  INDEX idx_city_scores_overall_score_rank (overall_score_value, city_rank),
+  INDEX idx_city_scores_cost_rank (cost, city_rank),
+  INDEX idx_city_scores_internet_rank (internet, city_rank),
+  INDEX idx_city_scores_fun_rank (fun_value, city_rank),
+  INDEX idx_city_scores_safety_rank (safety, city_rank)
+);
@@ -0,0 +1,229 @@
+-- Schema of the SQLite storage, with the same tables as create_schemas.sql and its migrations.
+-- The names are compared without case, as in MySQL, and the rows have no updated_on trigger.
+
+CREATE TABLE IF NOT EXISTS continents (
+  id INTEGER PRIMARY KEY,
+  name VARCHAR(50) COLLATE NOCASE UNIQUE,
+  created_on DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  updated_on DATETIME DEFAULT NULL
+);
+
+CREATE TABLE IF NOT EXISTS currencies (
+  id INTEGER PRIMARY KEY,
+  name VARCHAR(50) COLLATE NOCASE UNIQUE,
+  code VARCHAR(10) COLLATE NOCASE UNIQUE,
+  created_on DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  updated_on DATETIME DEFAULT NULL
+);
+
+CREATE TABLE IF NOT EXISTS countries (
+  id INTEGER PRIMARY KEY,
+  name VARCHAR(50) COLLATE NOCASE UNIQUE,
+  id_continent INT,
+  iso2 CHAR(2) COLLATE NOCASE UNIQUE,
+  iso3 CHAR(3) COLLATE NOCASE UNIQUE,
+  iso_numeric SMALLINT UNIQUE,
+  population INT,
+  id_currency INT,
+  fips_code VARCHAR(10),
+  phone_prefix VARCHAR(100),
+  created_on DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  updated_on DATETIME DEFAULT NULL,
+  FOREIGN KEY (id_continent) REFERENCES continents(id),
+  FOREIGN KEY (id_currency) REFERENCES currencies(id)
+);
+
+CREATE TABLE IF NOT EXISTS cities (
+  id INTEGER PRIMARY KEY,
+  name VARCHAR(100) COLLATE NOCASE UNIQUE,
+  city_rank INT,
+  id_country INT,
+  iata_code CHAR(3) COLLATE NOCASE UNIQUE,
+  latitude DOUBLE,
+  longitude DOUBLE,
+  timezone VARCHAR(100),
+  gmt SMALLINT,
+  geoname_id INT,
+  created_on DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  updated_on DATETIME DEFAULT NULL,
+  FOREIGN KEY (id_country) REFERENCES countries(id)
+);
+
+CREATE TABLE IF NOT EXISTS cities_relationships (
+  id INTEGER PRIMARY KEY,
+  id_city INT,
+  id_related_city INT,
+  type TINYINT CHECK (type in (0, 1, 2)),
+  created_on DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  updated_on DATETIME DEFAULT NULL,
+  FOREIGN KEY (id_related_city) REFERENCES cities(id),
+  FOREIGN KEY (id_city) REFERENCES cities(id),
+  UNIQUE (id_city, id_related_city, type)
+);
+
+CREATE TABLE IF NOT EXISTS tabs (
+  id INTEGER PRIMARY KEY,
+  name VARCHAR(100) COLLATE NOCASE UNIQUE,
+  created_on DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  updated_on DATETIME DEFAULT NULL
+);
+
+CREATE TABLE IF NOT EXISTS attributes (
+  id INTEGER PRIMARY KEY,
+  name VARCHAR(255) COLLATE NOCASE,
+  id_tab INT,
+  created_on DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  updated_on DATETIME DEFAULT NULL,
+  FOREIGN KEY (id_tab) REFERENCES tabs(id),
+  UNIQUE (name, id_tab)
+);
+
+CREATE TABLE IF NOT EXISTS city_attributes (
+  id INTEGER PRIMARY KEY,
+  id_city INT,
+  id_attribute INT,
+  attribute_value DOUBLE,
+  description VARCHAR(255),
+  url VARCHAR(255),
+  created_on DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  updated_on DATETIME DEFAULT NULL,
+  FOREIGN KEY (id_city) REFERENCES cities(id),
+  FOREIGN KEY (id_attribute) REFERENCES attributes(id),
+  UNIQUE (id_city, id_attribute)
+);
+
+CREATE TABLE IF NOT EXISTS pros_and_cons (
+  id INTEGER PRIMARY KEY,
+  description VARCHAR(250),
+  type CHAR COLLATE NOCASE CHECK (type in ('p', 'c')),
+  id_city INT,
+  created_on DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  updated_on DATETIME DEFAULT NULL,
+  FOREIGN KEY (id_city) REFERENCES cities(id),
+  UNIQUE (id_city, type, description)
+);
+
+CREATE TABLE IF NOT EXISTS monthly_weathers_attributes (
+  id INTEGER PRIMARY KEY,
+  id_city INT,
+  id_attribute INT,
+  month_number INT,
+  attribute_value VARCHAR(255),
+  description VARCHAR(255),
+  value_number DOUBLE,
+  created_on DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  updated_on DATETIME DEFAULT NULL,
+  FOREIGN KEY (id_city) REFERENCES cities(id),
+  FOREIGN KEY (id_attribute) REFERENCES attributes(id),
+  UNIQUE (id_city, id_attribute, month_number)
+);
+
+CREATE TABLE IF NOT EXISTS reviews (
+  id INTEGER PRIMARY KEY,
+  description TEXT,
+  published_date DATE,
+  id_city INT,
+  created_on DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  updated_on DATETIME DEFAULT NULL,
+  FOREIGN KEY (id_city) REFERENCES cities(id)
+);
+
+CREATE TABLE IF NOT EXISTS photos (
+  id INTEGER PRIMARY KEY,
+  src VARCHAR(255),
+  id_city INT,
+  created_on DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  updated_on DATETIME DEFAULT NULL,
+  FOREIGN KEY (id_city) REFERENCES cities(id),
+  UNIQUE (id_city, src)
+);
+
+CREATE TABLE IF NOT EXISTS city_fingerprints (
+  id INTEGER PRIMARY KEY,
+  url VARCHAR(255) UNIQUE,
+  id_city INT,
+  page_hash CHAR(40),
+  tabs_hashes TEXT,
+  created_on DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  updated_on DATETIME DEFAULT NULL,
+  FOREIGN KEY (id_city) REFERENCES cities(id)
+);
+
+CREATE TABLE IF NOT EXISTS runs (
+  id INTEGER PRIMARY KEY,
+  finished_on DATETIME DEFAULT NULL,
+  created_on DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  updated_on DATETIME DEFAULT NULL
+);
+
+CREATE TABLE IF NOT EXISTS runs_cities (
+  id INTEGER PRIMARY KEY,
+  id_run INT,
+  url VARCHAR(255),
+  state VARCHAR(10) CHECK (state in ('pending', 'fetched', 'stored', 'failed')),
+  created_on DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  updated_on DATETIME DEFAULT NULL,
+  FOREIGN KEY (id_run) REFERENCES runs(id),
+  UNIQUE (id_run, url)
+);
+
+CREATE TABLE IF NOT EXISTS work_queue (
+  id INTEGER PRIMARY KEY,
+  url VARCHAR(255) UNIQUE,
+  state VARCHAR(10) CHECK (state in ('pending', 'leased', 'done', 'failed')),
+  lease_owner VARCHAR(100),
+  lease_expires_on DATETIME DEFAULT NULL,
+  attempts INT NOT NULL DEFAULT 0,
+  created_on DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  updated_on DATETIME DEFAULT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_work_queue_state_lease_expires_on ON work_queue (state, lease_expires_on);
+CREATE INDEX IF NOT EXISTS idx_work_queue_lease_owner ON work_queue (lease_owner);
+
+CREATE TABLE IF NOT EXISTS city_scores (
+  id_city INTEGER PRIMARY KEY,
+  city_rank INT,
+  name VARCHAR(100) COLLATE NOCASE,
+  country VARCHAR(50) COLLATE NOCASE,
+  continent VARCHAR(50) COLLATE NOCASE,
+  overall_score VARCHAR(255) COLLATE NOCASE,
+  overall_score_value DOUBLE,
+  cost VARCHAR(255) COLLATE NOCASE,
+  cost_value DOUBLE,
+  internet VARCHAR(255) COLLATE NOCASE,
+  internet_value DOUBLE,
+  fun VARCHAR(255) COLLATE NOCASE,
+  fun_value DOUBLE,
+  safety VARCHAR(255) COLLATE NOCASE,
+  safety_value DOUBLE,
+  created_on DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  updated_on DATETIME DEFAULT NULL,
+  FOREIGN KEY (id_city) REFERENCES cities(id)
+);
+
+CREATE TABLE IF NOT EXISTS data_version (
+  id TINYINT NOT NULL PRIMARY KEY CHECK (id = 1),
+  version BIGINT NOT NULL DEFAULT 0,
+  created_on DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  updated_on DATETIME DEFAULT NULL
+);
+
+INSERT OR IGNORE INTO data_version (id) VALUES (1);
+
+-- Indexes of the migrations of MySQL.
+CREATE INDEX IF NOT EXISTS idx_attributes_tab_name ON attributes (id_tab, name);
+CREATE INDEX IF NOT EXISTS idx_reviews_city_published_date ON reviews (id_city, published_date);
+CREATE INDEX IF NOT EXISTS idx_cities_rank ON cities (city_rank);
+CREATE INDEX IF NOT EXISTS idx_cities_relationships_related_city ON cities_relationships (id_related_city, type, id_city);
+CREATE INDEX IF NOT EXISTS idx_runs_cities_run_state ON runs_cities (id_run, state);
+CREATE INDEX IF NOT EXISTS idx_city_scores_rank ON city_scores (city_rank);
+CREATE INDEX IF NOT EXISTS idx_city_scores_name_rank ON city_scores (name, city_rank);
+CREATE INDEX IF NOT EXISTS idx_city_scores_country_rank ON city_scores (country, city_rank);
+CREATE INDEX IF NOT EXISTS idx_city_scores_continent_rank ON city_scores (continent, city_rank);
+CREATE INDEX IF NOT EXISTS idx_city_scores_overall_score_rank ON city_scores (overall_score_value, city_rank);
+CREATE INDEX IF NOT EXISTS idx_city_scores_cost_rank ON city_scores (cost, city_rank);
+CREATE INDEX IF NOT EXISTS idx_city_scores_internet_rank ON city_scores (internet, city_rank);
+CREATE INDEX IF NOT EXISTS idx_city_scores_fun_rank ON city_scores (fun_value, city_rank);
+CREATE INDEX IF NOT EXISTS idx_city_scores_safety_rank ON city_scores (safety, city_rank);
+CREATE INDEX IF NOT EXISTS idx_monthly_weathers_attribute_month_value ON monthly_weathers_attributes (id_attribute, month_number, value_number);
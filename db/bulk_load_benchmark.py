@@ -0,0 +1,94 @@
+import time
+import uuid
+from logger import Logger
+from db.bulk_loader import BulkLoader
+from db.mysql_connector import MySQLConnector
+from db.storage import BATCH_TABLES
+
+# The rows are written in city_attributes, the biggest table. Each synthetic city has a row for each attribute.
+BENCHMARK_TABLE = 'city_attributes'
+BENCHMARK_ATTRIBUTES = 100
+
+
+class BulkLoadBenchmark:
+    """
+    Class that knows how to measure the bulk path of MySQL against the batch queries, with the same synthetic rows.
+    Each path writes the rows in its own transaction, with its own synthetic cities, and the transaction is rolled
+    back, so the database is not modified.
+    The server must allow LOAD DATA LOCAL INFILE (local_infile=ON), as for the --bulk-load option.
+    """
+
+    def __init__(self, num_of_rows, logger=None, verbose=False):
+        if logger is None:
+            logger = Logger(verbose=verbose).logger
+
+        self._logger = logger
+        self._num_of_rows = num_of_rows
+
+    def run(self):
+        """Writes the rows with each path, and returns a dict for each one with the rows, the seconds and the rows/s."""
+        results = []
+
+        with MySQLConnector.connect(local_infile=True) as connection:
+            paths = {
+                'row by row': lambda rows: self._write_with_queries(connection, rows, many=False),
+                'batch queries': lambda rows: self._write_with_queries(connection, rows, many=True),
+                'bulk load': lambda rows: BulkLoader(connection, logger=self._logger).load(BENCHMARK_TABLE, rows)
+            }
+
+            for path, write in paths.items():
+                try:
+                    rows = self._create_rows(connection)
+                    self._logger.info(f"Writing {len(rows)} rows with the {path} path...")
+
+                    started = time.perf_counter()
+                    write(rows)
+                    seconds = time.perf_counter() - started
+                finally:
+                    connection.rollback()
+
+                results.append({'path': path, 'rows': len(rows), 'seconds': round(seconds, 3),
+                                'rows/s': round(len(rows) / seconds)})
+
+        return results
+
+    def _create_rows(self, connection):
+        """
+        Inserts a synthetic tab with its attributes, and the cities needed for the rows, and returns the rows of
+        city_attributes of those cities. Every row is new, so each path writes the same amount of data.
+        """
+        prefix = f"Benchmark {uuid.uuid4().hex[:8]}"
+        num_of_cities = -(-self._num_of_rows // BENCHMARK_ATTRIBUTES)
+
+        with connection.cursor() as cursor:
+            cursor.execute("INSERT INTO tabs (name) VALUES (%s);", prefix)
+            id_tab = cursor.lastrowid
+            cursor.executemany("INSERT INTO attributes (name, id_tab) VALUES (%s, %s);",
+                               [(f"Attribute {i}", id_tab) for i in range(BENCHMARK_ATTRIBUTES)])
+            cursor.execute("SELECT id FROM attributes WHERE id_tab = %s ORDER BY id;", id_tab)
+            id_attributes = [id_attribute for id_attribute, in cursor.fetchall()]
+
+            cursor.executemany("INSERT INTO cities (name) VALUES (%s);",
+                               [f"{prefix} city {i}" for i in range(num_of_cities)])
+            cursor.execute("SELECT id FROM cities WHERE name LIKE %s ORDER BY id;", f"{prefix} city %")
+            id_cities = [id_city for id_city, in cursor.fetchall()]
+
+        rows = [(id_city, id_attribute, f"${i}", float(i), f"https://nomadlist.com/{prefix}")
+                for id_city in id_cities for i, id_attribute in enumerate(id_attributes)]
+        return rows[:self._num_of_rows]
+
+    @staticmethod
+    def _write_with_queries(connection, rows, many):
+        """
+        Given the rows, writes them with the upsert of the batch queries: one statement per row, or the multi-row
+        statements that executemany builds from it.
+        """
+        columns, key_columns, updated_columns = BATCH_TABLES[BENCHMARK_TABLE]
+        query = MySQLConnector.upsert_query(BENCHMARK_TABLE, columns, key_columns, updated_columns)
+
+        with connection.cursor() as cursor:
+            if many:
+                cursor.executemany(query, rows)
+            else:
+                for row in rows:
+                    cursor.execute(query, row)
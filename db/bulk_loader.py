@@ -0,0 +1,100 @@
+import os
+import tempfile
+from logger import Logger
+
+# Tables written with the bulk path: their columns, and the columns updated when the row already exists.
+# Without updated columns, the existing rows are kept, as the INSERT IGNORE of the batch queries.
+BULK_LOAD_TABLES = {
+    'city_attributes': (['id_city', 'id_attribute', 'description', 'attribute_value', 'url'],
+                        ['description', 'attribute_value', 'url']),
+    'monthly_weathers_attributes': (['id_city', 'id_attribute', 'month_number', 'attribute_value', 'description',
+                                     'value_number'],
+                                    ['attribute_value', 'description', 'value_number']),
+    'photos': (['id_city', 'src'], []),
+    'reviews': (['id_city', 'description', 'published_date'], [])
+}
+
+# Escapes of the default format of LOAD DATA: tab separated fields, one line per row, and backslash escapes.
+TSV_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r', '\0': '\\0'})
+
+
+def to_tsv_field(value):
+    """Given a value of a row, returns it as a field of LOAD DATA. None is NULL."""
+    if value is None:
+        return '\\N'
+
+    return str(value).translate(TSV_ESCAPES)
+
+
+class BulkLoader:
+    """
+    Class that knows how to write big batches of rows with the bulk path of MySQL.
+    The rows of each table are staged in a TSV file, loaded with LOAD DATA LOCAL INFILE into a temporary staging table,
+    and merged into the real table with one INSERT ... SELECT. Everything runs in the transaction of the connection.
+    The connection must be opened with local_infile=True, and the server must allow it (local_infile=ON).
+    """
+
+    def __init__(self, connection, logger=None, verbose=False):
+        if logger is None:
+            logger = Logger(verbose=verbose).logger
+
+        self._logger = logger
+        self._connection = connection
+
+    @staticmethod
+    def _staging_table(table):
+        return f"staging_{table}"
+
+    def _create_staging_table(self, cursor, table):
+        """
+        Creates the temporary staging table of the table, with the same columns but without keys,
+        so the rows of the batch are loaded as they are. Creating a temporary table doesn't commit the transaction.
+        It lives in the session, so it's created again if the connection was reopened.
+        """
+        columns, __ = BULK_LOAD_TABLES[table]
+        cursor.execute(f"""
+        CREATE TEMPORARY TABLE IF NOT EXISTS {self._staging_table(table)}
+        SELECT {', '.join(columns)} FROM {table} LIMIT 0
+        """)
+
+    def _stage(self, rows):
+        """Given the rows of a table, writes them in a TSV file, and returns its path."""
+        with tempfile.NamedTemporaryFile('w', encoding='utf-8', suffix='.tsv', delete=False) as tsv_file:
+            for row in rows:
+                tsv_file.write('\t'.join(map(to_tsv_field, row)) + '\n')
+
+        return tsv_file.name
+
+    def _merge_query(self, table):
+        columns, updated_columns = BULK_LOAD_TABLES[table]
+        staging_columns = f"SELECT {', '.join(columns)} FROM {self._staging_table(table)}"
+
+        if not updated_columns:
+            return f"INSERT IGNORE INTO {table} ({', '.join(columns)}) {staging_columns}"
+
+        return f"""
+        INSERT INTO {table}
+        ({', '.join(columns)})
+        SELECT * FROM ({staging_columns}) as new
+            ON DUPLICATE KEY UPDATE {', '.join([f"{column} = new.{column}" for column in updated_columns])}
+        """
+
+    def load(self, table, rows):
+        """Given the table and its rows, loads them in the staging table, and merges them into the table."""
+        columns, __ = BULK_LOAD_TABLES[table]
+        path = self._stage(rows)
+
+        try:
+            with self._connection.cursor() as cursor:
+                self._create_staging_table(cursor, table)
+                cursor.execute(f"DELETE FROM {self._staging_table(table)};")
+
+                self._logger.info(f"Loading {len(rows)} rows in the table {table}...")
+                cursor.execute(f"""
+                LOAD DATA LOCAL INFILE %s INTO TABLE {self._staging_table(table)}
+                CHARACTER SET utf8mb4
+                ({', '.join(columns)})
+                """, path)
+                cursor.execute(self._merge_query(table))
+        finally:
+            os.remove(path)
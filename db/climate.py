@@ -0,0 +1,131 @@
+import numpy as np
+from logger import Logger
+
+MONTHS = 12
+
+
+def parse_condition(condition):
+    """
+    Given a condition on the monthly values of an attribute of the weather, like 'Real:20:28', 'Humidity::60' or
+    'Rain:100:', returns the attribute, and its min and max values (None if there is no bound).
+    """
+    try:
+        attribute, low, high = condition.rsplit(':', 2)
+        return attribute, float(low) if low else None, float(high) if high else None
+    except ValueError:
+        raise ValueError(f"The condition {condition} should be like ATTRIBUTE:MIN:MAX (eg: Real:20:28, Humidity::60).")
+
+
+def parse_months(months):
+    """Given the months separated by commas (eg: '3,4'), returns their numbers."""
+    numbers = [int(month) for month in months.split(',') if month.strip()]
+    if not all(1 <= month <= MONTHS for month in numbers):
+        raise ValueError(f"The months {months} should be numbers between 1 and {MONTHS}.")
+
+    return numbers
+
+
+class ClimateMatrix:
+    """
+    Typed weather of the stored cities: a float array of cities x 12 months x attributes, with NaN for the missing
+    values, and the rank, name and country of each city.
+    The climate conditions are evaluated over all the cities at once, with vectorized operations.
+    """
+
+    def __init__(self, cities, attributes, values, logger=None, verbose=False):
+        if logger is None:
+            logger = Logger(verbose=verbose).logger
+
+        self._logger = logger
+        self._cities = cities
+        self._attributes = attributes
+        self._values = values
+        # The attributes are found without case.
+        self._positions = {attribute.casefold(): i for i, attribute in enumerate(attributes)}
+
+    def __len__(self):
+        return len(self._cities)
+
+    @classmethod
+    def from_storage(cls, storage, conditions=None, months=None, logger=None, verbose=False):
+        """
+        Given an opened storage, reads the numeric values of the weather of every city, and builds the matrix.
+        Given the conditions and the months that will be evaluated, only the values that can match them are read, and
+        the rest are NaN, so the matrix gives the same cities for those conditions.
+        """
+        cities = {id_city: (rank, name, country) for id_city, rank, name, country in storage.get_cities()}
+        attributes = sorted(storage.get_weather_attributes())
+        positions = {attribute.casefold(): i for i, attribute in enumerate(attributes)}
+
+        if conditions:
+            conditions = [(attributes[cls._find_attribute(positions, attributes, attribute)], low, high)
+                          for attribute, low, high in conditions]
+        entries = [entry for entry in storage.get_weather_values(conditions, months) if entry[0] in cities]
+
+        ids = sorted({id_city for id_city, __, __, __ in entries})
+        values = np.full((len(ids), MONTHS, len(attributes)), np.nan)
+
+        if entries:
+            city_positions = {id_city: i for i, id_city in enumerate(ids)}
+            id_cities, entry_attributes, entry_months, numbers = zip(*entries)
+            values[[city_positions[id_city] for id_city in id_cities], np.array(entry_months) - 1,
+                   [positions[attribute.casefold()] for attribute in entry_attributes]] = numbers
+
+        return cls([cities[id_city] for id_city in ids], attributes, values, logger=logger, verbose=verbose)
+
+    @staticmethod
+    def _find_attribute(positions, attributes, attribute):
+        if (position := positions.get(attribute.casefold())) is None:
+            raise ValueError(f"The weather has no attribute {attribute}. The attributes are: "
+                             f"{', '.join(attributes)}.")
+
+        return position
+
+    def _attribute_position(self, attribute):
+        return self._find_attribute(self._positions, self._attributes, attribute)
+
+    def attribute_name(self, attribute):
+        """Given the name of an attribute in any case, returns its stored name."""
+        return self._attributes[self._attribute_position(attribute)]
+
+    def evaluate(self, conditions, months=None):
+        """
+        Given the conditions (attribute, min, max) and the months (1 to 12, or all of them), returns a boolean mask
+        of the cities whose values are between the bounds in every month. A missing value never matches.
+        """
+        months = np.array(months or range(1, MONTHS + 1)) - 1
+        mask = np.ones(len(self), dtype=bool)
+
+        for attribute, low, high in conditions:
+            values = self._values[:, months, self._attribute_position(attribute)]
+            matches = ~np.isnan(values)
+            if low is not None:
+                matches &= values >= low
+            if high is not None:
+                matches &= values <= high
+            mask &= matches.all(axis=1)
+
+        return mask
+
+    def filter_cities_by(self, conditions, months=None, num_of_cities=None):
+        """
+        Given the conditions and the months, yields the rank, the name and the country of the matching cities, sorted
+        by rank, with the mean value of each attribute of the conditions in those months.
+        """
+        mask = self.evaluate(conditions, months)
+        selected = np.flatnonzero(mask)
+
+        # The cities without a rank come last.
+        ranks = np.array([np.inf if rank is None else rank for rank, __, __ in self._cities], dtype=np.float64)
+        selected = selected[np.argsort(ranks[selected], kind='stable')]
+        if num_of_cities:
+            selected = selected[:num_of_cities]
+
+        self._logger.info(f"{mask.sum()} of {len(self)} cities match the climate conditions.")
+
+        month_positions = np.array(months or range(1, MONTHS + 1)) - 1
+        means = [self._values[selected][:, month_positions, self._attribute_position(attribute)].mean(axis=1)
+                 for attribute, __, __ in conditions]
+
+        for i, city in enumerate(selected):
+            yield (*self._cities[city], *[round(float(mean[i]), 2) for mean in means])
@@ -0,0 +1,106 @@
+import queue
+import threading
+import pymysql
+from conf import MYSQL
+from logger import Logger
+
+
+class CountingConnection(pymysql.connections.Connection):
+    """Connection that counts the commands sent to the server (statements, commits and rollbacks)."""
+
+    round_trips = 0
+
+    def _execute_command(self, command, sql):
+        self.round_trips += 1
+        return super()._execute_command(command, sql)
+
+
+class ConnectionPool:
+    """
+    Class that knows how to share a few connections to MySQL between threads.
+    Each connection is checked before lending it, and it's opened again if the server closed it.
+    With local_infile, the connections can send local files to the server with LOAD DATA LOCAL INFILE.
+    """
+
+    def __init__(self, size=1, local_infile=False, logger=None, verbose=False):
+        if logger is None:
+            logger = Logger(verbose=verbose).logger
+
+        self._logger = logger
+        self._size = size
+        self._local_infile = local_infile
+        self._idle = queue.LifoQueue()
+        self._opened = 0
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _connect(self):
+        return CountingConnection(host=MYSQL['host'], user=MYSQL['user'], password=MYSQL['password'],
+                                  database=MYSQL['database'], local_infile=self._local_infile)
+
+    def acquire(self):
+        """Lends an idle connection, or opens a new one if the pool is not full. Otherwise, waits for one."""
+        try:
+            connection = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                should_open = self._opened < self._size
+                if should_open:
+                    self._opened += 1
+
+            if should_open:
+                try:
+                    self._logger.debug(f"Opening the connection #{self._opened} of the pool...")
+                    return self._connect()
+                except Exception:
+                    with self._lock:
+                        self._opened -= 1
+                    raise
+
+            connection = self._idle.get()
+
+        # Health check. If the server closed the connection, it's opened again. If it can't be, it's discarded.
+        try:
+            connection.ping(reconnect=True)
+        except pymysql.err.Error as e:
+            self._logger.warning(f"The connection couldn't be opened again, so it was discarded: {e}")
+            self._discard(connection)
+            raise
+
+        return connection
+
+    def release(self, connection):
+        """Given a lent connection, rolls back what was not committed, and returns it to the pool."""
+        try:
+            connection.rollback()
+        except pymysql.err.Error as e:
+            self._logger.warning(f"The connection was broken, so it was discarded: {e}")
+            self._discard(connection)
+            return
+
+        self._idle.put(connection)
+
+    def _discard(self, connection):
+        """Given a broken connection, closes it if it's still open, and frees its place in the pool."""
+        if connection.open:
+            connection.close()
+
+        with self._lock:
+            self._opened -= 1
+
+    def close(self):
+        """Closes the idle connections."""
+        while True:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                break
+
+            connection.close()
+            with self._lock:
+                self._opened -= 1
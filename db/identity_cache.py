@@ -0,0 +1,71 @@
+from collections import OrderedDict
+
+
+class IdentityCache:
+    """
+    Class that knows the ids of the rows of one table by their domain identifier (eg: the name of the continent).
+    It can be bounded, evicting the least recently used ids, and it counts its hits and misses.
+    The ids added inside a transaction are forgotten if the transaction is rolled back.
+    """
+
+    def __init__(self, name, max_size=None):
+        self.name = name
+        self._max_size = max_size
+        self._ids = OrderedDict()
+        # Keys added since the last commit.
+        self._uncommitted = set()
+        self.hits = self.misses = 0
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, key):
+        return key in self._ids
+
+    def get(self, key):
+        """Given the key, returns its id, or None if it's not cached. Counts the hit or the miss."""
+        if key in self._ids:
+            self._ids.move_to_end(key)
+            self.hits += 1
+            return self._ids[key]
+
+        self.misses += 1
+        return None
+
+    def get_many(self, keys):
+        """Given some keys, returns a dict {key: id} with the cached ones. Each key counts as a hit or a miss."""
+        return {key: row_id for key in keys if (row_id := self.get(key)) is not None}
+
+    def update(self, ids):
+        """Given a dict {key: id}, adds the ids that are not None to the cache."""
+        for key, row_id in ids.items():
+            if row_id is None:
+                continue
+
+            self._ids[key] = row_id
+            self._ids.move_to_end(key)
+            self._uncommitted.add(key)
+
+        while self._max_size and len(self._ids) > self._max_size:
+            self._ids.popitem(last=False)
+
+    def load(self, rows):
+        """
+        Given the rows already stored in the database, warms the cache with them.
+        The last column of each row is the id, and the rest are the key (eg: (name, id) or (id_tab, name, id)).
+        """
+        self.update({(tuple(key) if len(key) > 1 else key[0]): row_id for *key, row_id in rows})
+        self._uncommitted.clear()
+
+    def commit(self):
+        """The ids added until now are stored in the database."""
+        self._uncommitted.clear()
+
+    def rollback(self):
+        """Forgets the ids added since the last commit, because they were rolled back in the database."""
+        for key in self._uncommitted:
+            self._ids.pop(key, None)
+        self._uncommitted.clear()
+
+    def __str__(self):
+        return f"{self.name}: {len(self)} ids - Hits: {self.hits} - Misses: {self.misses}"
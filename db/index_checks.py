@@ -0,0 +1,66 @@
+# Queries of the scrapper and the show command, and the index that each one should use (see the migrations).
+INDEX_CHECKS = [
+    {
+        'index': 'idx_attributes_tab_name',
+        'query': "SELECT id FROM attributes WHERE id_tab = %s AND name LIKE %s",
+        'params': (1, '%Overall Score')
+    },
+    {
+        'index': 'idx_reviews_city_published_date',
+        'query': "SELECT MAX(published_date) FROM reviews WHERE id_city = %s",
+        'params': (1,)
+    },
+    {
+        'index': 'idx_cities_rank',
+        'query': "SELECT id, name FROM cities WHERE city_rank BETWEEN %s AND %s ORDER BY city_rank",
+        'params': (1, 100)
+    },
+    {
+        'index': 'idx_cities_relationships_related_city',
+        'query': "SELECT id_city, type FROM cities_relationships WHERE id_related_city = %s",
+        'params': (1,)
+    },
+    {
+        'index': 'idx_runs_cities_run_state',
+        'query': "SELECT url FROM runs_cities WHERE id_run = %s AND state != %s",
+        'params': (1, 'stored')
+    },
+    {
+        'index': 'idx_monthly_weathers_attribute_month_value',
+        'query': "SELECT id_city FROM monthly_weathers_attributes "
+                 "WHERE id_attribute = %s AND month_number = %s AND value_number BETWEEN %s AND %s",
+        'params': (1, 3, 20, 28)
+    }
+]
+
+
+def check_indexes(explain, logger):
+    """
+    Given the function that explains a query in a storage, explains the queries of INDEX_CHECKS, and checks that they
+    can use their index. The plan has a dict per table with the key that was chosen, the possible keys and the extra
+    info, as in the EXPLAIN of MySQL.
+    Returns a dict for each query with the index, the chosen key, and the status: used, possible (the database could
+    use it, but the statistics of the table made it choose another plan), or missing.
+    """
+    results = []
+
+    for check in INDEX_CHECKS:
+        plan = explain(check['query'], check['params'])
+
+        keys = [row['key'] for row in plan if row['key']]
+        possible_keys = [key for row in plan for key in (row['possible_keys'] or '').split(',')]
+        # MIN() and MAX() read from the index are resolved while optimizing, without a table access.
+        optimized_away = any('optimized away' in (row['Extra'] or '') for row in plan)
+
+        if check['index'] in keys or optimized_away:
+            status = 'used'
+        elif check['index'] in possible_keys:
+            status = 'possible'
+        else:
+            status = 'missing'
+            logger.warning(f"The query can't use the index {check['index']}: {check['query']}")
+
+        results.append({'index': check['index'], 'key': ', '.join(keys) or None, 'status': status,
+                        'query': check['query']})
+
+    return results
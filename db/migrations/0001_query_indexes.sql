@@ -0,0 +1,19 @@
+-- Indexes of the access paths of the scrapper and the show command. Each one is checked by the check-indexes command.
+
+-- The Scores pivot of the city_scores summary joins the attributes of one tab, and matches them by name with LIKE.
+-- UNIQUE (name, id_tab) can't seek by tab, so the whole table was scanned.
+CREATE INDEX idx_attributes_tab_name ON attributes (id_tab, name);
+
+-- The last published review of a city is read before writing its new reviews.
+-- With the date in the index, MAX(published_date) is one index lookup instead of reading every review of the city.
+CREATE INDEX idx_reviews_city_published_date ON reviews (id_city, published_date);
+
+-- Ranges and ordering by the rank of the cities.
+CREATE INDEX idx_cities_rank ON cities (city_rank);
+
+-- The cities that are related to a city (eg: which cities have it as a near city).
+-- The index of the foreign key only has the related city, so the type was read from the rows.
+CREATE INDEX idx_cities_relationships_related_city ON cities_relationships (id_related_city, type, id_city);
+
+-- The unfinished cities of a run, read when the run is resumed or finished.
+CREATE INDEX idx_runs_cities_run_state ON runs_cities (id_run, state);
@@ -0,0 +1,10 @@
+-- Counter of the changes of the stored cities. Each write transaction increments it, so the cached results of the
+-- show command are invalidated.
+CREATE TABLE IF NOT EXISTS data_version (
+  id TINYINT NOT NULL PRIMARY KEY CHECK (id = 1),
+  version BIGINT NOT NULL DEFAULT 0,
+  created_on DATETIME NOT NULL DEFAULT NOW(),
+  updated_on DATETIME DEFAULT NULL ON UPDATE NOW()
+);
+
+INSERT IGNORE INTO data_version (id) VALUES (1);
@@ -0,0 +1,9 @@
+-- The values of the weather are texts, like '25°C' or '70%'. Their numbers are stored typed, so the climate
+-- conditions compare numbers instead of parsing the texts of every city on each query.
+ALTER TABLE monthly_weathers_attributes ADD COLUMN value_number DOUBLE AFTER description;
+CREATE INDEX idx_monthly_weathers_attribute_month_value ON monthly_weathers_attributes (id_attribute, month_number, value_number);
+
+-- The values stored before the column: the first number of the text, without the thousands separators.
+UPDATE monthly_weathers_attributes
+SET value_number = CAST(REGEXP_SUBSTR(REPLACE(attribute_value, ',', ''), '-?[0-9]+([.][0-9]+)?') AS DOUBLE)
+WHERE value_number IS NULL;
@@ -0,0 +1,10 @@
+-- The values of the Cost of Living tab are texts, like '$2,352 / mo'. The scrapper stores their first number as the
+-- attribute value, so they are compared as numbers (eg: by the snapshot of show).
+
+-- The values stored before: the first number of the text, without the thousands separators.
+UPDATE city_attributes city_attribute
+JOIN attributes attribute ON attribute.id = city_attribute.id_attribute
+JOIN tabs tab ON tab.id = attribute.id_tab
+SET city_attribute.attribute_value =
+    CAST(REGEXP_SUBSTR(REPLACE(city_attribute.description, ',', ''), '-?[0-9]+([.][0-9]+)?') AS DOUBLE)
+WHERE tab.name = 'Cost of Living' AND city_attribute.attribute_value IS NULL;
@@ -0,0 +1,91 @@
+import os
+import re
+import pymysql
+from conf import MYSQL, MYSQL_MIGRATIONS_DIR
+from logger import Logger
+
+# Errors of the statements that were already applied: table exists, duplicate column, duplicate key name,
+# and can't drop a column or key that doesn't exist. MySQL has no IF NOT EXISTS for indexes and columns,
+# so they make the migrations idempotent.
+ALREADY_APPLIED_ERRORS = {1050, 1060, 1061, 1091}
+
+
+def split_statements(script):
+    """Given a SQL script, returns its statements without the comment lines."""
+    lines = [line for line in script.splitlines() if not line.strip().startswith('--')]
+    return [statement.strip() for statement in '\n'.join(lines).split(';') if statement.strip()]
+
+
+class Migrator:
+    """
+    Class that knows how to migrate the schema of an existing database.
+    The migrations are forward-only SQL files named like 0001_description.sql. The applied versions are stored in
+    the schema_migrations table, so each migration runs once.
+    """
+
+    def __init__(self, directory=MYSQL_MIGRATIONS_DIR, logger=None, verbose=False):
+        if logger is None:
+            logger = Logger(verbose=verbose).logger
+
+        self._logger = logger
+        self._directory = directory
+
+    def __enter__(self):
+        self._connection = pymysql.connect(host=MYSQL['host'], user=MYSQL['user'], password=MYSQL['password'],
+                                           database=MYSQL['database'])
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._connection.close()
+
+    def _get_migrations(self):
+        """Returns the (version, name, path) of the migration files, sorted by version."""
+        migrations = []
+        for filename in os.listdir(self._directory):
+            match = re.match(r'^(\d+)_(.+)\.sql$', filename)
+            if match:
+                migrations.append((int(match.group(1)), match.group(2), os.path.join(self._directory, filename)))
+
+        return sorted(migrations)
+
+    def _get_applied_versions(self):
+        with self._connection.cursor() as cursor:
+            cursor.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+              version INT NOT NULL PRIMARY KEY,
+              name VARCHAR(255),
+              created_on DATETIME NOT NULL DEFAULT NOW()
+            );
+            """)
+            cursor.execute("SELECT version FROM schema_migrations;")
+            return {version for version, in cursor.fetchall()}
+
+    def _apply(self, version, name, path):
+        """Given a migration, executes its statements, and records its version."""
+        with open(path, 'r') as migration_file:
+            statements = split_statements(migration_file.read())
+
+        with self._connection.cursor() as cursor:
+            for statement in statements:
+                try:
+                    cursor.execute(statement)
+                except pymysql.err.OperationalError as e:
+                    code, message = e.args
+                    if code not in ALREADY_APPLIED_ERRORS:
+                        raise
+                    self._logger.debug(f"The statement was already applied: {message}")
+
+            cursor.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s);", (version, name))
+            self._connection.commit()
+
+    def migrate(self):
+        """Applies the pending migrations in order. Returns the versions that were applied."""
+        applied_versions = self._get_applied_versions()
+        pending = [migration for migration in self._get_migrations() if migration[0] not in applied_versions]
+
+        for version, name, path in pending:
+            self._logger.info(f"Applying the migration {version}: {name}...")
+            self._apply(version, name, path)
+
+        self._logger.info(f"{len(pending)} migrations applied. The schema is up to date.")
+        return [version for version, __, __ in pending]
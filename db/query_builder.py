@@ -0,0 +1,43 @@
+class SelectQuery:
+    """
+    Class that knows how to build a parameterized SELECT query.
+    The values are never part of the SQL, so the same filters always produce the same text with different params.
+    """
+
+    def __init__(self, table, columns):
+        self._table = table
+        self._columns = columns
+        self._conditions = []
+        self._params = []
+        self._order_by = []
+        self._limit = None
+
+    def where(self, condition, *values):
+        """Given a condition with placeholders (eg: 'country = %s') and its values, adds it joined with AND."""
+        self._conditions.append(condition)
+        self._params.extend(values)
+        return self
+
+    def order_by(self, column, order='ASC'):
+        """Given a column and the order, ASC or DESC, adds it to the sorting criteria."""
+        self._order_by.append(f"{column} {'DESC' if order == 'DESC' else 'ASC'}")
+        return self
+
+    def limit(self, num_of_rows):
+        self._limit = num_of_rows
+        return self
+
+    def build(self):
+        """Returns the SQL query and its params."""
+        clauses = [f"SELECT {', '.join(self._columns)}", f"FROM {self._table}"]
+        params = list(self._params)
+
+        if self._conditions:
+            clauses.append(f"WHERE {' AND '.join(self._conditions)}")
+        if self._order_by:
+            clauses.append(f"ORDER BY {', '.join(self._order_by)}")
+        if self._limit:
+            clauses.append("LIMIT %s")
+            params.append(self._limit)
+
+        return '\n'.join(clauses), params
@@ -0,0 +1,53 @@
+import hashlib
+import json
+import os
+import conf as cfg
+from logger import Logger
+
+
+class QueryCache:
+    """
+    Disk-backed cache of the results of the show queries, shared by every CLI call.
+    The entries are keyed by the data version of the database and the normalized filters. When the scrapper writes
+    cities, the data version changes, so the old entries are never read again, and they are removed on the next put.
+    """
+
+    def __init__(self, directory=cfg.QUERY_CACHE['directory'], logger=None, verbose=False):
+        if logger is None:
+            logger = Logger(verbose=verbose).logger
+
+        self._logger = logger
+        self._directory = directory
+
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, data_version, key):
+        key_hash = hashlib.sha1(repr(key).encode()).hexdigest()
+        return os.path.join(self._directory, f"{data_version}-{key_hash}.json")
+
+    def get(self, data_version, key):
+        """Given the data version and the key of the query, returns its rows, or None if they are not cached."""
+        try:
+            with open(self._path(data_version, key), 'r') as cache_file:
+                rows = json.load(cache_file)
+        except (OSError, ValueError):
+            return None
+
+        self._logger.info(f"The results were read from the query cache (data version {data_version}).")
+        return [tuple(row) for row in rows]
+
+    def put(self, data_version, key, rows):
+        """Given the data version, the key and the rows of the query, caches them, and removes the stale entries."""
+        try:
+            for entry in os.scandir(self._directory):
+                if not entry.name.startswith(f"{data_version}-"):
+                    os.remove(entry.path)
+
+            path = self._path(data_version, key)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w') as cache_file:
+                json.dump(rows, cache_file, default=str)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            # Another CLI call may be cleaning the cache at the same time. The results are just not cached.
+            self._logger.warning(f"The results could not be cached: {e}")
@@ -0,0 +1,121 @@
+import threading
+from conf import RUN_JOURNAL_BATCH_SIZE
+from logger import Logger
+from db.storages import get_storage_class
+
+
+class RunJournal:
+    """
+    Class that knows how to journal a scrape run in the database: the discovered urls, and the state of each city.
+    The discovered urls are written before they are processed, so a resumed run has all of them. Their later states
+    are buffered and written in batches, so journaling doesn't add a round trip per state.
+    """
+
+    PENDING = 'pending'
+    FETCHED = 'fetched'
+    STORED = 'stored'
+    FAILED = 'failed'
+
+    def __init__(self, id_run=None, batch_size=RUN_JOURNAL_BATCH_SIZE, storage_class=None, logger=None, verbose=False):
+        if logger is None:
+            logger = Logger(verbose=verbose).logger
+
+        self._logger = logger
+        # Storage class of the backend, which knows how to connect to the database and write the upserts.
+        self._storage_class = storage_class or get_storage_class()
+        self._batch_size = batch_size
+        self.id_run = id_run
+
+        # {url: state}. Only the last state of each url in the batch is written.
+        self._states = {}
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        """Opens the connection of the journal, and creates the run if it's a new one."""
+        self._connection = self._storage_class.connect()
+
+        if self.id_run is None:
+            with self._connection.cursor() as cursor:
+                cursor.execute("INSERT INTO runs (finished_on) VALUES (NULL);")
+                self._connection.commit()
+                self.id_run = cursor.lastrowid
+            self._logger.info(f"Starting the run #{self.id_run}. Use --resume {self.id_run} to resume it.")
+        else:
+            with self._connection.cursor() as cursor:
+                cursor.execute("SELECT id FROM runs WHERE id = %s;", self.id_run)
+                run = cursor.fetchone()
+
+            if run is None:
+                self._connection.close()
+                raise ValueError(f"There is no run #{self.id_run} to resume.")
+
+            self._logger.info(f"Resuming the run #{self.id_run}...")
+
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Writes the buffered states, marks the run as finished if every city was stored, and closes the connection."""
+        try:
+            self.flush()
+
+            with self._connection.cursor() as cursor:
+                cursor.execute("""
+                UPDATE runs SET finished_on = CURRENT_TIMESTAMP
+                WHERE id = %s AND NOT EXISTS (SELECT 1 FROM runs_cities WHERE id_run = %s AND state != %s)
+                """, (self.id_run, self.id_run, self.STORED))
+                self._connection.commit()
+        finally:
+            self._connection.close()
+
+    def record(self, url, state):
+        """Given the url of the city and its new state, buffers it, and writes the batch if it's full."""
+        with self._lock:
+            self._states[url] = state
+
+            if len(self._states) >= self._batch_size:
+                self._flush()
+
+    def flush(self):
+        """Writes all the buffered states."""
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        if not self._states:
+            return
+
+        upsert_states_query = self._storage_class.upsert_query('runs_cities', ['id_run', 'url', 'state'],
+                                                               ['id_run', 'url'], ['state'])
+
+        values = [(self.id_run, url, state) for url, state in self._states.items()]
+        self._logger.debug(f"Writing {len(values)} states of the run #{self.id_run}...")
+
+        with self._connection.cursor() as cursor:
+            cursor.executemany(upsert_states_query, values)
+            self._connection.commit()
+
+        self._states = {}
+
+    def track(self, urls):
+        """
+        Given the discovered urls, writes each one as pending before yielding it. If the run is killed, every url that
+        it yielded is in the journal, so the resumed run processes it. An url that the run already has keeps its state.
+        """
+        insert_pending_query = self._storage_class.upsert_query('runs_cities', ['id_run', 'url', 'state'],
+                                                                ['id_run', 'url'], [])
+
+        for url in urls:
+            with self._lock, self._connection.cursor() as cursor:
+                cursor.execute(insert_pending_query, (self.id_run, url, self.PENDING))
+                self._connection.commit()
+
+            yield url
+
+    def get_unfinished_urls(self):
+        """Returns the urls of the run that were not stored yet, including the failed ones."""
+        with self._connection.cursor() as cursor:
+            cursor.execute("SELECT url FROM runs_cities WHERE id_run = %s AND state != %s;", (self.id_run, self.STORED))
+            urls = [url for url, in cursor.fetchall()]
+
+        self._logger.info(f"The run #{self.id_run} has {len(urls)} unfinished cities.")
+        return urls
@@ -0,0 +1,233 @@
+import json
+import os
+import shutil
+import time
+import numpy as np
+import conf as cfg
+from logger import Logger
+from db.climate import parse_condition
+from db.storage import SHOW_COLUMNS, SORT_COLUMNS
+
+# Columns of the city_scores summary kept in the snapshot. The texts are stored as codes of the string dictionary.
+STRING_COLUMNS = ['name', 'country', 'continent', 'overall_score', 'cost', 'internet', 'fun', 'safety']
+VALUE_COLUMNS = ['overall_score_value', 'fun_value']
+
+# Tabs whose numeric values are kept as a matrix of cities by attributes, by the name of their file.
+ATTRIBUTE_TABS = {'scores': 'Scores', 'cost_of_living': 'Cost of Living'}
+
+# Code of the missing texts, and rank of the cities without one.
+NULL_CODE = -1
+
+
+def parse_value_condition(condition):
+    """
+    Given a condition on a numeric value of a tab of the snapshot, like 'cost_of_living:Nomad cost::2500' or
+    'scores:Internet:0.6:', returns the tab, the attribute, and its min and max values (None if there is no bound).
+    """
+    tab, __, attribute_condition = condition.partition(':')
+    try:
+        return (tab, *parse_condition(attribute_condition))
+    except ValueError:
+        raise ValueError(f"The condition {condition} should be like TAB:ATTRIBUTE:MIN:MAX "
+                         f"(eg: cost_of_living:Nomad cost::2500, scores:Internet:0.6:).")
+
+
+class CitySnapshot:
+    """
+    Columnar snapshot of the stored cities, to query them without the database.
+    Each column of the city_scores summary is a NumPy array in its own .npy file, and the texts are codes of a string
+    dictionary sorted without case, so sorting by the codes sorts by the texts. The numeric values of the Scores and
+    Cost of Living tabs are matrices of cities by attributes.
+    The arrays are memory-mapped when the snapshot is opened, so a query only reads the columns it uses.
+    """
+
+    META = 'meta.json'
+
+    def __init__(self, directory=cfg.SNAPSHOT['directory'], logger=None, verbose=False):
+        if logger is None:
+            logger = Logger(verbose=verbose).logger
+
+        self._logger = logger
+        self._directory = directory
+        self._columns = {}
+        self._meta = None
+        self._strings = self._folded_strings = self._collation = None
+
+    def __enter__(self):
+        """Memory-maps the columns of the snapshot."""
+        try:
+            with open(os.path.join(self._directory, self.META), 'r') as meta_file:
+                self._meta = json.load(meta_file)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"There is no snapshot in {self._directory}. Run the snapshot command first.")
+
+        self._strings = np.array(self._meta['strings'], dtype=object)
+        self._folded_strings = np.array([string.casefold() for string in self._meta['strings']], dtype=object)
+        # Sort key of each code. The strings that are equal without case have the same key, as in the databases.
+        self._collation = np.unique(self._folded_strings, return_inverse=True)[1] if len(self._strings) else \
+            np.empty(0, dtype=np.int64)
+        for column in ['id_city', 'city_rank', *STRING_COLUMNS, *VALUE_COLUMNS, *ATTRIBUTE_TABS]:
+            self._columns[column] = np.load(os.path.join(self._directory, f"{column}.npy"), mmap_mode='r')
+
+        self._logger.info(f"Snapshot of {self._meta['cities']} cities, taken on {self._meta['taken_on']} "
+                          f"(data version {self._meta['data_version']}).")
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._columns = {}
+
+    def __len__(self):
+        return self._meta['cities']
+
+    def export(self, storage):
+        """
+        Given an opened storage, reads the city_scores summary and the numeric attributes of the cities, and writes
+        them as the new snapshot. The files are written in a temporary directory that replaces the old snapshot.
+        Returns the number of cities.
+        """
+        started = time.perf_counter()
+        data_version = storage.get_data_version()
+
+        rows = list(storage.get_city_scores(['city_rank', *STRING_COLUMNS, *VALUE_COLUMNS]))
+        ids = {row[0]: i for i, row in enumerate(rows)}
+        columns = dict(zip(['id_city', 'city_rank', *STRING_COLUMNS, *VALUE_COLUMNS], zip(*rows))) if rows else {}
+
+        strings = sorted({value for column in STRING_COLUMNS for value in columns.get(column, []) if value is not None},
+                         key=lambda value: (value.casefold(), value))
+        codes = {value: code for code, value in enumerate(strings)}
+
+        arrays = {'id_city': np.array(columns.get('id_city', []), dtype=np.int64),
+                  'city_rank': np.array([NULL_CODE if rank is None else rank
+                                         for rank in columns.get('city_rank', [])], dtype=np.int64)}
+        for column in STRING_COLUMNS:
+            arrays[column] = np.array([NULL_CODE if value is None else codes[value]
+                                       for value in columns.get(column, [])], dtype=np.int32)
+        for column in VALUE_COLUMNS:
+            arrays[column] = np.array([np.nan if value is None else value
+                                       for value in columns.get(column, [])], dtype=np.float64)
+
+        attributes = {}
+        for name, tab_name in ATTRIBUTE_TABS.items():
+            values = [(ids[id_city], attribute, value) for id_city, attribute, value
+                      in storage.get_attribute_values(tab_name) if id_city in ids]
+            attributes[name] = sorted({attribute for __, attribute, __ in values})
+            positions = {attribute: i for i, attribute in enumerate(attributes[name])}
+
+            # Fortran order keeps each attribute contiguous, so reading one attribute is a sequential read.
+            matrix = np.full((len(rows), len(positions)), np.nan, order='F')
+            if values:
+                cities, attribute_names, attribute_values = zip(*values)
+                matrix[list(cities), [positions[attribute] for attribute in attribute_names]] = attribute_values
+            arrays[name] = matrix
+
+        meta = {'cities': len(rows), 'data_version': data_version, 'taken_on': time.strftime('%Y-%m-%d %H:%M:%S'),
+                'strings': strings, 'attributes': attributes}
+        self._write(arrays, meta)
+
+        self._logger.info(f"Snapshot of {len(rows)} cities written in {self._directory} "
+                          f"({time.perf_counter() - started:.2f} seconds).")
+        return len(rows)
+
+    def _write(self, arrays, meta):
+        tmp_directory = f"{self._directory}.{os.getpid()}.tmp"
+        os.makedirs(tmp_directory, exist_ok=True)
+
+        for column, array in arrays.items():
+            np.save(os.path.join(tmp_directory, f"{column}.npy"), array)
+        with open(os.path.join(tmp_directory, self.META), 'w') as meta_file:
+            json.dump(meta, meta_file)
+
+        shutil.rmtree(self._directory, ignore_errors=True)
+        os.replace(tmp_directory, self._directory)
+
+    def _codes_of(self, value):
+        """Given a text, returns the codes of the strings that are equal to it without case."""
+        return np.flatnonzero(self._folded_strings == value.casefold())
+
+    def _sort_keys(self, sort_column, order):
+        """
+        Returns the keys to sort the cities by the column, the rank and the id, in the order of the query. The cities
+        without a value come first in ASC order, and last in DESC order, as in the databases.
+        """
+        ranks = self._columns['city_rank']
+        if sort_column in VALUE_COLUMNS:
+            values = np.where(np.isnan(self._columns[sort_column]), -np.inf, self._columns[sort_column])
+        elif sort_column in STRING_COLUMNS:
+            codes = self._columns[sort_column]
+            values = np.where(codes == NULL_CODE, NULL_CODE, self._collation[np.maximum(codes, 0)]).astype(np.float64)
+        else:
+            values = np.asarray(ranks, dtype=np.float64)
+
+        ids = self._columns['id_city']
+        if order == 'DESC':
+            return -values, -ranks, -ids
+        return values, np.asarray(ranks), np.asarray(ids)
+
+    def get_values(self, tab, attribute):
+        """
+        Given the name of the file of a tab (eg: 'cost_of_living') and one of its attributes in any case, returns its
+        value in each city, with NaN for the cities without one.
+        """
+        if tab not in ATTRIBUTE_TABS:
+            raise ValueError(f"The snapshot has no tab {tab}. The tabs are: {', '.join(ATTRIBUTE_TABS)}.")
+
+        attributes = self._meta['attributes'][tab]
+        positions = {name.casefold(): i for i, name in enumerate(attributes)}
+        if (position := positions.get(attribute.casefold())) is None:
+            raise ValueError(f"The tab {tab} of the snapshot has no attribute {attribute}. The attributes are: "
+                             f"{', '.join(attributes)}.")
+
+        return self._columns[tab][:, position]
+
+    def filter_cities_by(self, *args, num_of_cities=None, country=None, continent=None, rank_from=None, rank_to=None,
+                         after=None, where=None, sorted_by, order, **kwargs):
+        """
+        Given the filter criteria of the show command, yields the same cities as the query of the storage, with
+        vectorized operations over the columns: a mask of the filters, a sort by the column and the rank, and the
+        first cities of the result.
+        The conditions of where (eg: 'cost_of_living:Nomad cost::2500') filter by the values of the Scores and Cost of
+        Living tabs. A missing value never matches.
+        """
+        sort_column = SORT_COLUMNS.get(sorted_by, 'city_rank')
+        order = 'DESC' if order == 'DESC' else 'ASC'
+        ranks = self._columns['city_rank']
+
+        mask = np.ones(len(self), dtype=bool)
+        if country:
+            mask &= np.isin(self._columns['country'], self._codes_of(country))
+        if continent:
+            mask &= np.isin(self._columns['continent'], self._codes_of(continent))
+        if rank_from:
+            mask &= ranks >= rank_from
+        if rank_to:
+            mask &= ranks <= rank_to
+        for tab, attribute, low, high in map(parse_value_condition, where or []):
+            attribute_values = self.get_values(tab, attribute)
+            matches = ~np.isnan(attribute_values)
+            if low is not None:
+                matches &= attribute_values >= low
+            if high is not None:
+                matches &= attribute_values <= high
+            mask &= matches
+
+        values, rank_keys, id_keys = self._sort_keys(sort_column, order)
+        if after is not None:
+            # Keyset condition: the cities whose keys come after the keys of the city with the given id.
+            if not (positions := np.flatnonzero(self._columns['id_city'] == after)).size:
+                raise ValueError(f"There is no city with the id {after} to show the cities after it.")
+            after_value, after_rank, after_id = values[positions[0]], rank_keys[positions[0]], id_keys[positions[0]]
+            mask &= (values > after_value) | (values == after_value) & (
+                (rank_keys > after_rank) | (rank_keys == after_rank) & (id_keys > after_id))
+
+        selected = np.flatnonzero(mask)
+        selected = selected[np.lexsort((id_keys[selected], rank_keys[selected], values[selected]))]
+        if num_of_cities:
+            selected = selected[:num_of_cities]
+
+        self._logger.debug(f"{len(selected)} cities of the snapshot match the filters.")
+
+        columns = [self._columns[column][selected] for column in SHOW_COLUMNS]
+        for row in zip(*columns):
+            id_city, rank, *codes = row
+            yield (int(id_city), None if rank == NULL_CODE else int(rank),
+                   *[None if code == NULL_CODE else self._strings[code] for code in codes])
@@ -0,0 +1,157 @@
+import os
+import re
+import sqlite3
+from conf import SQLITE, MYSQL_IDENTITY_CACHE_SIZE
+from logger import Logger
+from db.storage import Storage
+
+# Index of a step of the plan of a query (eg: 'SEARCH cities USING INDEX idx_cities_rank (city_rank>?)').
+INDEX_STEP = re.compile(r'USING (?:COVERING )?INDEX (\w+)')
+
+
+class SQLiteCursor(sqlite3.Cursor):
+    """Cursor with the interface of the pymysql ones: %s placeholders, a single value as the params, and with."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @staticmethod
+    def _params(params):
+        if params is None:
+            return ()
+        return tuple(params) if isinstance(params, (list, tuple)) else (params,)
+
+    def execute(self, query, params=None):
+        return super().execute(query.replace('%s', '?'), self._params(params))
+
+    def executemany(self, query, values):
+        return super().executemany(query.replace('%s', '?'), [self._params(row) for row in values])
+
+
+class SQLiteConnection(sqlite3.Connection):
+    """Connection to an SQLite file. The statements run in the process, so there are no round trips to a server."""
+
+    round_trips = 0
+
+    def cursor(self, factory=SQLiteCursor):
+        return super().cursor(factory)
+
+
+class SQLiteStorage(Storage):
+    """
+    Class that knows how to store the cities in an SQLite file, with the same schema and upserts as in MySQL.
+    The database runs in the process, so the whole pipeline runs on one machine, without a round trip per statement.
+    The file is in WAL mode, so the show command can read while the cities are written, and each batch of cities is
+    written in one transaction. The writers of many threads wait for each other to take the lock of the file.
+    """
+
+    def __init__(self, path=SQLITE['path'], logger=None, cache_size=MYSQL_IDENTITY_CACHE_SIZE, query_cache=None,
+                 verbose=False):
+        super().__init__(logger=logger, cache_size=cache_size, query_cache=query_cache, verbose=verbose)
+        self._path = path
+
+    def __enter__(self):
+        self._connection = self.connect(self._path)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._log_caches()
+        self._connection.close()
+
+    @classmethod
+    def connect(cls, path=SQLITE['path']):
+        if directory := os.path.dirname(path):
+            os.makedirs(directory, exist_ok=True)
+
+        # The connection of the run journal is shared by the writer threads, which take turns with a lock.
+        connection = sqlite3.connect(path, timeout=SQLITE['busy_timeout'], check_same_thread=False,
+                                     factory=SQLiteConnection)
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA journal_mode = WAL;")
+            # In WAL mode, the commits are durable after a checkpoint, and they don't wait to sync the file.
+            cursor.execute("PRAGMA synchronous = NORMAL;")
+            cursor.execute("PRAGMA foreign_keys = ON;")
+
+        return connection
+
+    @staticmethod
+    def create_database(*args, path=SQLITE['path'], **kwargs):
+        """Creates the SQLite NomadList Schema in which to store all the scrapped data."""
+
+        logger = Logger(verbose=kwargs.get('verbose')).logger
+
+        if kwargs.get('force', False):
+            logger.info(f"Removing the database {path}...")
+            for file_path in [path, f"{path}-wal", f"{path}-shm"]:
+                if os.path.exists(file_path):
+                    os.remove(file_path)
+
+        logger.info("About to read the SQL file to create the schemas...")
+        with open('create_schemas_sqlite.sql', 'r') as sql_code_file:
+            script_file = sql_code_file.read()
+
+        connection = SQLiteStorage.connect(path)
+        try:
+            connection.executescript(script_file)
+            connection.commit()
+        finally:
+            connection.close()
+
+        logger.info(f"Script successfully executed! The database is {path}.")
+
+    @staticmethod
+    def upsert_query(table, columns, key_columns, updated_columns, select=None):
+        # The WHERE of the select tells SQLite that the ON CONFLICT is not the ON of a join.
+        rows = f"SELECT * FROM ({select}) WHERE true" if select else f"VALUES ({', '.join(['%s'] * len(columns))})"
+
+        if not updated_columns:
+            return f"INSERT OR IGNORE INTO {table} ({', '.join(columns)}) {rows}"
+
+        return f"""
+        INSERT INTO {table}
+        ({', '.join(columns)})
+        {rows}
+            ON CONFLICT ({', '.join(key_columns)}) DO UPDATE
+            SET {', '.join([f"{column} = excluded.{column}" for column in updated_columns])}
+        """
+
+    @staticmethod
+    def seconds_from_now():
+        return "datetime('now', %s || ' seconds')"
+
+    @staticmethod
+    def update_first_rows_query(table, assignments, condition, order_by):
+        # SQLite has no LIMIT in the UPDATE, so the rows are taken by a subquery. The writes take the lock of the file,
+        # so two workers never update the same rows at once.
+        return f"""
+        UPDATE {table} SET {assignments}
+        WHERE id IN (SELECT id FROM {table} WHERE {condition} ORDER BY {order_by} LIMIT %s)
+        """
+
+    @staticmethod
+    def _upsert_rows_query(table, columns, num_rows, domain_identifier):
+        # Only the row with the same domain identifier is updated. The collisions in other unique columns are ignored.
+        updates = [f"{column} = excluded.{column}" for column in columns if column != domain_identifier]
+        values_template = f"({', '.join(['%s'] * len(columns))})"
+        update_clause = f"ON CONFLICT ({domain_identifier}) DO UPDATE SET {', '.join(updates)}" if updates else ''
+
+        return f"""
+        INSERT INTO {table}
+        ({', '.join(columns)})
+        VALUES {', '.join([values_template] * num_rows)}
+            {update_clause}
+            ON CONFLICT DO NOTHING
+        """
+
+    def explain(self, query, params):
+        # EXPLAIN QUERY PLAN describes each step as text (eg: 'SEARCH reviews USING COVERING INDEX idx_... (id_city=?)').
+        # SQLite has no possible keys, so the chosen index is the only one.
+        with self._connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {query}", params)
+            indexes = [(match.group(1) if (match := INDEX_STEP.search(detail)) else None, detail)
+                       for __, __, __, detail in cursor.fetchall()]
+
+        return [{'key': index, 'possible_keys': index, 'Extra': detail} for index, detail in indexes]
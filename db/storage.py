@@ -0,0 +1,839 @@
+import json
+from collections import defaultdict
+from conf import MYSQL_IDENTITY_CACHE_SIZE, QUERY_CACHE
+from logger import Logger
+from db.identity_cache import IdentityCache
+from db.index_checks import check_indexes
+from db.query_builder import SelectQuery
+from scrapper.number_parser import to_number
+from datetime import date, datetime
+
+# Tables of the rows that depend on the id of the city: their columns, the columns of their unique key, and the columns
+# updated when the row already exists. Without updated columns, the existing rows are kept.
+# Inside a batch, they are written grouped by table, in order.
+BATCH_TABLES = {
+    'city_attributes': (['id_city', 'id_attribute', 'description', 'attribute_value', 'url'],
+                        ['id_city', 'id_attribute'],
+                        ['description', 'attribute_value', 'url']),
+    'monthly_weathers_attributes': (['id_city', 'id_attribute', 'month_number', 'attribute_value', 'description',
+                                     'value_number'],
+                                    ['id_city', 'id_attribute', 'month_number'],
+                                    ['attribute_value', 'description', 'value_number']),
+    'photos': (['id_city', 'src'], ['id_city', 'src'], []),
+    'pros_and_cons': (['id_city', 'description', 'type'], ['id_city', 'type', 'description'], []),
+    'reviews': (['id_city', 'description', 'published_date'], [], []),
+    'cities_relationships': (['id_city', 'id_related_city', 'type'], ['id_city', 'id_related_city', 'type'], [])
+}
+
+# Main scores of the Scores tab, summarized in the city_scores table. Their attributes are named like '⭐️ Overall Score'.
+MAIN_SCORES = ['Overall Score', 'Cost', 'Internet', 'Fun', 'Safety']
+
+# Columns of the city_scores summary shown by the show command.
+SHOW_COLUMNS = ['id_city', 'city_rank', 'name', 'country', 'continent', 'overall_score', 'cost', 'internet', 'fun', 'safety']
+
+# Column of the city_scores summary of each sorting criteria of show. The overall score and the fun are sorted by their
+# value, and the rest of the scores by their description.
+SORT_COLUMNS = {
+    'rank': 'city_rank',
+    'name': 'name',
+    'country': 'country',
+    'continent': 'continent',
+    'overall score': 'overall_score_value',
+    'cost': 'cost',
+    'internet': 'internet',
+    'fun': 'fun_value',
+    'safety': 'safety'
+}
+
+
+class Storage:
+    """
+    Abstract class for the databases that store the scrapped cities, with the same schema and upsert semantics.
+    It knows how to turn the details of the cities into rows, and how to read the summary of their scores.
+    Each backend knows how to connect to its database, and how to write the upserts in its own SQL.
+    The statements are written with %s placeholders, and the cursors of every backend accept them.
+    """
+
+    def __init__(self, logger=None, cache_size=MYSQL_IDENTITY_CACHE_SIZE, query_cache=None, verbose=False):
+        if logger is None:
+            logger = Logger(verbose=verbose).logger
+        self._logger = logger
+        self._connection = None
+        # QueryCache of the results of filter_cities_by, if there is one.
+        self._query_cache = query_cache
+
+        # Ids of the rows by their domain identifier. The attributes are identified by (id_tab, name).
+        self.continents_cache = IdentityCache('continents', cache_size)
+        self.currencies_cache = IdentityCache('currencies', cache_size)
+        self.countries_cache = IdentityCache('countries', cache_size)
+        self.cities_cache = IdentityCache('cities', cache_size)
+        self.tabs_cache = IdentityCache('tabs', cache_size)
+        self.attributes_cache = IdentityCache('attributes', cache_size)
+        self._caches_warmed = False
+
+    def __enter__(self):
+        raise NotImplementedError
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        raise NotImplementedError
+
+    @staticmethod
+    def create_database(*args, **kwargs):
+        """Creates the schema in which to store all the scrapped data."""
+        raise NotImplementedError
+
+    @classmethod
+    def connect(cls):
+        """Returns a new connection to the database, whose cursors accept the %s placeholders."""
+        raise NotImplementedError
+
+    @staticmethod
+    def upsert_query(table, columns, key_columns, updated_columns, select=None):
+        """
+        Given the table, its columns, the columns of its unique key, and the columns to update when the row exists,
+        returns the statement that upserts one row, or the rows of the select if it's given.
+        Without updated columns, the existing rows are kept.
+        """
+        raise NotImplementedError
+
+    @staticmethod
+    def _upsert_rows_query(table, columns, num_rows, domain_identifier):
+        """
+        Given the table, the columns of the rows, and their number, returns the multi-row upsert of _upsert_and_get_ids.
+        Only the row with the same domain identifier is updated. If a row collides with another one in a different
+        unique column, the existing row is not modified.
+        """
+        raise NotImplementedError
+
+    @staticmethod
+    def seconds_from_now():
+        """Returns the SQL expression of the timestamp that is some seconds, given as a param, after the current one."""
+        raise NotImplementedError
+
+    @staticmethod
+    def update_first_rows_query(table, assignments, condition, order_by):
+        """
+        Given the table, the assignments of the SET, the condition and the order, returns the statement that updates
+        the first rows that match the condition. The number of rows is the last param.
+        """
+        raise NotImplementedError
+
+    def explain(self, query, params):
+        """
+        Given a query and its params, returns its plan: a dict per table with the key that was chosen ('key'),
+        the possible keys ('possible_keys') and the extra info ('Extra'), as in the EXPLAIN of MySQL.
+        """
+        raise NotImplementedError
+
+    def check_indexes(self):
+        """Explains the main queries of the scrapper and the show command, and checks that they can use their index."""
+        return check_indexes(self.explain, self._logger)
+
+    @property
+    def round_trips(self):
+        """Number of round trips to the server made by the connection."""
+        return self._connection.round_trips
+
+    def _log_caches(self):
+        if self._caches_warmed:
+            for cache in self._get_caches():
+                self._logger.debug(f"Identity cache of the {cache}")
+
+    def _get_caches(self):
+        return [self.continents_cache, self.currencies_cache, self.countries_cache, self.cities_cache, self.tabs_cache,
+                self.attributes_cache]
+
+    def _warm_caches(self):
+        """Loads the ids of the stored rows in the identity caches, with one query per table."""
+        warm_queries = [
+            (self.continents_cache, "SELECT name, id FROM continents WHERE name IS NOT NULL;"),
+            (self.currencies_cache, "SELECT code, id FROM currencies WHERE code IS NOT NULL;"),
+            (self.countries_cache, "SELECT name, id FROM countries WHERE name IS NOT NULL;"),
+            (self.cities_cache, "SELECT name, id FROM cities WHERE name IS NOT NULL;"),
+            (self.tabs_cache, "SELECT name, id FROM tabs WHERE name IS NOT NULL;"),
+            (self.attributes_cache, "SELECT id_tab, name, id FROM attributes WHERE name IS NOT NULL;")
+        ]
+
+        with self._connection.cursor() as cursor:
+            for cache, query in warm_queries:
+                cursor.execute(query)
+                cache.load(cursor.fetchall())
+                self._logger.info(f"Identity cache of the {cache.name} warmed with {len(cache)} ids.")
+
+        self._caches_warmed = True
+
+    def _get_or_upsert_ids(self, cache, table, rows, domain_identifier='name'):
+        """
+        Given the identity cache of the table, and the rows by their domain identifier, takes the ids from the cache.
+        The rows that haven't been added yet are upserted together, and their ids are added to the cache.
+        It returns a dict {domain identifier: id} with all the rows.
+        """
+        ids = cache.get_many(rows)
+
+        if new_rows := [row for key, row in rows.items() if key not in ids]:
+            new_ids = self._upsert_and_get_ids(table, new_rows, domain_identifier)
+            cache.update(new_ids)
+            ids.update(new_ids)
+
+        return ids
+
+    def _upsert_continents_and_get_ids(self, cities_details):
+        """Given the details of the cities, returns a dict {name: id} with their continents."""
+        names = {details.get('continent') for details in cities_details} - {None}
+        return self._get_or_upsert_ids(self.continents_cache, 'continents', {name: {'name': name} for name in names})
+
+    def _upsert_countries_and_get_ids(self, continents, cities_details):
+        """
+        Given the ids of the continents, and the details of the cities, returns a dict {name: id} with their countries.
+        The new countries are upserted with their currencies.
+        """
+        countries = {}
+
+        for details in cities_details:
+            # The details are not modified, so they can be written again if the transaction is rolled back.
+            country = dict(details.get('country') or {})
+            name = country.pop('name', None)
+
+            if name is not None:
+                countries[name] = {'name': name, 'id_continent': continents.get(details.get('continent')), **country}
+
+        currencies = {currency['code']: currency for country in countries.values()
+                      if (currency := country.get('currency')) and currency.get('code')}
+        currencies_ids = self._get_or_upsert_ids(self.currencies_cache, 'currencies', currencies, 'code')
+
+        for country in countries.values():
+            currency = country.pop('currency', None)
+            country['id_currency'] = currencies_ids.get(currency.get('code')) if currency else None
+
+        return self._get_or_upsert_ids(self.countries_cache, 'countries', countries)
+
+    def _upsert_cities_and_get_ids(self, cities_details):
+        """
+        Given the details from Nomad List and the Aviation Stack API of many cities, upserts their continents,
+        countries and the cities themselves, with one statement per table. Then, it returns the ids of the cities.
+        """
+        additional_fields = ['iata_code', 'latitude', 'longitude', 'timezone', 'gmt', 'geoname_id']
+
+        continents = self._upsert_continents_and_get_ids(cities_details)
+        countries = self._upsert_countries_and_get_ids(continents, cities_details)
+
+        cities = {details.get('city'): {'name': details.get('city'), 'city_rank': details.get('rank'),
+                                        'id_country': countries.get((details.get('country') or {}).get('name')),
+                                        **{key: details.get(key) for key in additional_fields}}
+                  for details in cities_details}
+        # The cities are always updated, but only the ids of the new ones are selected.
+        ids = self._upsert_and_get_ids('cities', list(cities.values()), known_ids=self.cities_cache.get_many(cities))
+        self.cities_cache.update(ids)
+
+        if missing := [name for name in cities if ids.get(name) is None]:
+            raise ValueError(f"The cities {missing} could not be upserted. Another city has the same unique values.")
+
+        return [ids.get(details.get('city')) for details in cities_details]
+
+    def _upsert_and_get_ids(self, table, rows, domain_identifier='name', known_ids=None):
+        """
+            Upsert many rows in a table, and returns their ids.
+            @param table: Name of the SQL table.
+            @param rows: List of dictionaries with column names as keys, and values as values of the dictionaries.
+            @param domain_identifier: The unique column that identifies a row of the table in the domain.
+            @param known_ids: Dictionary {domain identifier: id} of the rows whose id doesn't need to be selected.
+
+            @return: Dictionary {domain identifier: id} with the ids of the upserted rows.
+
+            Given the table name and the rows, writes all of them with one multi-row upsert (one per set of columns),
+            and then takes all the ids with one SELECT.
+            If a row collides with another one in a different unique column, the existing row is not modified,
+            and the id of the new one is None.
+        """
+
+        if not rows:
+            return {}
+
+        # The rows are always written in the same order, so concurrent writers lock them in the same order too.
+        rows_by_columns = defaultdict(list)
+        for row in sorted(rows, key=lambda row: str(row[domain_identifier])):
+            rows_by_columns[tuple(row.keys())].append(row)
+
+        with self._connection.cursor() as cursor:
+            for columns, columns_rows in rows_by_columns.items():
+                upsert_query = self._upsert_rows_query(table, columns, len(columns_rows), domain_identifier)
+                values = [row[column] for row in columns_rows for column in columns]
+
+                self._logger.info(f"Upserting {len(columns_rows)} rows in the table {table}...")
+                self._logger.debug(f"Query: {upsert_query} - Values: {values}")
+                cursor.execute(upsert_query, values)
+
+            known_ids = known_ids or {}
+            identifiers = list({row[domain_identifier] for row in rows} - known_ids.keys())
+
+            if not identifiers:
+                return dict(known_ids)
+
+            select_query = f"""
+            SELECT {domain_identifier}, id FROM {table}
+            WHERE {domain_identifier} IN ({', '.join(['%s'] * len(identifiers))})
+            """
+
+            self._logger.info(f"Selecting the ids of the {table}...")
+            self._logger.debug(f"Query: {select_query} - Values: {identifiers}")
+            cursor.execute(select_query, identifiers)
+            stored_ids = dict(cursor.fetchall())
+
+        def fold(identifier):
+            return identifier.casefold() if isinstance(identifier, str) else identifier
+
+        # The identifiers are compared without case, so the stored one could be written in a different way.
+        folded_ids = {fold(identifier): row_id for identifier, row_id in stored_ids.items()}
+        new_ids = {identifier: stored_ids.get(identifier, folded_ids.get(fold(identifier))) for identifier in identifiers}
+        return {**known_ids, **new_ids}
+
+    def _upsert_tab_and_attributes(self, tab_name, tab_info):
+        """
+        Given the name of the tab, and its information, takes all the attributes,
+        then creates the rows for the tab table and the attributes one.
+        The ids are resolved with the identity caches, so only the attributes that weren't seen before are inserted.
+        Returns the ids and the names of the attributes of the tab information.
+
+        @param tab_name: Name of the tab.
+        @param tab_info: Tab information.
+        """
+
+        insert_tabs_query = self.upsert_query('tabs', ['name'], ['name'], [])
+        insert_attributes_query = self.upsert_query('attributes', ['name', 'id_tab'], ['name', 'id_tab'], [])
+
+        with self._connection.cursor() as cursor:
+            if (id_tab := self.tabs_cache.get(tab_name)) is None:
+                self._logger.debug(f"Trying to insert a new tab {tab_name}")
+                cursor.execute(insert_tabs_query, tab_name)
+
+                # Selecting the id of the tab name {tab_name}
+                cursor.execute("SELECT id FROM tabs WHERE name = %s;", tab_name)
+                id_tab, = cursor.fetchone()
+
+                self.tabs_cache.update({tab_name: id_tab})
+            else:
+                self._logger.debug(f"The tab {tab_name} was created before, taking the id from the cache...")
+
+            ids = self.attributes_cache.get_many((id_tab, attribute) for attribute in tab_info.keys())
+
+            if new_attributes := sorted(attribute for attribute in tab_info.keys() if (id_tab, attribute) not in ids):
+                # Inserting the new ATTRIBUTE NAMES into attributes table
+                self._logger.info(f"Inserting {len(new_attributes)} new attributes for the tab {tab_name}...")
+                values = [(attribute, id_tab) for attribute in new_attributes]
+                self._logger.debug(f"Query: {insert_attributes_query} - Values: {values}")
+                cursor.executemany(insert_attributes_query, values)
+
+                # Selecting the ids of the new ATTRIBUTE NAMES
+                select_attributes_query = f"""
+                SELECT id_tab, name, id FROM attributes
+                WHERE id_tab = %s AND name IN ({', '.join(['%s'] * len(new_attributes))})
+                """
+                cursor.execute(select_attributes_query, [id_tab, *new_attributes])
+                new_ids = {(id_tab, name): id_attribute for id_tab, name, id_attribute in cursor.fetchall()}
+
+                self.attributes_cache.update(new_ids)
+                ids.update(new_ids)
+
+        return [(id_attribute, name) for (__, name), id_attribute in ids.items()]
+
+    def _upsert_key_value_tab_info(self, id_city, tab_name, tab_info, rows):
+        """
+        Given the name of the tab, and its information, adds the rows of the city_attributes table to the batch.
+
+        @param id_city: Id of the current city.
+        @param tab_name: Name of the tab.
+        @param tab_info: Tab information.
+        @param rows: Rows of the batch by table.
+        """
+
+        attributes = self._upsert_tab_and_attributes(tab_name, tab_info)
+
+        rows['city_attributes'] += [(id_city, id_attribute, info[0], info[1], info[2] if len(info) > 2 else None)
+                                    for id_attribute, attribute in attributes if (info := tab_info.get(attribute))]
+
+    def _upsert_weather(self, id_city, details, rows):
+        """
+        Given the id and the details of the city, adds the rows of the weather information to the batch.
+        The number of each value was parsed by the scrapper. The details saved before it are parsed here.
+
+        @param id_city: Id of the current city.
+        @param details: Details of the city to take the info of the weather tab.
+        @param rows: Rows of the batch by table.
+        """
+
+        tab_name = 'Weather'
+        tab_info = details.get('Weather', {})
+
+        attributes = self._upsert_tab_and_attributes(tab_name, tab_info)
+
+        rows['monthly_weathers_attributes'] += [
+            (id_city, id_attribute, i + 1, value, description, number[0] if number else to_number(value))
+            for id_attribute, attribute in attributes
+            for i, (__, value, description, *number) in enumerate(tab_info.get(attribute, []))]
+
+    @staticmethod
+    def _upsert_many(table, id_city, values, rows):
+        """
+        Given the table, the id of the city, and the values to insert, adds them to the rows of the table in the batch.
+
+        @param table: Name of the table in the Database.
+        @param id_city: Id of the current city.
+        @param values: List of tuples with values to insert into the table. It's not necessary to add the id_city.
+        @param rows: Rows of the batch by table.
+        """
+
+        rows[table] += [(id_city,) + (tuple_of_values if isinstance(tuple_of_values, tuple) else (tuple_of_values,))
+                        for tuple_of_values in values]
+
+    def _upsert_reviews(self, id_city, details, rows):
+        select_last_published_date = "SELECT MAX(published_date) FROM reviews WHERE id_city = %s"
+        with self._connection.cursor() as cursor:
+            self._logger.info(f"Selecting the last published date of the reviews of the city {id_city}...")
+            cursor.execute(select_last_published_date, id_city)
+            (last_date,) = cursor.fetchone()
+
+        # SQLite has no date type, so it returns the text of the date.
+        if isinstance(last_date, str):
+            last_date = date.fromisoformat(last_date)
+
+        # The same city can be twice in a batch (eg: under two urls), and the reviews of the batch aren't in the table
+        # until it's written, so the ones already added to the batch are skipped.
+        batch_reviews = {row for row in rows['reviews'] if row[0] == id_city}
+        reviews = [(desc, published_date) for (desc, published_date) in details.get('Reviews', [])
+                   if (id_city, desc, published_date) not in batch_reviews
+                   and (not last_date or datetime.strptime(published_date, '%Y-%m-%d').date() > last_date)]
+
+        self._upsert_many('reviews', id_city, reviews, rows)
+
+    def _insert_relationships(self, cities, rows):
+        """
+        Given the ids and the details of the cities of the batch, inserts the near, next, or similar cities,
+        and adds the relationships between them to the batch.
+
+        @param cities: List of tuples with the id and the details of each city.
+        @param rows: Rows of the batch by table.
+        """
+
+        types = ['Near', 'Next', 'Similar']
+        names = list({name for __, details in cities for type_name in types for name in details.get(type_name, [])})
+
+        ids = self.cities_cache.get_many(names)
+
+        if new_names := sorted(name for name in names if name not in ids):
+            insert_cities_query = self.upsert_query('cities', ['name'], ['name'], [])
+            select_cities_query = f"SELECT id, name FROM cities WHERE name IN ({', '.join(['%s'] * len(new_names))})"
+
+            with self._connection.cursor() as cursor:
+                self._logger.info(f"Inserting cities related to the current ones...")
+                cursor.executemany(insert_cities_query, new_names)
+
+                self._logger.info(f"Selecting ids from the related cities...")
+                self._logger.debug(f"Query: {select_cities_query} - Values: {new_names}")
+                cursor.execute(select_cities_query, new_names)
+                new_ids = {name: id_related for id_related, name in cursor.fetchall()}
+
+            self.cities_cache.update(new_ids)
+            ids.update(new_ids)
+
+        rows['cities_relationships'] += [(id_city, ids[name], i)
+                                         for id_city, details in cities
+                                         for i, type_name in enumerate(types)
+                                         for name in set(details.get(type_name, [])) if name in ids]
+
+    def _upsert_city_info(self, id_city, details, tabs, rows):
+        """Given the id and the details of the city, adds the rows of the tabs to write to the batch."""
+
+        def should_write(*tab_names):
+            return tabs is None or any(tab_name in tabs for tab_name in tab_names)
+
+        if should_write('Scores'):
+            self._upsert_key_value_tab_info(id_city, 'Scores', details.get('Scores', {}), rows)
+        if should_write('DigitalNomadGuide'):
+            self._upsert_key_value_tab_info(id_city, 'Digital Nomad Guide', details.get('DigitalNomadGuide', {}), rows)
+        if should_write('CostOfLiving'):
+            # The value of each cost is parsed by the scrapper. The details saved before it are parsed here.
+            cost_of_living = {key: (description, to_number(description) if value is None else value, *url)
+                              for key, (description, value, *url) in details.get('CostOfLiving', {}).items()}
+            self._upsert_key_value_tab_info(id_city, 'Cost of Living', cost_of_living, rows)
+
+        if should_write('Photos'):
+            self._upsert_many('photos', id_city, details.get('Photos', []), rows)
+
+        if should_write('ProsAndCons'):
+            pros_and_cons = details.get('ProsAndCons')
+            pros = [(pro, 'P') for pro in pros_and_cons.get('pros')]
+            cons = [(con, 'C') for con in pros_and_cons.get('cons')]
+            self._upsert_many('pros_and_cons', id_city, pros + cons, rows)
+
+        if should_write('Reviews'):
+            self._upsert_reviews(id_city, details, rows)
+
+        if should_write('Weather'):
+            self._upsert_weather(id_city, details, rows)
+
+    def _write_rows(self, rows):
+        """Given the rows of the batch by table, writes them with one statement per table."""
+        with self._connection.cursor() as cursor:
+            for table, (columns, key_columns, updated_columns) in BATCH_TABLES.items():
+                if not (values := rows.get(table)):
+                    continue
+
+                query = self.upsert_query(table, columns, key_columns, updated_columns)
+                self._logger.info(f"Writing {len(values)} rows in the table {table}...")
+                self._logger.debug(f"Query: {query} - Values: {values}")
+                cursor.executemany(query, values)
+
+    def _write_cities(self, cities_details, cities_tabs):
+        """
+        Given the details of the cities, and the tabs to write of each one, writes all of them in one transaction.
+        Returns the ids of the cities.
+        """
+        if not self._caches_warmed:
+            self._warm_caches()
+
+        return self._write_cities_transaction(cities_details, cities_tabs)
+
+    def _rollback(self):
+        self._connection.rollback()
+
+    def _write_cities_transaction(self, cities_details, cities_tabs):
+        """
+        Writes the cities in one transaction.
+        If something fails, the transaction is rolled back, and so are the caches of ids.
+        """
+        try:
+            rows = defaultdict(list)
+            ids = self._upsert_cities_and_get_ids(cities_details)
+            for id_city, details, tabs in zip(ids, cities_details, cities_tabs):
+                self._upsert_city_info(id_city, details, tabs, rows)
+
+            self._insert_relationships([(id_city, details) for id_city, details, tabs
+                                        in zip(ids, cities_details, cities_tabs)
+                                        if tabs is None or {'Near', 'Next', 'Similar'} & set(tabs)], rows)
+            self._write_rows(rows)
+            self._upsert_city_scores(ids)
+            self._bump_data_version()
+
+            self._connection.commit()
+            for cache in self._get_caches():
+                cache.commit()
+            return ids
+        except Exception:
+            for cache in self._get_caches():
+                cache.rollback()
+
+            self._rollback()
+            raise
+
+    def insert_city_info(self, details, tabs=None):
+        """
+        Given the details of the city, insert all the necessary rows to store it in the database, in one transaction.
+        If the tabs are given (eg: {'Scores', 'Photos'}), only the information of those tabs is written.
+        Returns the id of the city.
+        """
+        id_city, = self._write_cities([details], [tabs])
+        return id_city
+
+    def insert_cities_info(self, cities_details, cities_tabs=None):
+        """
+        Given the details of many cities, stores all of them in one transaction, with the statements grouped by table.
+        If the batch fails, it's rolled back and each city is retried in its own transaction.
+        The tabs to write can be given for each city, as in insert_city_info.
+        Returns the ids of the cities, with None for the ones that couldn't be stored.
+        """
+        cities_tabs = cities_tabs or [None] * len(cities_details)
+
+        try:
+            return self._write_cities(cities_details, cities_tabs)
+        except Exception as e:
+            if len(cities_details) == 1:
+                self._logger.error(f"Exception raised trying to store the city {cities_details[0].get('city')}: {e}")
+                return [None]
+            self._logger.warning(f"The batch of {len(cities_details)} cities failed: {e}. Retrying city by city...")
+
+        ids = []
+        for details, tabs in zip(cities_details, cities_tabs):
+            try:
+                ids.append(self.insert_city_info(details, tabs))
+            except Exception as e:
+                self._logger.error(f"Exception raised trying to store the city {details.get('city')}: {e}")
+                ids.append(None)
+
+        return ids
+
+    def get_fingerprints(self):
+        """Returns the fingerprints of all the stored city pages as a dict {url: (page_hash, {tab: tab_hash})}."""
+        with self._connection.cursor() as cursor:
+            self._logger.info("Selecting the fingerprints of the stored cities...")
+            cursor.execute("SELECT url, page_hash, tabs_hashes FROM city_fingerprints;")
+            return {url: (page_hash, json.loads(tabs_hashes or '{}')) for url, page_hash, tabs_hashes in cursor}
+
+    def upsert_fingerprints(self, fingerprints):
+        """
+        Given a list of tuples (url, id_city, page_hash, tabs_hashes), stores the hash of each page
+        and the hashes of its tabs in one transaction.
+        """
+        upsert_fingerprint_query = self.upsert_query('city_fingerprints', ['url', 'id_city', 'page_hash', 'tabs_hashes'],
+                                                     ['url'], ['id_city', 'page_hash', 'tabs_hashes'])
+
+        values = [(url, id_city, page_hash, json.dumps(tabs_hashes))
+                  for url, id_city, page_hash, tabs_hashes in fingerprints]
+
+        with self._connection.cursor() as cursor:
+            self._logger.info(f"Upserting {len(values)} fingerprints...")
+            cursor.executemany(upsert_fingerprint_query, values)
+            self._connection.commit()
+
+    def _upsert_city_scores(self, ids=None):
+        """
+        Given the ids of the cities, writes their rows of the city_scores summary, pivoting the main scores of the
+        Scores tab into columns: the description of each score, and its value. Without ids, it writes all the cities.
+        """
+        score_columns = [score.lower().replace(' ', '_') for score in MAIN_SCORES]
+        select_columns = [expression
+                          for column in score_columns
+                          for expression in [
+                              f"SUBSTR(GROUP_CONCAT(CASE WHEN attribute.name LIKE %s THEN city_attribute.description "
+                              f"END), 1, 255) AS {column}",
+                              f"SUM(CASE WHEN attribute.name LIKE %s THEN city_attribute.attribute_value END) "
+                              f"AS {column}_value"]]
+        columns = ['id_city', 'city_rank', 'name', 'country', 'continent',
+                   *[name for column in score_columns for name in [column, f"{column}_value"]]]
+
+        select_query = f"""
+            SELECT city.id AS id_city, city.city_rank, city.name, country.name AS country, continent.name AS continent,
+                {', '.join(select_columns)}
+            FROM cities city
+            JOIN countries country ON city.id_country = country.id
+            JOIN continents continent ON country.id_continent = continent.id
+            JOIN city_attributes city_attribute ON city.id = city_attribute.id_city
+            JOIN attributes attribute ON city_attribute.id_attribute = attribute.id
+                AND ({' OR '.join(['attribute.name LIKE %s'] * len(MAIN_SCORES))})
+            JOIN tabs tab ON attribute.id_tab = tab.id AND tab.name = 'Scores'
+            {f"WHERE city.id IN ({', '.join(['%s'] * len(ids))})" if ids else ''}
+            GROUP BY city.id, city.city_rank, city.name, country.name, continent.name
+        """
+        upsert_query = self.upsert_query('city_scores', columns, ['id_city'], columns[1:], select=select_query)
+
+        patterns = [f"%{score}" for score in MAIN_SCORES]
+        values = [pattern for pattern in patterns for __ in range(2)] + patterns + list(ids or [])
+
+        with self._connection.cursor() as cursor:
+            self._logger.info(f"Writing the scores summary of {len(ids) if ids else 'all the'} cities...")
+            self._logger.debug(f"Query: {upsert_query} - Values: {values}")
+            cursor.execute(upsert_query, values)
+
+    def _bump_data_version(self):
+        """Increments the data version inside the current transaction, so the cached results of show are invalidated."""
+        with self._connection.cursor() as cursor:
+            cursor.execute("UPDATE data_version SET version = version + 1 WHERE id = 1;")
+
+    def get_data_version(self):
+        """Returns the data version of the stored cities."""
+        with self._connection.cursor() as cursor:
+            cursor.execute("SELECT version FROM data_version WHERE id = 1;")
+            (version,) = cursor.fetchone()
+
+        return version
+
+    def refresh_city_scores(self):
+        """Rebuilds the whole city_scores summary from the attributes of the cities, in one transaction."""
+        try:
+            with self._connection.cursor() as cursor:
+                self._logger.info("Deleting the scores summary...")
+                cursor.execute("DELETE FROM city_scores;")
+
+            self._upsert_city_scores()
+            self._bump_data_version()
+            self._connection.commit()
+        except Exception:
+            self._connection.rollback()
+            raise
+
+        with self._connection.cursor() as cursor:
+            cursor.execute("SELECT COUNT(*) FROM city_scores;")
+            (count,) = cursor.fetchone()
+
+        self._logger.info(f"The scores summary was rebuilt with {count} cities.")
+        return count
+
+    @staticmethod
+    def _keyset_condition(keys, order):
+        """
+        Given the sort keys of the last shown city, as (column, value) pairs, returns the condition of the cities that
+        come after it in the order, and its values. The cities without a value come first in ASC order, and last in
+        DESC order, as MySQL and SQLite sort the NULLs.
+        """
+        conditions, values = [], []
+
+        for i, (column, value) in enumerate(keys):
+            if value is None and order == 'DESC':
+                continue
+            if value is None:
+                after, after_values = f"{column} IS NOT NULL", []
+            elif order == 'DESC':
+                after, after_values = f"({column} < %s OR {column} IS NULL)", [value]
+            else:
+                after, after_values = f"{column} > %s", [value]
+
+            # The cities with the same previous keys, and a key that comes after in this one.
+            equals = [f"{previous} IS NULL" if previous_value is None else f"{previous} = %s"
+                      for previous, previous_value in keys[:i]]
+            conditions.append(' AND '.join([*equals, after]))
+            values += [previous_value for __, previous_value in keys[:i] if previous_value is not None] + after_values
+
+        return f"({' OR '.join(conditions)})", values
+
+    def _streaming_cursor(self):
+        """Returns a cursor that reads the rows of the result while they are fetched."""
+        return self._connection.cursor()
+
+    def filter_cities_by(self, *args, num_of_cities=None, country=None, continent=None, rank_from=None, rank_to=None,
+                         after=None, sorted_by, order, **kwargs):
+        """
+        Given the filter criteria, build a query to fetch the required cities from the city_scores summary,
+        and yields them while they are read from the database, without holding all of them in memory.
+        The scores are sorted as in the attributes: the overall score and the fun by their value,
+        and the rest by their description. The rank breaks the ties.
+        Given the id of the last city of a page (after), yields the next page, with a keyset condition on the sort
+        column, the rank and the id, instead of skipping the previous cities with OFFSET.
+        If there is a query cache, the results of the same filters are reused until the data version changes.
+        """
+
+        sort_column = SORT_COLUMNS.get(sorted_by, 'city_rank')
+        order = 'DESC' if order == 'DESC' else 'ASC'
+
+        # The names are compared without case, so they are normalized the same way in the key. The columns are in the
+        # key too, so the results cached with other columns are not read.
+        key = (*SHOW_COLUMNS, num_of_cities or None, country.casefold() if country else None,
+               continent.casefold() if continent else None, rank_from or None, rank_to or None, after, sort_column,
+               order)
+        data_version = self.get_data_version() if self._query_cache else None
+        if data_version is not None and (result := self._query_cache.get(data_version, key)) is not None:
+            yield from result
+            return
+
+        query = SelectQuery('city_scores', SHOW_COLUMNS)
+        if country:
+            query.where('country = %s', country)
+        if continent:
+            query.where('continent = %s', continent)
+        if rank_from:
+            query.where('city_rank >= %s', rank_from)
+        if rank_to:
+            query.where('city_rank <= %s', rank_to)
+        # The ranks can be repeated, so the id breaks the ties, and the order is the same in every page.
+        sort_columns = [sort_column, 'city_rank', 'id_city'] if sort_column != 'city_rank' else ['city_rank', 'id_city']
+        if after is not None:
+            condition, condition_values = self._keyset_condition(self._get_sort_keys(sort_columns, after), order)
+            query.where(condition, *condition_values)
+
+        for column in sort_columns:
+            query.order_by(column, order)
+        query.limit(num_of_cities)
+
+        sql, values = query.build()
+        self._logger.debug(f"About to execute the filter query: {sql} - Values: {values}")
+
+        # Rows kept for the query cache, until they are too many to cache.
+        cached_rows = [] if data_version is not None else None
+
+        with self._streaming_cursor() as cursor:
+            self._logger.info("Executing the query with all the filters...")
+            cursor.execute(sql, values)
+
+            for row in cursor:
+                if cached_rows is not None:
+                    cached_rows.append(row)
+                    if len(cached_rows) > QUERY_CACHE['max_rows']:
+                        cached_rows = None
+                yield row
+
+        if cached_rows is not None:
+            self._query_cache.put(data_version, key, cached_rows)
+
+    def _get_sort_keys(self, sort_columns, id_city):
+        """Given the sort columns and the id of a city, returns the (column, value) pairs of that city."""
+        with self._connection.cursor() as cursor:
+            cursor.execute(f"SELECT {', '.join(sort_columns)} FROM city_scores WHERE id_city = %s;", id_city)
+            row = cursor.fetchone()
+
+        if row is None:
+            raise ValueError(f"There is no city with the id {id_city} to show the cities after it.")
+
+        return list(zip(sort_columns, row))
+
+    def get_city_scores(self, columns):
+        """Given the columns of the city_scores summary, yields the id of each city and those columns."""
+        with self._streaming_cursor() as cursor:
+            cursor.execute(f"SELECT id_city, {', '.join(columns)} FROM city_scores ORDER BY id_city;")
+            yield from cursor
+
+    def get_attribute_values(self, tab_name):
+        """Given the name of a tab, yields the (id_city, attribute name, value) of the numeric values of the cities."""
+        with self._streaming_cursor() as cursor:
+            cursor.execute("""
+            SELECT city_attribute.id_city, attribute.name, city_attribute.attribute_value
+            FROM city_attributes city_attribute
+            JOIN attributes attribute ON city_attribute.id_attribute = attribute.id
+            JOIN tabs tab ON attribute.id_tab = tab.id AND tab.name = %s
+            WHERE city_attribute.attribute_value IS NOT NULL
+            """, tab_name)
+            yield from cursor
+
+    def get_cities(self):
+        """Yields the id, the rank, the name and the country of each city."""
+        with self._streaming_cursor() as cursor:
+            cursor.execute("""
+            SELECT city.id, city.city_rank, city.name, country.name
+            FROM cities city
+            LEFT JOIN countries country ON city.id_country = country.id
+            """)
+            yield from cursor
+
+    def get_weather_attributes(self):
+        """Returns the names of the attributes of the weather."""
+        with self._connection.cursor() as cursor:
+            cursor.execute("""
+            SELECT attribute.name
+            FROM attributes attribute
+            JOIN tabs tab ON attribute.id_tab = tab.id AND tab.name = 'Weather'
+            """)
+            return [name for name, in cursor.fetchall()]
+
+    def get_weather_values(self, conditions=None, months=None):
+        """
+        Yields the (id_city, attribute name, month number, number) of the numeric values of the weather.
+        Given the conditions (attribute, min, max) and the months, yields only the values of those months that are
+        between the bounds of a condition on their attribute, so the index on (id_attribute, month_number,
+        value_number) is used, and the rest of the weather is not read.
+        """
+        where, values = ["weather.value_number IS NOT NULL"], []
+
+        if months:
+            where.append(f"weather.month_number IN ({', '.join(['%s'] * len(months))})")
+            values += months
+
+        if conditions:
+            bounds = []
+            for attribute, low, high in conditions:
+                bound = ["attribute.name = %s"]
+                values.append(attribute)
+                if low is not None:
+                    bound.append("weather.value_number >= %s")
+                    values.append(low)
+                if high is not None:
+                    bound.append("weather.value_number <= %s")
+                    values.append(high)
+                bounds.append(f"({' AND '.join(bound)})")
+
+            where.append(f"({' OR '.join(bounds)})")
+
+        with self._streaming_cursor() as cursor:
+            cursor.execute(f"""
+            SELECT weather.id_city, attribute.name, weather.month_number, weather.value_number
+            FROM monthly_weathers_attributes weather
+            JOIN attributes attribute ON weather.id_attribute = attribute.id
+            WHERE {' AND '.join(where)}
+            """, values)
+            yield from cursor
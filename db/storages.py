@@ -0,0 +1,24 @@
+from conf import STORAGE_BACKEND
+from db.mysql_connector import MySQLConnector
+from db.sqlite_storage import SQLiteStorage
+
+# Storages of the scrapped cities by the name of their backend.
+STORAGES = {'mysql': MySQLConnector, 'sqlite': SQLiteStorage}
+
+
+def get_storage_class(backend=None):
+    """Given the name of the backend, or the configured one, returns its Storage class."""
+    backend = backend or STORAGE_BACKEND
+    if backend not in STORAGES:
+        raise ValueError(f"The storage backend {backend} doesn't exist. The backends are: {', '.join(STORAGES)}.")
+
+    return STORAGES[backend]
+
+
+def get_storage(logger=None, pool=None, query_cache=None, bulk_load=False, verbose=False, backend=None):
+    """Returns a storage of the backend. The pool of connections and the bulk load mode are only used by MySQL."""
+    storage_class = get_storage_class(backend)
+    if storage_class is MySQLConnector:
+        return MySQLConnector(logger=logger, pool=pool, query_cache=query_cache, bulk_load=bulk_load, verbose=verbose)
+
+    return storage_class(logger=logger, query_cache=query_cache, verbose=verbose)
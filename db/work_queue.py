@@ -0,0 +1,172 @@
+import os
+import socket
+import threading
+import time
+import uuid
+from itertools import islice
+from conf import WORK_QUEUE
+from logger import Logger
+from db.run_journal import RunJournal
+from db.storages import get_storage_class
+
+
+class WorkQueue:
+    """
+    Class that knows how to handle the queue of city urls in the database, shared by many workers in many hosts.
+    Each worker leases a batch of urls for some seconds. If the worker dies, its lease expires and the urls are
+    visible again for the other workers. While the worker records the states of the cities, its lease is extended.
+    It has the same record method as the RunJournal, so the scrapper reports the state of each leased city to it.
+    """
+
+    PENDING = 'pending'
+    LEASED = 'leased'
+    DONE = 'done'
+    FAILED = 'failed'
+
+    def __init__(self, lease_seconds=WORK_QUEUE['lease_seconds'], max_attempts=WORK_QUEUE['max_attempts'],
+                 storage_class=None, logger=None, verbose=False):
+        if logger is None:
+            logger = Logger(verbose=verbose).logger
+
+        self._logger = logger
+        # Storage class of the backend, which knows how to connect to the database and write its dialect.
+        self._storage_class = storage_class or get_storage_class()
+        self._lease_seconds = lease_seconds
+        self._max_attempts = max_attempts
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+        self._leased_urls = set()
+        self._stored_urls = set()
+        self._extended_on = time.monotonic()
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        """Opens the connection to the database."""
+        self._connection = self._storage_class.connect()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Releases the urls of the current lease, so other workers don't wait for its timeout. Closes the connection."""
+        try:
+            self.complete()
+        finally:
+            self._connection.close()
+
+    def enqueue(self, urls, batch_size=WORK_QUEUE['batch_size']):
+        """
+        Given the discovered urls, puts them in the queue in batches. The urls that were already in the queue
+        are pending again, so a new scrape processes them too. Returns the number of enqueued urls.
+        """
+        columns = ['url', 'state', 'lease_owner', 'lease_expires_on', 'attempts']
+        enqueue_query = self._storage_class.upsert_query('work_queue', columns, ['url'], columns[1:])
+
+        urls = iter(urls)
+        total = 0
+
+        with self._connection.cursor() as cursor:
+            while batch := list(islice(urls, batch_size)):
+                cursor.executemany(enqueue_query, [(url, self.PENDING, None, None, 0) for url in batch])
+                self._connection.commit()
+                total += len(batch)
+                self._logger.info(f"{total} urls enqueued...")
+
+        return total
+
+    def lease(self, batch_size=WORK_QUEUE['batch_size']):
+        """
+        Leases a batch of pending urls, or urls whose lease expired, and returns them.
+        The expired urls that already used all the allowed attempts are marked as failed.
+        """
+        fail_expired_query = """
+        UPDATE work_queue SET state = %s, lease_owner = NULL, lease_expires_on = NULL
+        WHERE state = %s AND lease_expires_on < CURRENT_TIMESTAMP AND attempts >= %s
+        """
+        lease_query = self._storage_class.update_first_rows_query(
+            'work_queue',
+            f"state = %s, lease_owner = %s, lease_expires_on = {self._storage_class.seconds_from_now()}, "
+            f"attempts = attempts + 1",
+            "state IN (%s, %s) AND (lease_expires_on IS NULL OR lease_expires_on < CURRENT_TIMESTAMP)",
+            'id')
+
+        with self._connection.cursor() as cursor:
+            cursor.execute(fail_expired_query, (self.FAILED, self.LEASED, self._max_attempts))
+            cursor.execute(lease_query, (self.LEASED, self.owner, self._lease_seconds, self.PENDING, self.LEASED,
+                                         batch_size))
+            self._connection.commit()
+            cursor.execute("SELECT url FROM work_queue WHERE state = %s AND lease_owner = %s;",
+                           (self.LEASED, self.owner))
+            urls = [url for url, in cursor.fetchall()]
+
+        with self._lock:
+            self._leased_urls = set(urls)
+            self._extended_on = time.monotonic()
+
+        self._logger.info(f"The worker {self.owner} leased {len(urls)} urls.")
+        return urls
+
+    def record(self, url, state):
+        """
+        Given the requested url and its new state in the scrapper, keeps the stored ones until the lease is completed.
+        If a third of the lease passed since it was extended, it's extended again, so a slow batch is not leased by
+        another worker while this one is still scraping it.
+        """
+        with self._lock:
+            if state == RunJournal.STORED:
+                self._stored_urls.add(url)
+
+            if self._leased_urls and time.monotonic() - self._extended_on >= self._lease_seconds / 3:
+                self._extend_lease()
+
+    def _extend_lease(self):
+        extend_query = f"""
+        UPDATE work_queue SET lease_expires_on = {self._storage_class.seconds_from_now()}
+        WHERE state = %s AND lease_owner = %s
+        """
+
+        try:
+            with self._connection.cursor() as cursor:
+                cursor.execute(extend_query, (self._lease_seconds, self.LEASED, self.owner))
+                self._connection.commit()
+        except Exception as e:
+            self._logger.warning(f"The lease of the worker {self.owner} couldn't be extended: {e}")
+            return
+
+        self._extended_on = time.monotonic()
+        self._logger.debug(f"The lease of the worker {self.owner} was extended.")
+
+    def complete(self):
+        """
+        Completes the current lease: the stored urls are done, and the rest are pending again,
+        unless they already failed in all the allowed attempts.
+        The scrapper records the states under the requested urls, so they are the leased ones even after a redirect.
+        """
+        with self._lock:
+            stored_urls = self._stored_urls & self._leased_urls
+            unfinished_urls = self._leased_urls - stored_urls
+            self._leased_urls, self._stored_urls = set(), set()
+
+        if not stored_urls and not unfinished_urls:
+            return
+
+        done_query = "UPDATE work_queue SET state = %s, lease_expires_on = NULL WHERE url = %s AND lease_owner = %s"
+        release_query = """
+        UPDATE work_queue
+        SET state = CASE WHEN attempts >= %s THEN %s ELSE %s END, lease_owner = NULL, lease_expires_on = NULL
+        WHERE url = %s AND lease_owner = %s
+        """
+
+        with self._connection.cursor() as cursor:
+            cursor.executemany(done_query, [(self.DONE, url, self.owner) for url in stored_urls])
+            cursor.executemany(release_query, [(self._max_attempts, self.FAILED, self.PENDING, url, self.owner)
+                                               for url in unfinished_urls])
+            self._connection.commit()
+
+        self._logger.info(f"Lease completed. Done: {len(stored_urls)} - Released: {len(unfinished_urls)}")
+
+    def has_unfinished(self):
+        """Checks if there are urls that are pending, or leased by other workers."""
+        with self._connection.cursor() as cursor:
+            cursor.execute("SELECT COUNT(*) FROM work_queue WHERE state IN (%s, %s);", (self.PENDING, self.LEASED))
+            (count,) = cursor.fetchone()
+
+        return count > 0
@@ -0,0 +1,28 @@
+class CityPage:
+    """
+    Index of the city details page. It walks the tab scroller only once, and maps the class of each tab to its
+    element, so the tab scrappers don't need to search the whole page again.
+    """
+
+    def __init__(self, soup):
+        self.soup = soup
+        self.header = soup.find(class_="text")
+        self._tabs_list = soup.find("div", class_="tabs")
+        self._tabs_by_class = {}
+
+        container = soup.find("div", class_="tab-scroller-container")
+        tab_scroller = container.find("div", class_="tab-scroller") if container else None
+
+        if tab_scroller:
+            for tab in tab_scroller.find_all("div", class_="tab"):
+                for class_name in tab.get("class", []):
+                    # Keeps the first tab with that class, as the find method of the soup does.
+                    self._tabs_by_class.setdefault(class_name, tab)
+
+    def get_tabs(self):
+        """Returns the h2 tags of the list of tabs, which contain the names of the tabs."""
+        return self._tabs_list.find("div", class_="ul").find_all("h2", class_="li")
+
+    def get_tab(self, tab_class):
+        """Given the class of the tab (eg: tab-ranking), returns the div of the tab or None if the page doesn't have it."""
+        return self._tabs_by_class.get(tab_class)
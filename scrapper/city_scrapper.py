@@ -1,7 +1,8 @@
 import re
 import conf as cfg
 from .tab_scrapper import *
-from bs4 import BeautifulSoup
+from .soup import make_soup, CITY_DETAILS_STRAINER
+from .city_page import CityPage
 
 
 class CityScrapper:
@@ -9,13 +10,20 @@ class CityScrapper:
     # To avoid cities lis with 'data-slug="{slugName}"'
     city_template_re = re.compile(r'{\w+}')
 
-    def __init__(self, logger):
+    def __init__(self, logger, parser=None, restricted_parse=None):
         self._logger = logger
         self._base_url = cfg.NOMAD_LIST_URL
+        self._parser = parser
 
-    def _get_tab_information(self, tab, city_details_soup):
+        if restricted_parse is None:
+            restricted_parse = cfg.NOMAD_LIST_RESTRICTED_PARSE
+
+        # Restricted parses only build the subtrees of the page that the tab scrappers read.
+        self._parse_only = CITY_DETAILS_STRAINER if restricted_parse else None
+
+    def _get_tab_information(self, tab, city_page):
         """
-        Given the tab and the soup object, dynamically builds a tab scrapper that depends on the name of the tab,
+        Given the tab and the city page, dynamically builds a tab scrapper that depends on the name of the tab,
         and gets all the information of it. Then, returns that information as a dict "{tab_name: tab_information}"
         """
         tab_name = TabScrapper.get_name(tab)
@@ -23,7 +31,7 @@ class CityScrapper:
         self._logger.debug(f"Tab with name {tab_name}: {tab}")
         dynamic_tab_scrapper = eval(f"{tab_name}TabScrapper")
         self._logger.debug(f"DynamicTabScrapper: {dynamic_tab_scrapper}")
-        return dynamic_tab_scrapper(city_details_soup, logger=self._logger).get_information()
+        return dynamic_tab_scrapper(city_page, logger=self._logger).get_information()
 
     def _get_aviation_stack_country_info(self, country, aviation_stack_countries):
         aviation_stack_country = aviation_stack_countries.get(country)
@@ -86,8 +94,10 @@ class CityScrapper:
         Then, returns a dict with all that information.
         """
         try:
-            city_details_soup = BeautifulSoup(city_details_html, "html.parser")
-            text = city_details_soup.find(class_="text")
+            city_details_soup = make_soup(city_details_html, parse_only=self._parse_only, parser=self._parser)
+            # The page is walked once, and all the tab scrappers take their tab from it.
+            city_page = CityPage(city_details_soup)
+            text = city_page.header
 
             if not text:
                 return
@@ -96,13 +106,13 @@ class CityScrapper:
             country = text.h2.text if text.h2 else "-"
             # TODO we have problems with the data-i of the cities. It should be the rank but,
             #  after 26 cities, it always brings the same value (data-i="26").
-            rank = int(ScoresTabScrapper(city_details_soup).get_rank())
+            rank = int(ScoresTabScrapper(city_page, logger=self._logger).get_rank())
 
             self._logger.info(f'Fetching the info of {city}, {country} with rank #{rank}')
 
-            tabs = city_details_soup.find("div", class_="tabs").find("div", class_="ul").find_all("h2", class_="li")
+            tabs = city_page.get_tabs()
             self._logger.debug(f"{city}, {country} tabs: {tabs}")
-            tabs_information = {TabScrapper.get_name(tab): self._get_tab_information(tab, city_details_soup)
+            tabs_information = {TabScrapper.get_name(tab): self._get_tab_information(tab, city_page)
                                 for tab in tabs if TabScrapper.is_valid(tab)}
 
             self._logger.info(f"All the information about {city}, {country} was fetched!")
@@ -113,7 +123,7 @@ class CityScrapper:
                     'name': country,
                     **self._get_aviation_stack_country_info(country, aviation_stack_countries),
                 },
-                'continent': DigitalNomadGuideTabScrapper(city_details_soup).get_continent(),
+                'continent': DigitalNomadGuideTabScrapper(city_page, logger=self._logger).get_continent(),
                 'rank': rank,
                 **self._get_aviation_stack_city_info(city, aviation_stack_cities),
                 **tabs_information
@@ -0,0 +1,134 @@
+import queue
+import threading
+import conf as cfg
+from logger import Logger
+from db.storages import get_storage
+from db.run_journal import RunJournal
+
+_DONE = object()
+
+
+class CityWriters:
+    """
+    Class that knows how to store the parsed cities with many writer threads.
+    Each writer takes its own connection from the pool, and writes the cities of the queue in batches,
+    so the writes of different cities overlap. The new continents, countries, tabs or attributes that two writers
+    create at the same time are deduplicated by the unique keys of the tables.
+    """
+
+    def __init__(self, pool, writers=None, write_batch_size=None, queue_size=cfg.NOMAD_LIST_PIPELINE_QUEUE_SIZE,
+                 fingerprints=None, journal=None, bulk_load=False, details_sink=None, logger=None, verbose=False):
+        if logger is None:
+            logger = Logger(verbose=verbose).logger
+
+        self._logger = logger
+        self._verbose = verbose
+        self._pool = pool
+        self._fingerprints = fingerprints
+        self._journal = journal
+        self._bulk_load = bulk_load
+        self._details_sink = details_sink
+
+        self._writers = writers or cfg.NOMAD_LIST_PIPELINE_WRITERS
+        self._write_batch_size = write_batch_size or (cfg.MYSQL_BULK_LOAD_BATCH_SIZE if bulk_load
+                                                      else cfg.MYSQL_WRITE_BATCH_SIZE)
+
+        # Parsed cities waiting to be written: (url, page_hash, details)
+        self._parsed = queue.Queue(maxsize=queue_size)
+        self._threads = []
+
+        self._lock = threading.Lock()
+        self.successes = self.failures = 0
+
+    def __enter__(self):
+        """Starts the writer threads."""
+        self._logger.info(f"Starting {self._writers} writers...")
+        self._threads = [threading.Thread(target=self._store) for _ in range(self._writers)]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Waits until the writers store all the queued cities."""
+        for _ in self._threads:
+            self._parsed.put(_DONE)
+        for thread in self._threads:
+            thread.join()
+
+    def put(self, url, page_hash, details):
+        """
+        Given the url, the hash of the page and the details of a parsed city, queues it to be stored.
+        If there is a details sink, the details are saved in it first.
+        """
+        if self._details_sink:
+            self._details_sink.write(url, details)
+
+        self._parsed.put((url, page_hash, details))
+
+    def qsize(self):
+        """Number of parsed cities waiting for a writer."""
+        return self._parsed.qsize()
+
+    def _record(self, url, id_city):
+        """Records the result of storing the city in the journal, if there is one, and counts it."""
+        if self._journal:
+            self._journal.record(url, RunJournal.STORED if id_city is not None else RunJournal.FAILED)
+
+        with self._lock:
+            if id_city is not None:
+                self.successes += 1
+            else:
+                self.failures += 1
+
+    def _next_batch(self):
+        """
+        Waits for the next parsed city, and takes the ones that are already waiting in the queue, up to the size
+        of the write batch. Returns the batch, and whether the end mark was reached.
+        """
+        batch = []
+        parsed = self._parsed.get()
+
+        while parsed is not _DONE:
+            batch.append(parsed)
+            if len(batch) >= self._write_batch_size:
+                return batch, False
+            try:
+                parsed = self._parsed.get_nowait()
+            except queue.Empty:
+                return batch, False
+
+        return batch, True
+
+    def _store_batch(self, storage, batch):
+        """Given a batch of parsed cities, stores all of them in one transaction, and records the state of each one."""
+        self._logger.info(f"Storing the details of {len(batch)} cities...")
+        try:
+            if self._fingerprints:
+                ids = self._fingerprints.store_many(storage, batch)
+            else:
+                ids = storage.insert_cities_info([details for __, __, details in batch])
+        except Exception as e:
+            self._logger.error(f"Exception raised trying to store the city details: {e}", exc_info=self._verbose)
+            ids = [None] * len(batch)
+
+        for (url, __, __), id_city in zip(batch, ids):
+            self._record(url, id_city)
+
+    def _store(self):
+        """
+        Writer thread. It writes batches until the end mark.
+        If the writer cannot work, it keeps draining the queue, so the producers never get blocked.
+        """
+        done = False
+        try:
+            with get_storage(logger=self._logger, pool=self._pool, bulk_load=self._bulk_load) as storage:
+                while not done:
+                    batch, done = self._next_batch()
+                    if batch:
+                        self._store_batch(storage, batch)
+                self._logger.debug(f"The writer finished. Round trips to the database: {storage.round_trips}")
+        except Exception as e:
+            self._logger.error(f"The writer stopped: {e}", exc_info=self._verbose)
+            while not done and (parsed := self._parsed.get()) is not _DONE:
+                url, __, __ = parsed
+                self._record(url, None)
@@ -0,0 +1,181 @@
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import threading
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import conf as cfg
+from logger import Logger
+
+# Bytes of the file decompressed at once. wbits of zlib for a gzip member, with its header and trailer.
+READ_BLOCK_SIZE = 64 * 1024
+GZIP_WBITS = zlib.MAX_WBITS | 16
+
+
+def _decode_lines(lines):
+    """Runs in a decoder process. Given some lines of the details file, returns their (url, details), or None."""
+    decoded = []
+    for line in lines:
+        try:
+            entry = json.loads(line)
+            decoded.append((entry['url'], entry['details']))
+        except (ValueError, KeyError, TypeError):
+            decoded.append(None)
+
+    return decoded
+
+
+class DetailsSink:
+    """
+    Class that knows how to keep the parsed details of the cities in a compressed, append-only JSONL file.
+    Each line has the url and the details of one city, so the cities can be stored again without scraping the site.
+    Each run appends a new gzip member to the file, and the concatenated members are read as one file.
+    If a run was killed, its member is truncated. The next run writes its complete lines again as a new member before
+    appending its own, so every line that was written is kept, and the members after it can be read.
+    """
+
+    def __init__(self, path=cfg.JSON_FILENAME, logger=None, verbose=False):
+        if logger is None:
+            logger = Logger(verbose=verbose).logger
+
+        self._logger = logger
+        self._path = path
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        if directory := os.path.dirname(self._path):
+            os.makedirs(directory, exist_ok=True)
+
+        if os.path.exists(self._path):
+            self._repair()
+
+        self._file = gzip.open(self._path, 'at', encoding='utf-8')
+        self._logger.info(f"The details of the cities are saved in {self._path}.")
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._file.close()
+
+    def write(self, url, details):
+        """Given the url and the details of a city, appends them to the file. The writes of many threads don't mix."""
+        line = json.dumps({'url': url, 'details': details}, default=str)
+
+        with self._lock:
+            self._file.write(line + '\n')
+
+    def _blocks(self, details_file):
+        """
+        Given the file opened in binary mode, yields the decompressed blocks of its gzip members from the current
+        position, each one with the offset where the last complete member read so far ends.
+        A member that wasn't finished ends the file. If the file is corrupt, zlib.error is raised.
+        """
+        complete_end = offset = details_file.tell()
+        decompressor = zlib.decompressobj(GZIP_WBITS)
+        data = b''
+
+        while data or (data := details_file.read(READ_BLOCK_SIZE)):
+            block = decompressor.decompress(data)
+
+            if decompressor.eof:
+                offset += len(data) - len(decompressor.unused_data)
+                complete_end, data = offset, decompressor.unused_data
+                decompressor = zlib.decompressobj(GZIP_WBITS)
+            else:
+                offset += len(data)
+                data = b''
+
+            yield block, complete_end
+
+    def _lines(self, details_file):
+        """
+        Given the file opened in binary mode, yields the complete lines of its members from the current position.
+        If a run was killed while writing its member, its unfinished line is logged and skipped.
+        """
+        complete_end, unfinished_line = details_file.tell(), b''
+
+        for block, complete_end in self._blocks(details_file):
+            *lines, unfinished_line = (unfinished_line + block).split(b'\n')
+            yield from lines
+
+        if details_file.tell() > complete_end:
+            self._logger.warning(f"The end of {self._path} is truncated, because a run was killed while writing it. "
+                                 f"Its unfinished line is skipped.")
+
+    def _repair(self):
+        """
+        Makes the file end with a complete member, so the members appended to it can be read.
+        If a run was killed, its truncated member is replaced with a new one that has its complete lines.
+        If the file is corrupt, nothing is appended to it.
+        """
+        with open(self._path, 'r+b') as details_file:
+            complete_end = 0
+            try:
+                for __, complete_end in self._blocks(details_file):
+                    pass
+            except zlib.error as e:
+                raise ValueError(f"{self._path} is corrupt, so the details are not appended to it: {e}") from e
+
+            if details_file.tell() == complete_end:
+                return
+
+            details_file.seek(complete_end)
+            with tempfile.TemporaryFile() as recovered_file:
+                num_of_lines = 0
+                with gzip.GzipFile(fileobj=recovered_file, mode='wb') as recovered_member:
+                    for line in self._lines(details_file):
+                        recovered_member.write(line + b'\n')
+                        num_of_lines += 1
+
+                recovered_file.seek(0)
+                details_file.seek(complete_end)
+                shutil.copyfileobj(recovered_file, details_file)
+                details_file.truncate()
+
+        self._logger.info(f"The {num_of_lines} complete lines of the killed run were kept in {self._path}.")
+
+    def _read_chunks(self, chunk_size):
+        """Yields the lines of the file in chunks. If the file is corrupt, the lines before the corrupt part are kept."""
+        with open(self._path, 'rb') as details_file:
+            chunk = []
+            try:
+                for line in self._lines(details_file):
+                    chunk.append(line)
+                    if len(chunk) == chunk_size:
+                        yield chunk
+                        chunk = []
+            except zlib.error as e:
+                self._logger.warning(f"{self._path} is corrupt, so the rest of it is skipped: {e}")
+
+        if chunk:
+            yield chunk
+
+    def read(self, decoders=None, chunk_size=cfg.INGEST_CHUNK_SIZE):
+        """
+        Yields the (url, details) of the cities of the file, in order, decoding the chunks of lines in parallel
+        processes. Only a few chunks are decoded ahead, so the file is never held in memory.
+        The lines that can't be decoded are logged and skipped.
+        """
+        decoders = decoders or os.cpu_count() or 1
+        pending = deque()
+
+        with ProcessPoolExecutor(max_workers=decoders) as executor:
+            for chunk in self._read_chunks(chunk_size):
+                pending.append(executor.submit(_decode_lines, chunk))
+                if len(pending) < 2 * decoders:
+                    continue
+
+                yield from self._decoded(pending.popleft())
+
+            while pending:
+                yield from self._decoded(pending.popleft())
+
+    def _decoded(self, future):
+        for entry in future.result():
+            if entry is None:
+                self._logger.warning("A line of the details file couldn't be decoded. Skipping it...")
+                continue
+
+            yield entry
@@ -0,0 +1,196 @@
+import asyncio
+import queue
+import threading
+import aiohttp
+import conf as cfg
+from requests import HTTPError, RequestException
+from logger import Logger
+
+_DONE = object()
+
+# Seconds between the checks of the stop event, while waiting for room in the responses queue.
+STOP_CHECK_INTERVAL = 0.1
+
+
+class FetchedResponse:
+    """
+    Response of the AsyncFetcher. It exposes the subset of the requests.Response interface that the scrapper uses,
+    so both fetch backends can be handled in the same way.
+    """
+
+    def __init__(self, url, status_code, content, headers=None, error=None, request_url=None):
+        self.url = url
+        # Url that was requested, before the redirects.
+        self.request_url = request_url or url
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+        self.error = error
+
+    @classmethod
+    def failed(cls, url, error):
+        """Given the url and the error of a request without response, returns a response that raises it."""
+        return cls(url, None, b'', error=error)
+
+    def raise_for_status(self):
+        """Raises a RequestException if the request failed, or an HTTPError if the status code is an error."""
+        if self.error is not None:
+            raise RequestException(f"Error making the request {self.url}: {self.error!r}")
+        if 400 <= self.status_code < 600:
+            raise HTTPError(f"{self.status_code} Error for url: {self.url}", response=self)
+
+    def close(self):
+        """The body was already read, so there is nothing to release."""
+        pass
+
+
+def get_request_url(response):
+    """
+    Given a response of any of the fetch backends, returns the url that was requested, before the redirects.
+    The state of each city is kept under that url, which is the discovered one.
+    """
+    if isinstance(response, FetchedResponse):
+        return response.request_url
+
+    return response.history[0].url if response.history else response.url
+
+
+class AsyncFetcher:
+    """
+    Class that knows how to fetch many pages concurrently using asyncio. All the requests share one session, so the
+    keep-alive connections are pooled and reused, with a limit of connections per host.
+    """
+
+    def __init__(self, logger=None, concurrency=cfg.NOMAD_LIST_REQUESTS_BATCH_SIZE,
+                 limit_per_host=cfg.NOMAD_LIST_CONNECTIONS_PER_HOST, timeout=cfg.NOMAD_LIST_REQUEST_TIMEOUT,
+                 headers=None, cache=None):
+        if logger is None:
+            logger = Logger().logger
+
+        self._logger = logger
+        self._cache = cache
+        self._concurrency = concurrency
+        self._limit_per_host = limit_per_host
+        self._timeout = timeout
+        self._headers = cfg.HEADERS if headers is None else headers
+
+    def fetch(self, urls):
+        """
+        Given an iterable of urls, fetches all of them and yields the responses in completion order.
+        The requests that fail without a response are yielded as failed responses, so the caller can mark them.
+        The event loop runs in a background thread, so the caller can consume the responses as a plain generator.
+        If the caller stops consuming them, the event loop is stopped, and its session is closed.
+        """
+        responses = queue.Queue(maxsize=self._concurrency * 2)
+        stopped = threading.Event()
+        thread = threading.Thread(target=asyncio.run, args=(self._run(urls, responses, stopped),), daemon=True)
+        thread.start()
+
+        try:
+            while (response := responses.get()) is not _DONE:
+                yield response
+        finally:
+            stopped.set()
+            thread.join()
+
+    @staticmethod
+    def _put(responses, item, stopped):
+        """Puts the item in the bounded responses queue, unless the consumer stops first. Returns if it was put."""
+        while not stopped.is_set():
+            try:
+                responses.put(item, timeout=STOP_CHECK_INTERVAL)
+                return True
+            except queue.Full:
+                pass
+
+        return False
+
+    @staticmethod
+    async def _wait(stopped):
+        """Waits until the consumer stops."""
+        while not stopped.is_set():
+            await asyncio.sleep(STOP_CHECK_INTERVAL)
+
+    async def _run(self, urls, responses, stopped):
+        """Fetches the urls until all of them were fetched, or until the consumer stops. Then, cancels the rest."""
+        fetch = asyncio.create_task(self._fetch_all(urls, responses, stopped))
+        consumer_stopped = asyncio.create_task(self._wait(stopped))
+
+        try:
+            await asyncio.wait([fetch, consumer_stopped], return_when=asyncio.FIRST_COMPLETED)
+            if fetch.done() and fetch.exception():
+                self._logger.error(f"Error fetching the urls: {fetch.exception()!r}.")
+        finally:
+            for task in [fetch, consumer_stopped]:
+                task.cancel()
+            await asyncio.gather(fetch, consumer_stopped, return_exceptions=True)
+            self._put(responses, _DONE, stopped)
+
+    async def _fetch_all(self, urls, responses, stopped):
+        """Feeds the urls to a fixed number of workers that share the same session."""
+        loop = asyncio.get_running_loop()
+        connector = aiohttp.TCPConnector(limit=self._concurrency, limit_per_host=self._limit_per_host)
+
+        async with aiohttp.ClientSession(connector=connector, headers=self._headers) as session:
+            pending_urls = asyncio.Queue(maxsize=self._concurrency)
+            workers = [asyncio.create_task(self._worker(session, pending_urls, responses, stopped))
+                       for _ in range(self._concurrency)]
+
+            try:
+                # The urls may come from a lazy generator, so they are taken outside the event loop.
+                urls_iterator = iter(urls)
+                while (url := await loop.run_in_executor(None, next, urls_iterator, None)) is not None:
+                    await pending_urls.put(url)
+
+                for _ in workers:
+                    await pending_urls.put(None)
+
+                await asyncio.gather(*workers)
+            finally:
+                for worker in workers:
+                    worker.cancel()
+
+    async def _worker(self, session, pending_urls, responses, stopped):
+        """Takes urls from the queue until it receives None, and puts each response in the responses queue."""
+        loop = asyncio.get_running_loop()
+
+        while (url := await pending_urls.get()) is not None:
+            response = await self._get(session, url)
+
+            # The responses queue is bounded, so putting items into it must not block the event loop.
+            if not await loop.run_in_executor(None, self._put, responses, response, stopped):
+                return
+
+    async def _get(self, session, url):
+        """
+        Makes the request to the url with its own timeout. If it fails, logs the error and returns a failed response.
+        With a cache, fresh entries are served from disk, and the stale ones are revalidated with a conditional request.
+        """
+        loop = asyncio.get_running_loop()
+        entry = await loop.run_in_executor(None, self._cache.get, url) if self._cache else None
+
+        if entry and self._cache.is_fresh(entry):
+            self._logger.debug(f"Serving {url} from the http cache.")
+            return FetchedResponse(url, 200, entry.body)
+
+        headers = self._cache.conditional_headers(entry) if entry else None
+        timeout = aiohttp.ClientTimeout(total=self._timeout)
+
+        try:
+            self._logger.debug(f"GET - {url}")
+            async with session.get(url, headers=headers, timeout=timeout) as response:
+                if response.status == 304 and entry:
+                    self._logger.debug(f"{url} didn't change. Serving it from the http cache.")
+                    await loop.run_in_executor(None, self._cache.revalidate, entry)
+                    return FetchedResponse(url, 200, entry.body)
+
+                content = await response.read()
+
+                if response.status == 200 and self._cache:
+                    await loop.run_in_executor(None, self._cache.store, url, content, response.headers)
+
+                return FetchedResponse(str(response.url), response.status, content, dict(response.headers),
+                                       request_url=url)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self._logger.error(f"Error making the request {url}: {e!r}.")
+            return FetchedResponse.failed(url, e)
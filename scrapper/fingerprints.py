@@ -0,0 +1,83 @@
+import hashlib
+import json
+
+# Keys of the details written by each group of statements of the Storage.
+TABS = ['Scores', 'DigitalNomadGuide', 'CostOfLiving', 'ProsAndCons', 'Reviews', 'Weather', 'Photos', 'Near', 'Next',
+        'Similar']
+
+# Number of texts of each entry of the tabs whose entries also have values parsed from those texts (eg: the number of
+# each month of the weather). Only the texts are hashed, so parsing a new value doesn't change the hashes of the pages
+# that didn't change, and the incremental scrape doesn't rewrite all of them.
+HASHED_TEXTS = {'Weather': 3}
+# Position of the parsed value in the entries of the key-value tabs whose values are parsed from their texts (eg: the
+# number of each cost). The value is hashed as None, as it was before it was parsed, so only the text and the url count.
+UNHASHED_VALUES = {'CostOfLiving': 1}
+
+
+class CityFingerprints:
+    """
+    Class that knows the content hashes of the city pages, and of each of their tabs, stored in the previous runs.
+    It's used by the incremental scrape to skip the unchanged cities, and to rewrite only the tabs that changed.
+    """
+
+    def __init__(self, stored_fingerprints=None):
+        # {url: (page_hash, {tab: tab_hash})}
+        self._stored_fingerprints = stored_fingerprints or {}
+
+    @staticmethod
+    def page_hash(content):
+        """Given the content of the page (str or bytes), returns its hash."""
+        if isinstance(content, str):
+            content = content.encode()
+        return hashlib.sha1(content).hexdigest()
+
+    @staticmethod
+    def tabs_hashes(details):
+        """Given the details of the city, returns the hash of the information of each tab."""
+        return {tab: hashlib.sha1(json.dumps(CityFingerprints._hashed_information(tab, details.get(tab)),
+                                             sort_keys=True, default=str).encode()).hexdigest()
+                for tab in TABS}
+
+    @staticmethod
+    def _hashed_information(tab, information):
+        """Given a tab and its information, returns the part of it that is hashed: the texts of each entry."""
+        if not information:
+            return information
+
+        if (texts := HASHED_TEXTS.get(tab)) is not None:
+            return {key: [tuple(entry[:texts]) for entry in entries] for key, entries in information.items()}
+
+        if (value_index := UNHASHED_VALUES.get(tab)) is not None:
+            return {key: (*entry[:value_index], None, *entry[value_index + 1:]) for key, entry in information.items()}
+
+        return information
+
+    def is_unchanged(self, url, page_hash):
+        """Checks if the page is byte-for-byte the same as in the previous run."""
+        stored_page_hash, __ = self._stored_fingerprints.get(url, (None, None))
+        return stored_page_hash == page_hash
+
+    def changed_tabs(self, url, tabs_hashes):
+        """Given the url and the new hashes of the tabs, returns the set of tabs whose information changed."""
+        __, stored_tabs_hashes = self._stored_fingerprints.get(url, (None, {}))
+        return {tab for tab, tab_hash in tabs_hashes.items() if stored_tabs_hashes.get(tab) != tab_hash}
+
+    def store_many(self, storage, pages):
+        """
+        Given a list of tuples (url, page_hash, details), stores the changed tabs of the cities in one batch,
+        and then their new fingerprints. Returns the ids of the cities, with None for the ones that failed.
+        """
+        tabs_hashes = [self.tabs_hashes(details) for __, __, details in pages]
+        ids = storage.insert_cities_info([details for __, __, details in pages],
+                                         [self.changed_tabs(url, hashes)
+                                          for (url, __, __), hashes in zip(pages, tabs_hashes)])
+
+        stored = [(url, id_city, page_hash, hashes)
+                  for (url, page_hash, __), id_city, hashes in zip(pages, ids, tabs_hashes) if id_city is not None]
+        if stored:
+            storage.upsert_fingerprints(stored)
+
+        for url, __, page_hash, hashes in stored:
+            self._stored_fingerprints[url] = (page_hash, hashes)
+
+        return ids
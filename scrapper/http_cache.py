@@ -0,0 +1,132 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import conf as cfg
+from logger import Logger
+
+
+class CacheEntry:
+    """Cached response of an url: the body, the validators sent by the server, and the time it was fetched."""
+
+    def __init__(self, url, body, etag=None, last_modified=None, fetched_at=None):
+        self.url = url
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fetched_at = fetched_at or time.time()
+
+
+class HttpCache:
+    """
+    Disk-backed HTTP cache keyed by url. Each entry has two files: the body, and a json file with the metadata.
+    The mtime of the metadata file is the last access of the entry, and it's used to evict the least recently used
+    entries when the size of the cache exceeds the limit.
+    """
+
+    def __init__(self, directory=cfg.HTTP_CACHE['directory'], ttl=cfg.HTTP_CACHE['ttl'],
+                 max_size=cfg.HTTP_CACHE['max_size'], logger=None, verbose=False):
+        if logger is None:
+            logger = Logger(verbose=verbose).logger
+
+        self._logger = logger
+        self._directory = directory
+        self._ttl = ttl
+        self._max_size = max_size
+        self._lock = threading.Lock()
+
+        os.makedirs(directory, exist_ok=True)
+        self._size = sum(os.path.getsize(path) for path in self._bodies_paths())
+
+    def _paths(self, url):
+        """Given the url, returns the paths of the body and the metadata files."""
+        key = hashlib.sha1(url.encode()).hexdigest()
+        return os.path.join(self._directory, f"{key}.html"), os.path.join(self._directory, f"{key}.json")
+
+    def _bodies_paths(self):
+        return [entry.path for entry in os.scandir(self._directory) if entry.name.endswith('.html')]
+
+    def _write(self, path, content, mode='wb'):
+        """Writes the file atomically, so a killed process never leaves a half written entry."""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, mode) as opened_file:
+            opened_file.write(content)
+        os.replace(tmp_path, path)
+
+    def get(self, url):
+        """Given the url, returns its CacheEntry, or None if it's not cached."""
+        body_path, meta_path = self._paths(url)
+
+        try:
+            with open(meta_path, 'r') as meta_file:
+                meta = json.load(meta_file)
+            with open(body_path, 'rb') as body_file:
+                body = body_file.read()
+        except (OSError, ValueError):
+            return None
+
+        # Marks the entry as recently used.
+        os.utime(meta_path)
+        return CacheEntry(url, body, meta.get('etag'), meta.get('last_modified'), meta.get('fetched_at'))
+
+    def is_fresh(self, entry):
+        """Checks if the entry can be served without asking the server. A ttl of None means that it never expires."""
+        return self._ttl is None or time.time() - entry.fetched_at < self._ttl
+
+    def conditional_headers(self, entry):
+        """Given the entry, returns the headers to ask the server if it has changed."""
+        headers = {}
+
+        if entry.etag:
+            headers['If-None-Match'] = entry.etag
+        if entry.last_modified:
+            headers['If-Modified-Since'] = entry.last_modified
+
+        return headers
+
+    def store(self, url, body, headers):
+        """Given the url, the body and the headers of a response, stores a new entry and evicts old ones if needed."""
+        body_path, meta_path = self._paths(url)
+        old_size = os.path.getsize(body_path) if os.path.exists(body_path) else 0
+
+        self._write(body_path, body)
+        self._write_meta(meta_path, url, headers.get('ETag'), headers.get('Last-Modified'))
+
+        with self._lock:
+            self._size += len(body) - old_size
+
+        self._evict()
+
+    def revalidate(self, entry):
+        """The server answered that the entry didn't change (304), so it's fresh again."""
+        __, meta_path = self._paths(entry.url)
+        entry.fetched_at = time.time()
+        self._write_meta(meta_path, entry.url, entry.etag, entry.last_modified)
+
+    def _write_meta(self, meta_path, url, etag, last_modified):
+        meta = {'url': url, 'etag': etag, 'last_modified': last_modified, 'fetched_at': time.time()}
+        self._write(meta_path, json.dumps(meta), mode='w')
+
+    def _evict(self):
+        """Removes the least recently used entries until the cache fits in the max size."""
+        with self._lock:
+            if self._max_size is None or self._size <= self._max_size:
+                return
+
+            self._logger.debug(f"The http cache has {self._size} bytes. Evicting the least recently used entries...")
+            metas = sorted((entry for entry in os.scandir(self._directory) if entry.name.endswith('.json')),
+                           key=lambda entry: entry.stat().st_mtime)
+
+            for meta in metas:
+                if self._size <= self._max_size:
+                    break
+
+                body_path = meta.path[:-len('.json')] + '.html'
+                try:
+                    size = os.path.getsize(body_path)
+                    os.remove(body_path)
+                    os.remove(meta.path)
+                    self._size -= size
+                except OSError as e:
+                    self._logger.error(f"Error evicting the entry {meta.path} from the http cache: {e}")
@@ -0,0 +1,58 @@
+import requests
+import conf as cfg
+from logger import Logger
+from scrapper.soup import make_soup, CITIES_LIST_STRAINER
+
+
+class HttpDiscovery:
+    """
+    Class that knows how to discover the cities of the home page without a browser. It requests the pages of the
+    listing that the site loads while scrolling, and takes the lis of the cities from each response.
+    """
+
+    def __init__(self, logger=None, listing_url=cfg.NOMAD_LIST_LISTING_URL, verbose=False):
+        if logger is None:
+            logger = Logger(verbose=verbose).logger
+
+        self._logger = logger
+        self._listing_url = listing_url
+        self._session = requests.Session()
+        self._session.headers.update(cfg.HEADERS)
+
+    def _get_page(self, page):
+        """Given the number of the page, returns the lis of the cities in it."""
+        url = self._listing_url.format(page=page)
+        self._logger.debug(f"GET - {url}")
+        response = self._session.get(url, timeout=cfg.NOMAD_LIST_REQUEST_TIMEOUT)
+        self._logger.debug(f"Status Code: {response.status_code}")
+        response.raise_for_status()
+        return make_soup(response.content, parse_only=CITIES_LIST_STRAINER).find_all('li', attrs={'data-type': 'city'})
+
+    def iter_cities_lis(self, num_of_cities=None, scrolls=None):
+        """
+        Yields the lis of the cities page by page, until a page doesn't bring new cities.
+        Each scroll of the browser is equivalent to one more page of the listing.
+        """
+        seen_slugs = set()
+        yielded = 0
+        page = 1
+
+        try:
+            while scrolls is None or page <= scrolls + 1:
+                new_lis = [li for li in self._get_page(page) if li.attrs.get('data-slug') not in seen_slugs]
+
+                if not new_lis:
+                    break
+
+                for li in new_lis:
+                    if num_of_cities and yielded >= num_of_cities:
+                        return
+                    seen_slugs.add(li.attrs.get('data-slug'))
+                    yield li
+                    yielded += 1
+
+                page += 1
+        finally:
+            self._session.close()
+
+        self._logger.info(f"Finished the http discovery. {yielded} cities in {page - 1} pages.")
@@ -1,13 +1,26 @@
-import grequests
 import conf as cfg
 import os
-from requests import HTTPError
-from bs4 import BeautifulSoup
+import time
+from contextlib import nullcontext
+from requests import HTTPError, RequestException
 from scrapper.city_scrapper import CityScrapper
-from db.mysql_connector import MySQLConnector
+from db.storages import get_storage
+from db.connection_pool import ConnectionPool
+from db.run_journal import RunJournal
+from db.work_queue import WorkQueue
 import sys
 from logger import Logger
 from scrapper.web_driver import WebDriver
+from scrapper.http_discovery import HttpDiscovery
+from scrapper.fetcher import AsyncFetcher, FetchedResponse, get_request_url
+from scrapper.http_cache import HttpCache
+from scrapper.fingerprints import CityFingerprints
+from scrapper.pipeline import ScrapePipeline
+from scrapper.city_writers import CityWriters
+from scrapper.details_sink import DetailsSink
+from scrapper.page_archive import PageArchive
+from scrapper.reparser import Reparser
+from scrapper.soup import make_soup, CITIES_LIST_STRAINER
 from apis.aviation_stack import AviationStackAPI
 
 SHOULD_USE_THE_HTML_FILE = os.getenv('ENV') != "production" and cfg.LOAD_HTML_FROM_DISK
@@ -20,11 +33,9 @@ class NomadListScrapper:
         if logger is None:
             logger = Logger(verbose=verbose).logger
 
-        if web_driver is None:
-            web_driver = WebDriver(logger, cfg.NOMAD_LIST_URL)
-
         self._city_scrapper = CityScrapper(logger)
 
+        # The web driver starts a browser, so it's only created if the discovery needs it.
         self._driver = web_driver
         self._logger = logger
 
@@ -32,37 +43,47 @@ class NomadListScrapper:
 
         self._aviation_stack_api = AviationStackAPI(self._logger, verbose=verbose)
 
+    def _get_driver(self):
+        """Returns the web driver, creating it the first time."""
+        if self._driver is None:
+            self._driver = WebDriver(self._logger, cfg.NOMAD_LIST_URL)
+        return self._driver
+
     def _load_html_from_disk(self):
-        """Attempts to load the html locally"""
-        with open(cfg.PAGE_SOURCE, 'r') as opened_file:
-            page_source = opened_file.read()
-        return page_source
+        """Attempts to load the last version of the html from the page archive. Returns None if it's not archived."""
+        with PageArchive(logger=self._logger) as page_archive:
+            page_source = page_archive.get(cfg.NOMAD_LIST_URL)
+        return page_source.decode() if page_source is not None else None
 
     def _write_html_to_disk(self, page_source):
         try:
-            with open(cfg.PAGE_SOURCE, 'w+') as opened_file:
-                opened_file.write(page_source)
+            with PageArchive(logger=self._logger) as page_archive:
+                page_archive.store(cfg.NOMAD_LIST_URL, page_source)
         except Exception as e:
-            self._logger.error(f'There was an error writing the html file on path : {cfg.PAGE_SOURCE}. Error: {e}')
+            self._logger.error(f'There was an error writing the html in the page archive: '
+                               f'{cfg.PAGE_ARCHIVE["directory"]}. Error: {e}')
             sys.exit(1)
 
     def _get_html(self, **kwargs):
         """Gets the Main HTML file which contents will be scrapped"""
         self._logger.info('Retrieving base Html file')
-        if SHOULD_USE_THE_HTML_FILE and os.path.exists(cfg.PAGE_SOURCE):
+        page_source = None
+        if SHOULD_USE_THE_HTML_FILE:
             try:
                 page_source = self._load_html_from_disk()
             except Exception as e:
-                self._logger.error(f'There was an error loading the html file on path : {cfg.PAGE_SOURCE}. Error: {e}')
-                page_source = self._driver.get_page_source(**kwargs)
-        else:
-            page_source = self._driver.get_page_source(**kwargs)
+                self._logger.error(f'There was an error loading the html from the page archive: '
+                                   f'{cfg.PAGE_ARCHIVE["directory"]}. Error: {e}')
 
-        if SHOULD_USE_THE_HTML_FILE:
-            self._write_html_to_disk(page_source)
-            self._logger.info('New Html written to disk')
+        if page_source is None:
+            page_source = self._get_driver().get_page_source(**kwargs)
 
-        self._driver.close()
+            if SHOULD_USE_THE_HTML_FILE:
+                self._write_html_to_disk(page_source)
+                self._logger.info('New Html written to disk')
+
+        if self._driver is not None:
+            self._driver.close()
         return page_source
 
     def _get_cities(self, page_source, num_of_cities=None, **kwargs):
@@ -72,7 +93,7 @@ class NomadListScrapper:
                 self._logger.error('The website is None')
                 return
 
-            soup = BeautifulSoup(page_source, "html.parser")
+            soup = make_soup(page_source, parse_only=CITIES_LIST_STRAINER)
             self._logger.debug(f"Created Beautiful soup object from the HTML file")
             list_of_cities_html = soup.find_all('li', attrs={'data-type': 'city'})
             self._logger.debug(f"Cities achieved")
@@ -81,25 +102,111 @@ class NomadListScrapper:
             self._logger.error(f"Error trying to fetch the cities in the page source: {e}")
             sys.exit(1)
 
-    def _fetch_details(self, lis):
-        """Checks if the lis are valid, takes the valid ones and make the requests to the city details page.."""
-        self._logger.debug(f'Number of Cities: {len(lis)}')
+    def _get_cities_urls(self, lis):
+        """Given the lis of the cities, takes the valid ones and returns their urls."""
+        return (self._city_scrapper.get_city_url(li) for li in lis if self._city_scrapper.valid_tag(li))
+
+    def _discover_cities_urls_with_http(self, num_of_cities=None, scrolls=None):
+        """
+        Yields the urls of the cities using the HttpDiscovery. Returns True if it found any city, so the caller knows
+        if it has to fall back to the browser.
+        """
+        found = False
+
+        try:
+            for li in HttpDiscovery(self._logger).iter_cities_lis(num_of_cities, scrolls):
+                found = True
+                yield from self._get_cities_urls([li])
+        except RequestException as e:
+            self._logger.error(f"Error discovering the cities with http requests: {e}", exc_info=self._verbose)
+
+        return found
+
+    def _discover_cities_urls(self, num_of_cities=None, scrolls=None, discovery=None, **kwargs):
+        """
+        Yields the urls of the cities in the home page. Unless the html is loaded from disk, the urls are yielded while
+        they are discovered, so the details of the first cities can be fetched before the discovery finishes.
+        With the http discovery, the browser is only used as a fallback if no city was found.
+        """
+        if SHOULD_USE_THE_HTML_FILE:
+            page_source = self._get_html(num_of_cities=num_of_cities, scrolls=scrolls)
+            yield from self._get_cities_urls(self._get_cities(page_source, num_of_cities))
+            return
+
+        if (discovery or cfg.NOMAD_LIST_DISCOVERY) == 'http':
+            if (yield from self._discover_cities_urls_with_http(num_of_cities, scrolls)):
+                return
+            self._logger.warning("No cities were found with http requests. Falling back to the web driver...")
+
+        driver = self._get_driver()
+        try:
+            yield from self._get_cities_urls(driver.iter_cities_lis(num_of_cities, scrolls))
+        finally:
+            driver.close()
+
+    def _get_http_cache(self, http_cache=None):
+        """
+        Given the mode of the http cache, returns the HttpCache to use, or None if it's off.
+        In the prefer-cache mode, the cached pages never expire, so they are parsed again without refetching them.
+        """
+        mode = http_cache or cfg.HTTP_CACHE['mode']
+
+        if mode == 'off':
+            return None
+
+        ttl = None if mode == 'prefer-cache' else cfg.HTTP_CACHE['ttl']
+        return HttpCache(ttl=ttl, logger=self._logger)
+
+    def _get_pool(self, writers=None, bulk_load=False, **kwargs):
+        """Returns a pool with one connection to the database for each writer."""
+        return ConnectionPool(size=writers or cfg.NOMAD_LIST_PIPELINE_WRITERS, local_infile=bulk_load,
+                              logger=self._logger)
+
+    def _get_details_sink(self, save_details=False, **kwargs):
+        """If the details should be saved, returns the sink of the details file. Otherwise, an empty context."""
+        return DetailsSink(logger=self._logger) if save_details else nullcontext()
+
+    def _get_page_archive(self, archive_pages=False, **kwargs):
+        """If the pages should be archived, returns the page archive. Otherwise, an empty context."""
+        return PageArchive(logger=self._logger) if archive_pages else nullcontext()
+
+    def _get_fingerprints(self, pool, incremental=False):
+        """In the incremental mode, returns the fingerprints of the cities stored in the previous runs."""
+        if not incremental:
+            return None
+
+        with get_storage(logger=self._logger, pool=pool) as storage:
+            return CityFingerprints(storage.get_fingerprints())
+
+    def _fetch_details(self, urls, fetch_backend=None, http_cache=None):
+        """
+        Given the urls of the cities, makes the requests to the city details page.
+        The requests are made with grequests, or with the AsyncFetcher if the asyncio backend was selected.
+        """
         self._logger.info(f"Fetching more info of the cities.... This might take time.")
 
-        reqs = (grequests.get(self._city_scrapper.get_city_url(li), headers=cfg.HEADERS, stream=False)
-                for li in lis if self._city_scrapper.valid_tag(li))
+        # The http cache lives in the fetch layer of the AsyncFetcher, so it also selects that backend.
+        if (fetch_backend or cfg.NOMAD_LIST_FETCH_BACKEND) == 'asyncio' or http_cache:
+            return AsyncFetcher(self._logger, cache=http_cache).fetch(urls)
+
+        # grequests monkey-patches the standard library with gevent when it's imported,
+        # so it's only imported when that backend is the selected one.
+        import grequests
+
+        reqs = (grequests.get(url, headers=cfg.HEADERS, stream=False) for url in urls)
 
         return grequests.imap(reqs, size=cfg.NOMAD_LIST_REQUESTS_BATCH_SIZE, exception_handler=self._exception_handler)
 
     def _exception_handler(self, req, error):
-        """Logs the error of the requests."""
+        """Logs the error of the requests, and returns a failed response, so the city is marked as failed."""
         self._logger.error(f"Error making the request {req.url}: {error}.\n The response was: {req.response}")
+        return FetchedResponse.failed(req.url, error)
 
     def _map_details(self, res, aviation_stack_countries, aviation_stack_cities):
         """Try to get the details of the city using the content of the response. If the request failed,
         raises the appropriate an exception."""
         city_details_html = res.content
-        self._logger.debug(f"The status code of {res.request.url} was {res.status_code}.")
+        self._logger.debug(f"The status code of {res.url} was {res.status_code}.")
 
         # Raises HTTPError, if one occurred.
         res.raise_for_status()
@@ -110,37 +217,166 @@ class NomadListScrapper:
         """
         Takes the cities from the home page, builds a dictionary for each one with the available information.
         Then, returns a list of dicts with all the cities.
+        The run is journaled, so if it's interrupted, it can be resumed later processing only the unfinished cities.
         """
-        page_source = self._get_html(**kwargs)
-        list_of_cities_html = self._get_cities(page_source, **kwargs)
+        with RunJournal(id_run=kwargs.get('resume'), logger=self._logger) as journal, self._get_pool(**kwargs) as pool, \
+                self._get_details_sink(**kwargs) as details_sink, self._get_page_archive(**kwargs) as page_archive:
+            if kwargs.get('resume'):
+                urls = journal.get_unfinished_urls()
+            else:
+                urls = journal.track(self._discover_cities_urls(**kwargs))
+
+            self._scrap_cities_urls(urls, journal, pool, details_sink, page_archive, **kwargs)
+
+    def enqueue_cities(self, *args, **kwargs):
+        """Coordinator of the workers. Takes the cities from the home page, and puts their urls in the work queue."""
+        with WorkQueue(logger=self._logger) as work_queue:
+            total = work_queue.enqueue(self._discover_cities_urls(**kwargs))
+
+        self._logger.info(f"Discovery finished. Total enqueued cities: {total}.")
+
+    def work(self, *args, batch_size=None, **kwargs):
+        """
+        Worker of the work queue. Leases batches of urls, and scraps them until there is no more work.
+        While other workers hold leases, it waits in case they die and their urls are visible again.
+        The connections to the database, and the context of the scrape, are kept between the leases.
+        """
+        context = None
+
+        with WorkQueue(logger=self._logger) as work_queue, self._get_pool(**kwargs) as pool, \
+                self._get_page_archive(**kwargs) as page_archive:
+            while True:
+                urls = work_queue.lease(batch_size or cfg.WORK_QUEUE['batch_size'])
 
-        aviation_stack_countries = self._aviation_stack_api.countries()
-        aviation_stack_cities = self._aviation_stack_api.cities()
+                if urls:
+                    # The context is built with the first lease, and shared by the next ones.
+                    context = context or self._get_scrape_context(pool, **kwargs)
+                    self._scrap_cities_urls(urls, work_queue, pool, page_archive=page_archive, context=context,
+                                           **kwargs)
+                    work_queue.complete()
+                elif work_queue.has_unfinished():
+                    self._logger.info("Other workers are processing the remaining cities. Waiting...")
+                    time.sleep(cfg.WORK_QUEUE['poll_interval'])
+                else:
+                    break
 
-        total = successes = failures = 0
+        self._logger.info("The work queue is empty. The worker has finished.")
+
+    def ingest(self, *args, file=None, decoders=None, **kwargs):
+        """
+        Given a details file saved by a previous scrape, stores its cities again without scraping the site.
+        The lines are decoded in parallel processes, and the cities are written in batches by the writer threads.
+        """
+        details_sink = DetailsSink(path=file or cfg.JSON_FILENAME, logger=self._logger)
+
+        with self._get_pool(**kwargs) as pool, \
+                CityWriters(pool, writers=kwargs.get('writers'), write_batch_size=kwargs.get('write_batch_size'),
+                            bulk_load=kwargs.get('bulk_load'), logger=self._logger,
+                            verbose=self._verbose) as city_writers:
+            for url, details in details_sink.read(decoders):
+                city_writers.put(url, None, details)
+
+        self._logger.info(f"Ingest finished. Total stored cities: {city_writers.successes}.")
+        self._logger.debug(f"Successes: {city_writers.successes} - Failures: {city_writers.failures}")
+
+    def reparse(self, *args, at=None, parsers=None, store=False, **kwargs):
+        """
+        Parses the city pages of the page archive again, in parallel and without touching the site.
+        The snapshot has the last version of each page fetched until the given datetime, or until now.
+        If store, the details of the cities are written in the database.
+        """
+        reparser = Reparser(self._aviation_stack_api.countries(), self._aviation_stack_api.cities(), parsers=parsers,
+                            logger=self._logger, verbose=self._verbose)
+        timestamp = at.timestamp() if at else None
 
-        with MySQLConnector(logger=self._logger) as mysql_connector:
-            for res in self._fetch_details(list_of_cities_html):
+        if not store:
+            reparser.run(timestamp)
+            return
+
+        with self._get_pool(**kwargs) as pool, \
+                CityWriters(pool, writers=kwargs.get('writers'), write_batch_size=kwargs.get('write_batch_size'),
+                            bulk_load=kwargs.get('bulk_load'), logger=self._logger,
+                            verbose=self._verbose) as city_writers:
+            reparser.run(timestamp, city_writers)
+
+        self._logger.info(f"Reparse finished. Total stored cities: {city_writers.successes}.")
+        self._logger.debug(f"Successes: {city_writers.successes} - Failures: {city_writers.failures}")
+
+    def _get_scrape_context(self, pool, http_cache=None, incremental=False, **kwargs):
+        """
+        Returns what the scrape of any batch of cities reads: the Aviation Stack countries and cities, the http cache,
+        and the fingerprints of the previous runs.
+        """
+        return (self._aviation_stack_api.countries(), self._aviation_stack_api.cities(),
+                self._get_http_cache(http_cache), self._get_fingerprints(pool, incremental))
+
+    def _scrap_cities_urls(self, urls, journal, pool, details_sink=None, page_archive=None, context=None, **kwargs):
+        """
+        Given the urls of the cities, fetches, parses and stores all of them.
+        The state of each city is recorded in the journal (the RunJournal, or the WorkQueue of a worker).
+        The cities are stored by the writer threads, with the connections of the pool.
+        If there is a details sink, the parsed details are saved in it too. If there is a page archive, the fetched
+        pages are archived. If there is no context of the scrape, it's built.
+        """
+        aviation_stack_countries, aviation_stack_cities, http_cache, fingerprints = \
+            context or self._get_scrape_context(pool, **kwargs)
+
+        if kwargs.get('pipeline'):
+            pipeline = ScrapePipeline(aviation_stack_countries, aviation_stack_cities, logger=self._logger,
+                                      fetchers=kwargs.get('fetchers'), parsers=kwargs.get('parsers'),
+                                      writers=kwargs.get('writers'), write_batch_size=kwargs.get('write_batch_size'),
+                                      http_cache=http_cache, fingerprints=fingerprints, journal=journal, pool=pool,
+                                      bulk_load=kwargs.get('bulk_load'), details_sink=details_sink,
+                                      page_archive=page_archive, verbose=self._verbose)
+            total, successes, failures = pipeline.run(urls)
+            self._logger.info(f"Scrapping finished. Total scrapped cities: {total}.")
+            self._logger.debug(f"Successes: {successes} - Failures: {failures}")
+            return
+
+        total = failures = 0
+
+        with CityWriters(pool, writers=kwargs.get('writers'), write_batch_size=kwargs.get('write_batch_size'),
+                         fingerprints=fingerprints, journal=journal, bulk_load=kwargs.get('bulk_load'),
+                         details_sink=details_sink, logger=self._logger, verbose=self._verbose) as city_writers:
+            for res in self._fetch_details(urls, kwargs.get('fetch_backend'), http_cache):
+                # The states are kept under the requested url. After a redirect, res.url is another one.
+                url = get_request_url(res)
                 try:
+                    journal.record(url, RunJournal.FETCHED)
+                    if page_archive and res.status_code == 200:
+                        page_archive.store(url, res.content)
+
+                    page_hash = None
+                    if fingerprints:
+                        page_hash = fingerprints.page_hash(res.content)
+                        if fingerprints.is_unchanged(url, page_hash):
+                            self._logger.info(f"{url} didn't change since the last run. Skipping it...")
+                            journal.record(url, RunJournal.STORED)
+                            continue
+
                     details = self._map_details(res, aviation_stack_countries, aviation_stack_cities)
-                    res.close()
 
                     if details is None:
                         self._logger.info(f"Nothing to append with this city :(")
+                        journal.record(url, RunJournal.FAILED)
                         continue
 
-                    self._logger.info(f"Storing new details...")
-                    mysql_connector.insert_city_info(details)
-                    successes += 1
+                    city_writers.put(url, page_hash, details)
                 except HTTPError as e:
                     failures += 1
+                    journal.record(url, RunJournal.FAILED)
                     self._logger.error(f"HTTPError raised: {e}", exc_info=self._verbose)
                 except Exception as e:
                     failures += 1
+                    journal.record(url, RunJournal.FAILED)
                     self._logger.error(f"Exception raised trying to get the city details: {e}", exc_info=self._verbose)
                 finally:
+                    # The unchanged and the failed cities release their response too.
+                    res.close()
                     total += 1
 
+        successes, failures = city_writers.successes, failures + city_writers.failures
+
         self._logger.info(f"Scrapping finished. Total scrapped cities: {total}.")
         self._logger.debug(f"Successes: {successes} - Failures: {failures}")
 
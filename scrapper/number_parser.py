@@ -0,0 +1,16 @@
+import re
+
+# First number of a text of the site (eg: '25°C', '70%', 'US AQI 41', '$2,352 / mo').
+NUMBER = re.compile(r'-?\d+(?:\.\d+)?')
+
+
+def to_number(value):
+    """Given a value of the site (a text, an element or a number), returns its first number, or None if it has none."""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+
+    text = value.get_text() if hasattr(value, 'get_text') else str(value)
+    match = NUMBER.search(text.replace(',', '').replace('−', '-'))
+    return float(match.group()) if match else None
@@ -0,0 +1,142 @@
+import fcntl
+import json
+import mmap
+import os
+import threading
+import time
+import zlib
+from collections import defaultdict
+import conf as cfg
+from logger import Logger
+
+
+class PageArchive:
+    """
+    Pack-file archive of the fetched pages, to parse them again offline.
+    Each page is compressed on its own, and appended to one segment file. A separate index file has a json line per
+    page with the url, the time it was fetched, and the offset and size of its body in the segment.
+    The segment is read with mmap, so any page is a random read without loading the archive.
+    Many threads, and many processes, can store pages at the same time: each page is appended while holding a lock
+    on the segment file, so its offset is the end of the segment.
+    """
+
+    SEGMENT = 'pages.pack'
+    INDEX = 'pages.idx'
+
+    def __init__(self, directory=cfg.PAGE_ARCHIVE['directory'], logger=None, verbose=False):
+        if logger is None:
+            logger = Logger(verbose=verbose).logger
+
+        self._logger = logger
+        self._directory = directory
+        self._segment_path = os.path.join(directory, self.SEGMENT)
+        self._index_path = os.path.join(directory, self.INDEX)
+
+        # {url: [(fetched_at, offset, size)]}, in the order they were stored.
+        self._index = defaultdict(list)
+        self._segment_file = self._index_file = self._mmap = None
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        os.makedirs(self._directory, exist_ok=True)
+        self._load_index()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        for opened in [self._mmap, self._segment_file, self._index_file]:
+            if opened is not None:
+                opened.close()
+
+    def __contains__(self, url):
+        return url in self._index
+
+    def __len__(self):
+        return len(self._index)
+
+    def _load_index(self):
+        """Reads the index file. A truncated last line, left by a killed process, is skipped."""
+        if not os.path.exists(self._index_path):
+            return
+
+        with open(self._index_path, 'r') as index_file:
+            for line in index_file:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    self._logger.warning("Skipping a truncated line of the index of the page archive.")
+                    continue
+
+                self._index[entry['url']].append((entry['fetched_at'], entry['offset'], entry['size']))
+
+        self._logger.info(f"The page archive has {len(self._index)} pages.")
+
+    def store(self, url, body, fetched_at=None):
+        """Given the url and the body of a page, appends it to the archive."""
+        fetched_at = fetched_at or time.time()
+        compressed = zlib.compress(body.encode() if isinstance(body, str) else body)
+
+        with self._lock:
+            if self._segment_file is None:
+                self._segment_file = open(self._segment_path, 'ab')
+                self._index_file = open(self._index_path, 'a')
+
+            # The lock of the segment file is shared by the processes that store pages in the archive.
+            fcntl.flock(self._segment_file, fcntl.LOCK_EX)
+            try:
+                # If a killed process left a truncated line, the new lines start after it.
+                if self._index_file.seek(0, os.SEEK_END) and not self._ends_with_newline():
+                    self._index_file.write('\n')
+
+                # The body is written before its index line, so the index never points to a missing body.
+                offset = self._segment_file.seek(0, os.SEEK_END)
+                self._segment_file.write(compressed)
+                self._segment_file.flush()
+
+                entry = {'url': url, 'fetched_at': fetched_at, 'offset': offset, 'size': len(compressed)}
+                self._index_file.write(json.dumps(entry) + '\n')
+                self._index_file.flush()
+            finally:
+                fcntl.flock(self._segment_file, fcntl.LOCK_UN)
+
+            self._index[url].append((fetched_at, offset, len(compressed)))
+
+    def _ends_with_newline(self):
+        with open(self._index_path, 'rb') as index_file:
+            index_file.seek(-1, os.SEEK_END)
+            return index_file.read(1) == b'\n'
+
+    def read(self, offset, size):
+        """Given the offset and the size of a page in the segment, returns its body."""
+        with self._lock:
+            if self._mmap is None or offset + size > len(self._mmap):
+                # The segment grew since it was mapped, so it's mapped again.
+                if self._mmap is not None:
+                    self._mmap.close()
+                with open(self._segment_path, 'rb') as segment_file:
+                    self._mmap = mmap.mmap(segment_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+            compressed = self._mmap[offset:offset + size]
+
+        return zlib.decompress(compressed)
+
+    def snapshot(self, at=None):
+        """
+        Returns the (url, fetched_at, offset, size) of the last version of each page that was fetched until the given
+        time (a timestamp), or until now.
+        """
+        pages = []
+        for url, versions in self._index.items():
+            fetched = [version for version in versions if at is None or version[0] <= at]
+            if fetched:
+                pages.append((url, *max(fetched)))
+
+        return pages
+
+    def get(self, url, at=None):
+        """Given the url, returns the body of its last version until the given time, or None if it's not archived."""
+        versions = [version for version in self._index.get(url, []) if at is None or version[0] <= at]
+        if not versions:
+            return None
+
+        __, offset, size = max(versions)
+        return self.read(offset, size)
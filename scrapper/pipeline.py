@@ -0,0 +1,210 @@
+import collections
+import multiprocessing
+import os
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from requests import HTTPError
+import conf as cfg
+from logger import Logger
+from db.connection_pool import ConnectionPool
+from db.run_journal import RunJournal
+from scrapper.city_scrapper import CityScrapper
+from scrapper.city_writers import CityWriters
+from scrapper.fetcher import AsyncFetcher, get_request_url
+
+_DONE = object()
+
+# State of each parser process, set once by the initializer of the pool.
+_city_scrapper = None
+_aviation_stack_info = None
+
+
+def _init_parser(aviation_stack_countries, aviation_stack_cities, verbose):
+    """Builds the city scrapper of the parser process and keeps the Aviation Stack info to enrich the details."""
+    global _city_scrapper, _aviation_stack_info
+    _city_scrapper = CityScrapper(Logger(verbose=verbose).logger)
+    _aviation_stack_info = (aviation_stack_countries, aviation_stack_cities)
+
+
+def _parse_city_details(city_details_html):
+    """Runs in a parser process. Given the html of the city details page, returns the details of the city."""
+    return _city_scrapper.get_city_details(city_details_html, *_aviation_stack_info)
+
+
+class ScrapePipeline:
+    """
+    Class that knows how to scrap the cities in three stages connected by bounded queues:
+    the async fetchers download the pages, a pool of processes parses them, and the writers store the details.
+    Each stage has its own number of workers, so the network, the CPUs and the database are busy at the same time.
+    The writers take their connections from the given pool, or from a new one.
+    """
+
+    def __init__(self, aviation_stack_countries, aviation_stack_cities, logger=None, fetchers=None, parsers=None,
+                 writers=None, queue_size=cfg.NOMAD_LIST_PIPELINE_QUEUE_SIZE, write_batch_size=None, http_cache=None,
+                 fingerprints=None, journal=None, pool=None, bulk_load=False, details_sink=None, page_archive=None,
+                 verbose=False):
+        if logger is None:
+            logger = Logger(verbose=verbose).logger
+
+        self._logger = logger
+        self._verbose = verbose
+        self._aviation_stack_info = (aviation_stack_countries, aviation_stack_cities)
+        self._http_cache = http_cache
+        self._fingerprints = fingerprints
+        self._journal = journal
+
+        self._fetchers = fetchers or cfg.NOMAD_LIST_REQUESTS_BATCH_SIZE
+        self._parsers = parsers or os.cpu_count() or 1
+        self._writers = writers or cfg.NOMAD_LIST_PIPELINE_WRITERS
+        self._write_batch_size = write_batch_size
+        self._queue_size = queue_size
+        self._pool = pool
+        self._bulk_load = bulk_load
+        self._details_sink = details_sink
+        self._page_archive = page_archive
+
+        self._fetched = queue.Queue(maxsize=queue_size)
+        # Store stage. It's started when the pipeline runs.
+        self._city_writers = None
+
+        self._lock = threading.Lock()
+        self._total = self._successes = self._failures = 0
+
+    def _record(self, url, state):
+        """Records the new state of the city in the journal of the run, if there is one."""
+        if self._journal:
+            self._journal.record(url, state)
+
+    def _count(self, success):
+        """Counts a processed city in a thread safe way."""
+        with self._lock:
+            self._total += 1
+            if success:
+                self._successes += 1
+            elif success is not None:
+                self._failures += 1
+
+    def _fetch(self, urls):
+        """Fetch stage. Puts every response in the fetched queue, and then one end mark per parser."""
+        try:
+            fetcher = AsyncFetcher(self._logger, concurrency=self._fetchers, cache=self._http_cache)
+            for response in fetcher.fetch(urls):
+                self._fetched.put(response)
+        finally:
+            for _ in range(self._parsers):
+                self._fetched.put(_DONE)
+
+    def _fail(self, url, e):
+        """Given the url of a city and the exception raised while processing it, counts it as a failure."""
+        self._record(url, RunJournal.FAILED)
+        self._count(False)
+        if isinstance(e, HTTPError):
+            self._logger.error(f"HTTPError raised: {e}", exc_info=self._verbose)
+        else:
+            self._logger.error(f"Exception raised trying to get the city details: {e}", exc_info=self._verbose)
+
+    def _submit(self, executor, response):
+        """
+        Given a fetched response, submits its page to the parser processes. Returns the url, the hash of the page and
+        the future of the details, or None if the city was skipped or failed.
+        """
+        # The states are kept under the requested url. After a redirect, response.url is another one.
+        url = get_request_url(response)
+        try:
+            self._record(url, RunJournal.FETCHED)
+            if self._page_archive and response.status_code == 200:
+                self._page_archive.store(url, response.content)
+
+            page_hash = None
+            if self._fingerprints:
+                page_hash = self._fingerprints.page_hash(response.content)
+                if self._fingerprints.is_unchanged(url, page_hash):
+                    self._logger.info(f"{url} didn't change since the last run. Skipping it...")
+                    self._record(url, RunJournal.STORED)
+                    self._count(None)
+                    return None
+
+            self._logger.debug(f"The status code of {response.url} was {response.status_code}.")
+            # Raises HTTPError, if one occurred.
+            response.raise_for_status()
+            return url, page_hash, executor.submit(_parse_city_details, response.content)
+        except Exception as e:
+            self._fail(url, e)
+
+    def _put_details(self, url, page_hash, future):
+        """Given a submitted page, waits for its details, and puts them in the parsed queue."""
+        try:
+            details = future.result()
+
+            if details is None:
+                self._logger.info(f"Nothing to append with this city :(")
+                self._record(url, RunJournal.FAILED)
+                self._count(None)
+                return
+
+            self._city_writers.put(url, page_hash, details)
+        except Exception as e:
+            self._fail(url, e)
+
+    def _parse(self, executor):
+        """
+        Parse stage. Each thread submits the fetched pages to the parser processes, and puts the details in the parsed
+        queue. It keeps a few pages in flight, so the processes have work while the thread waits for the details.
+        """
+        in_flight = collections.deque()
+        while (response := self._fetched.get()) is not _DONE:
+            if submitted := self._submit(executor, response):
+                in_flight.append(submitted)
+            if len(in_flight) >= cfg.NOMAD_LIST_PIPELINE_PARSES_IN_FLIGHT:
+                self._put_details(*in_flight.popleft())
+
+        while in_flight:
+            self._put_details(*in_flight.popleft())
+
+    def _report(self, finished):
+        """Logs the depth of the queues between the stages until the pipeline finishes."""
+        while not finished.wait(cfg.NOMAD_LIST_PIPELINE_REPORT_INTERVAL):
+            stored = self._city_writers.successes + self._city_writers.failures
+            self._logger.info(f"Queue depth - Fetched: {self._fetched.qsize()} - Parsed: {self._city_writers.qsize()} - "
+                              f"Processed cities: {self._total + stored}")
+
+    def run(self, urls):
+        """
+        Given the urls of the cities, runs all the stages until every city was processed.
+        Returns the total of processed cities, the successes and the failures.
+        """
+        self._logger.info(f"Running the pipeline with {self._fetchers} fetchers, {self._parsers} parsers "
+                          f"and {self._writers} writers...")
+        # The parser processes are spawned, not forked: a fork copies the locks of the running threads of the
+        # pipeline (eg: the logging handlers and the queues), which could stay taken in the child.
+        executor = ProcessPoolExecutor(max_workers=self._parsers, mp_context=multiprocessing.get_context('spawn'),
+                                       initializer=_init_parser, initargs=(*self._aviation_stack_info, self._verbose))
+        pool = self._pool or ConnectionPool(size=self._writers, local_infile=self._bulk_load, logger=self._logger)
+        self._city_writers = CityWriters(pool, writers=self._writers, write_batch_size=self._write_batch_size,
+                                         queue_size=self._queue_size, fingerprints=self._fingerprints,
+                                         journal=self._journal, bulk_load=self._bulk_load,
+                                         details_sink=self._details_sink, logger=self._logger, verbose=self._verbose)
+
+        finished = threading.Event()
+        reporter = threading.Thread(target=self._report, args=(finished,), daemon=True)
+        reporter.start()
+
+        try:
+            with self._city_writers, executor:
+                fetcher = threading.Thread(target=self._fetch, args=(urls,))
+                parsers = [threading.Thread(target=self._parse, args=(executor,)) for _ in range(self._parsers)]
+
+                for thread in [fetcher, *parsers]:
+                    thread.start()
+
+                fetcher.join()
+                for thread in parsers:
+                    thread.join()
+        finally:
+            finished.set()
+            if pool is not self._pool:
+                pool.close()
+
+        successes, failures = self._city_writers.successes, self._city_writers.failures
+        return self._total + successes + failures, self._successes + successes, self._failures + failures
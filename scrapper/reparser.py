@@ -0,0 +1,81 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import conf as cfg
+from logger import Logger
+from scrapper.city_scrapper import CityScrapper
+from scrapper.page_archive import PageArchive
+
+# State of each parser process, set once by the initializer of the pool.
+_city_scrapper = None
+_aviation_stack_info = None
+_page_archive = None
+_logger = None
+
+
+def _init_reparser(directory, aviation_stack_countries, aviation_stack_cities, verbose):
+    """Builds the city scrapper of the parser process, and maps the segment of the archive in the process."""
+    global _city_scrapper, _aviation_stack_info, _page_archive, _logger
+    _logger = Logger(verbose=verbose).logger
+    _city_scrapper = CityScrapper(_logger)
+    _aviation_stack_info = (aviation_stack_countries, aviation_stack_cities)
+    _page_archive = PageArchive(directory, logger=_logger)
+
+
+def _reparse_page(page):
+    """Runs in a parser process. Given an archived page, reads it from the segment and returns the city details."""
+    url, __, offset, size = page
+    try:
+        return url, _city_scrapper.get_city_details(_page_archive.read(offset, size), *_aviation_stack_info)
+    except Exception as e:
+        _logger.error(f"Exception raised trying to parse the archived page of {url}: {e}")
+        return url, None
+
+
+class Reparser:
+    """
+    Class that knows how to run the city scrapper over a snapshot of the page archive, fully offline.
+    Each parser process reads the pages from its own map of the segment, so only their offsets are sent to it.
+    The runs are repeatable, so they can compare the results or the speed of the parser after a change.
+    """
+
+    def __init__(self, aviation_stack_countries, aviation_stack_cities, parsers=None,
+                 directory=cfg.PAGE_ARCHIVE['directory'], logger=None, verbose=False):
+        if logger is None:
+            logger = Logger(verbose=verbose).logger
+
+        self._logger = logger
+        self._verbose = verbose
+        self._aviation_stack_info = (aviation_stack_countries, aviation_stack_cities)
+        self._parsers = parsers or os.cpu_count() or 1
+        self._directory = directory
+
+    def run(self, at=None, city_writers=None):
+        """
+        Given the time of the snapshot (a timestamp, or None for the last version of each page), parses its city
+        pages in parallel. If the city writers are given, the details are stored.
+        Returns the number of parsed pages, the failures, and the seconds it took.
+        """
+        with PageArchive(self._directory, logger=self._logger) as page_archive:
+            pages = [page for page in page_archive.snapshot(at) if page[0] != cfg.NOMAD_LIST_URL]
+
+        self._logger.info(f"Parsing {len(pages)} archived pages with {self._parsers} parsers...")
+        parsed = failures = 0
+        start = time.perf_counter()
+
+        with ProcessPoolExecutor(max_workers=self._parsers, initializer=_init_reparser,
+                                 initargs=(self._directory, *self._aviation_stack_info, self._verbose)) as executor:
+            chunk_size = max(1, len(pages) // (self._parsers * 4))
+            for url, details in executor.map(_reparse_page, pages, chunksize=chunk_size):
+                if details is None:
+                    failures += 1
+                    continue
+
+                parsed += 1
+                if city_writers:
+                    city_writers.put(url, None, details)
+
+        elapsed = time.perf_counter() - start
+        self._logger.info(f"{parsed} pages parsed in {elapsed:.2f} seconds ({parsed / (elapsed or 1):.1f} pages/s). "
+                          f"Failures: {failures}")
+        return parsed, failures, elapsed
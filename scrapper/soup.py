@@ -0,0 +1,39 @@
+from bs4 import BeautifulSoup, SoupStrainer, FeatureNotFound
+import conf as cfg
+
+FALLBACK_HTML_PARSER = "html.parser"
+
+# Only the subtrees that the city scrapper reads: the header with the name of the city and the country,
+# the list of tabs, and the container with the content of the tabs.
+CITY_DETAILS_STRAINER = SoupStrainer(class_=["text", "tabs", "tab-scroller-container"])
+
+# Only the lis of the cities in the home page.
+CITIES_LIST_STRAINER = SoupStrainer("li", attrs={'data-type': 'city'})
+
+_available_parsers = {}
+
+
+def _is_available(parser):
+    """Checks, only once per parser, if BeautifulSoup has a tree builder for it."""
+    if parser not in _available_parsers:
+        try:
+            BeautifulSoup("", parser)
+            _available_parsers[parser] = True
+        except FeatureNotFound:
+            _available_parsers[parser] = False
+
+    return _available_parsers[parser]
+
+
+def get_parser(parser=None):
+    """Returns the configured html parser, or the html.parser if the configured one is not installed (eg: lxml)."""
+    parser = parser or cfg.NOMAD_LIST_HTML_PARSER
+    return parser if _is_available(parser) else FALLBACK_HTML_PARSER
+
+
+def make_soup(markup, parse_only=None, parser=None):
+    """
+    Given the markup, builds the soup object with the configured parser.
+    If parse_only is a SoupStrainer, only the matching subtrees are built.
+    """
+    return BeautifulSoup(markup, get_parser(parser), parse_only=parse_only)
@@ -2,8 +2,10 @@ import time
 import re
 import itertools
 import requests as rq
-from bs4 import BeautifulSoup
 from logger import Logger
+from .soup import make_soup
+from .number_parser import to_number
+from .city_page import CityPage
 
 LATIN1_NON_BREAKING_SPACE = u'\xa0'
 
@@ -14,9 +16,14 @@ class TabScrapper:
     tab and how to valid the html tag.
     """
 
-    def __init__(self, soup, logger=None):
-        container = soup.find("div", class_="tab-scroller-container")
-        self._tab_scroller = container.find("div", class_="tab-scroller")
+    # Class of the div of the tab, used to take it from the city page.
+    tab_class = None
+
+    def __init__(self, city_page, logger=None):
+        if not isinstance(city_page, CityPage):
+            city_page = CityPage(city_page)
+
+        self._tab = city_page.get_tab(self.tab_class)
         if logger is None:
             logger = Logger().logger
         self._logger = logger
@@ -83,13 +90,11 @@ class KeyValueTabScrapper(TabScrapper):
 class ScoresTabScrapper(KeyValueTabScrapper):
     """Class that knows how to scrap the data from the Scores tab."""
 
+    tab_class = "tab-ranking"
+
     # Rank regex
     rank_re = re.compile(r'.*\(Rank #(\d+)\).*')
 
-    def __init__(self, soup, **kwargs):
-        super().__init__(soup, **kwargs)
-        self._tab = self._tab_scroller.find("div", class_="tab tab-ranking show")
-
     def _get_value(self, value_column):
         """Override the super class method. Given the value column it takes and returns the text of the value."""
         return value_column.div.div.text, self.get_bar_value(value_column)
@@ -111,9 +116,7 @@ class ScoresTabScrapper(KeyValueTabScrapper):
 class DigitalNomadGuideTabScrapper(KeyValueTabScrapper):
     """Class that knows how to scrap the data from the Digital Nomad Guide tab."""
 
-    def __init__(self, soup, **kwargs):
-        super().__init__(soup, **kwargs)
-        self._tab = self._tab_scroller.find("div", class_="tab tab-digital-nomad-guide")
+    tab_class = "tab-digital-nomad-guide"
 
     def _get_value(self, value_column):
         url = a.attrs.get('href') if (a := value_column.find('a')) else None
@@ -127,22 +130,22 @@ class DigitalNomadGuideTabScrapper(KeyValueTabScrapper):
 class CostOfLivingTabScrapper(KeyValueTabScrapper):
     """Class that knows how to scrap the data from the Cost of Living tab."""
 
-    def __init__(self, soup, **kwargs):
-        super().__init__(soup, **kwargs)
-        self._tab = self._tab_scroller.find("div", class_="tab editable tab-cost-of-living double-width")
+    tab_class = "tab-cost-of-living"
 
     def _get_value(self, value_column):
         # The variable "a" is assigned in the if statement
         url = a.attrs.get('href') if (a := value_column.find('a')) else None
-        return value_column.text, None, url
+        # The first number of the text (eg: 2352 of '$2,352 / mo') is the value, so the costs can be compared.
+        return value_column.text, to_number(value_column.text), url
 
 
 class ProsAndConsTabScrapper(TabScrapper):
     """Class that knows how to scrap the data from the Pros and Cons tab."""
 
-    def __init__(self, soup, **kwargs):
-        super().__init__(soup, **kwargs)
-        self._tab = self._tab_scroller.find("div", class_="tab tab-pros-cons")
+    tab_class = "tab-pros-cons"
+
+    def __init__(self, city_page, **kwargs):
+        super().__init__(city_page, **kwargs)
         self._keys_dict = {0: 'pros', 1: 'cons'}
 
     def _get_information(self):
@@ -166,9 +169,7 @@ class ProsAndConsTabScrapper(TabScrapper):
 class ReviewsTabScrapper(TabScrapper):
     """Class that knows how to scrap the data from the Reviews tab."""
 
-    def __init__(self, soup, **kwargs):
-        super().__init__(soup, **kwargs)
-        self._tab = self._tab_scroller.find("div", class_="tab tab-reviews")
+    tab_class = "tab-reviews"
 
     def _get_review(self, element):
         return element.find("div", class_="review-text").text
@@ -185,16 +186,18 @@ class ReviewsTabScrapper(TabScrapper):
 class WeatherTabScrapper(TabScrapper):
     """Class that knows how to scrap the data from the Weather tab."""
 
-    def __init__(self, soup, **kwargs):
-        super().__init__(soup, **kwargs)
-        self._tab = self._tab_scroller.find("div", class_="tab tab-weather")
+    tab_class = "tab-weather"
+
+    def __init__(self, city_page, **kwargs):
+        super().__init__(city_page, **kwargs)
         self.climate_table = self._tab.find("table", class_="climate")
         self._value_getters_by_key = {**dict.fromkeys(['Feels', 'Real'], self._get_temperature),
                                       **dict.fromkeys(['Humidity', 'Rain', 'Cloud', 'Air quality', 'Sun'],
                                                       self._get_weather_indexes)}
 
     def _get_information(self):
-        """Takes all the value from the weather matrix, and builds a dict with tuples for each weather attribute.
+        """Takes all the value from the weather matrix, and builds a dict with tuples for each weather attribute:
+        (month, value, description, number). The number of the value is parsed here, so it's stored typed.
         Then, returns the dict."""
         weather_dict = {}
         table_body = self.climate_table
@@ -207,10 +210,16 @@ class WeatherTabScrapper(TabScrapper):
             key = cols[0].get_text()
             value_getter = self._value_getters_by_key.get(key, self._get_remote_workers)
 
-            weather_dict.update({key: [(months[i],) + value_getter(col) for i, col in enumerate(cols[1:])]})
+            weather_dict.update({key: [(months[i], *values, self._get_number(values))
+                                       for i, values in enumerate(map(value_getter, cols[1:]))]})
 
         return weather_dict
 
+    @staticmethod
+    def _get_number(values):
+        """Given the value and the description of a month, returns the first number of them, or None."""
+        return next((number for value in values if (number := to_number(value)) is not None), None)
+
     def _get_temperature(self, col):
         metric, desc = col.find("span", class_="metric"), col.find("span", class_="")
         return tuple([value.get_text(strip=True) for value in [metric, desc]])
@@ -227,9 +236,7 @@ class WeatherTabScrapper(TabScrapper):
 class PhotosTabScrapper(TabScrapper):
     """Class that knows how to scrap data from the Photos tab."""
 
-    def __init__(self, soup, **kwargs):
-        super().__init__(soup, **kwargs)
-        self._tab = self._tab_scroller.find("div", class_="tab tab-photos")
+    tab_class = "tab-photos"
 
     def _get_information(self):
         """Takes all the pictures from the tab, and returns an array with all of them."""
@@ -252,60 +259,54 @@ class CityGridTabScrapper(TabScrapper):
 class NearTabScrapper(CityGridTabScrapper):
     """Class that knows how to scrap data from the Near tab."""
 
-    def __init__(self, soup, **kwargs):
-        super().__init__(soup, **kwargs)
-        self._tab = self._tab_scroller.find("div", class_="tab tab-near")
+    tab_class = "tab-near"
 
 
 class NextTabScrapper(CityGridTabScrapper):
     """Class that knows how to scrap data from the Next tab."""
 
-    def __init__(self, soup, **kwargs):
-        super().__init__(soup, **kwargs)
-        self._tab = self._tab_scroller.find("div", class_="tab tab-next")
+    tab_class = "tab-next"
 
 
 class SimilarTabScrapper(CityGridTabScrapper):
     """Class that knows how to scrap data from the Similar tab."""
 
-    def __init__(self, soup, **kwargs):
-        super().__init__(soup, **kwargs)
-        self._tab = self._tab_scroller.find("div", class_="tab tab-similar")
+    tab_class = "tab-similar"
 
 
 def main():
     nomadlist_lisbon_url = "https://nomadlist.com/lisbon"
     nomadlist_lisbon_text = rq.get(nomadlist_lisbon_url).content
-    nomadlist_lisbon_soup = BeautifulSoup(nomadlist_lisbon_text, "html.parser")
+    nomadlist_lisbon_page = CityPage(make_soup(nomadlist_lisbon_text))
 
-    scores_tab_scrapper = ScoresTabScrapper(nomadlist_lisbon_soup)
+    scores_tab_scrapper = ScoresTabScrapper(nomadlist_lisbon_page)
     print(scores_tab_scrapper.get_information())
 
-    digital_nomad_guide_tab_scrapper = DigitalNomadGuideTabScrapper(nomadlist_lisbon_soup)
+    digital_nomad_guide_tab_scrapper = DigitalNomadGuideTabScrapper(nomadlist_lisbon_page)
     print(digital_nomad_guide_tab_scrapper.get_information())
 
-    cost_of_living_tab_scrapper = CostOfLivingTabScrapper(nomadlist_lisbon_soup)
+    cost_of_living_tab_scrapper = CostOfLivingTabScrapper(nomadlist_lisbon_page)
     print(cost_of_living_tab_scrapper.get_information())
 
-    pros_and_cons_tab_scrapper = ProsAndConsTabScrapper(nomadlist_lisbon_soup)
+    pros_and_cons_tab_scrapper = ProsAndConsTabScrapper(nomadlist_lisbon_page)
     print(pros_and_cons_tab_scrapper.get_information())
 
-    reviews_tab_scrapper = ReviewsTabScrapper(nomadlist_lisbon_soup)
+    reviews_tab_scrapper = ReviewsTabScrapper(nomadlist_lisbon_page)
     print(reviews_tab_scrapper.get_information())
 
-    weather_tab_scrapper = WeatherTabScrapper(nomadlist_lisbon_soup)
+    weather_tab_scrapper = WeatherTabScrapper(nomadlist_lisbon_page)
     print(weather_tab_scrapper.get_information())
 
-    photos_tab_scrapper = PhotosTabScrapper(nomadlist_lisbon_soup)
+    photos_tab_scrapper = PhotosTabScrapper(nomadlist_lisbon_page)
     print(photos_tab_scrapper.get_information())
 
-    near_tab_scrapper = NearTabScrapper(nomadlist_lisbon_soup)
+    near_tab_scrapper = NearTabScrapper(nomadlist_lisbon_page)
     print(near_tab_scrapper.get_information())
 
-    next_tab_scrapper = NextTabScrapper(nomadlist_lisbon_soup)
+    next_tab_scrapper = NextTabScrapper(nomadlist_lisbon_page)
     print(next_tab_scrapper.get_information())
 
-    similar_tab_scrapper = SimilarTabScrapper(nomadlist_lisbon_soup)
+    similar_tab_scrapper = SimilarTabScrapper(nomadlist_lisbon_page)
     print(similar_tab_scrapper.get_information())
 
     print("Lets got to sleep before starting again...")
@@ -1,9 +1,11 @@
-from bs4 import BeautifulSoup
 from selenium import webdriver
-from selenium.webdriver import ChromeOptions
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.support.ui import WebDriverWait
 from webdriver_manager.chrome import ChromeDriverManager
 import conf as cfg
-import time
+from scrapper.soup import make_soup, CITIES_LIST_STRAINER
+
+CITIES_SELECTOR = "li[data-type=city]"
 
 
 class WebDriver:
@@ -24,6 +26,31 @@ class WebDriver:
         """Takes the scroll height of the document executing javascript in the browser."""
         return self._driver.execute_script("return document.body.scrollHeight")
 
+    def _count_cities(self):
+        """Counts the lis of the cities with a query in the browser, without parsing the page source."""
+        return self._driver.execute_script(f"return document.querySelectorAll('{CITIES_SELECTOR}').length")
+
+    def _get_cities_lis(self, start):
+        """Returns the html of the lis of the cities that appeared after the first <start> ones."""
+        return self._driver.execute_script(
+            f"return Array.from(document.querySelectorAll('{CITIES_SELECTOR}'))"
+            f".slice(arguments[0]).map(li => li.outerHTML)", start)
+
+    def _scroll_and_wait(self, last_count, last_height):
+        """
+        Scrolls down to the bottom, and waits until new cities appear or the height of the page changes.
+        Returns False if nothing changed before the timeout.
+        """
+        self._driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+        self._logger.info(f"Scroll height: {last_height}")
+
+        try:
+            WebDriverWait(self._driver, cfg.NOMAD_LIST_SCROLL_TIMEOUT, poll_frequency=cfg.NOMAD_LIST_SCROLL_POLL).until(
+                lambda driver: self._count_cities() > last_count or self._get_scroll_height() != last_height)
+            return True
+        except TimeoutException:
+            return False
+
     def get_base_url(self):
         return self._driver.get(self._base_url)
 
@@ -31,37 +58,37 @@ class WebDriver:
         self._logger.info('Closing Driver')
         self._driver.quit()
 
-    def get_page_source(self, num_of_cities=None, scrolls=None, **kwargs):
-        """Scroll to the end of the main page and returns all the source code."""
+    def iter_cities_lis(self, num_of_cities=None, scrolls=None):
+        """
+        Scroll to the end of the main page, and yields the lis of the cities as they appear,
+        so the caller can start working with them before the scroll finishes.
+        """
         self._logger.info('Initializing Scrolling')
         self._driver.get(self._base_url)
         self._logger.info("Scrolling down...")
-        # Get scroll height
-        last_height = self._get_scroll_height()
 
-        num_of_scrolls = 1
+        num_of_scrolls = 0
+        yielded = 0
 
-        while scrolls is None or scrolls <= num_of_scrolls:
-            soup = BeautifulSoup(self._driver.page_source, "html.parser")
-            cities_lis = soup.find_all('li', attrs={'data-type': 'city'})
+        while True:
+            for li_html in self._get_cities_lis(yielded):
+                if num_of_cities and yielded >= num_of_cities:
+                    break
+                yield make_soup(li_html, parse_only=CITIES_LIST_STRAINER).li
+                yielded += 1
 
-            if num_of_cities and len(cities_lis) >= num_of_cities:
+            if (num_of_cities and yielded >= num_of_cities) or (scrolls is not None and num_of_scrolls >= scrolls):
                 break
 
-            # Scroll down to bottom
-            self._driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            self._logger.info(f"Scroll height: {last_height}")
-
-            # Wait to load page
-            time.sleep(cfg.NOMAD_LIST_SCROLL_PAUSE_TIME)
-
-            # Calculate new scroll height and compare with last scroll height
-            new_height = self._get_scroll_height()
-            if new_height == last_height:
+            if not self._scroll_and_wait(yielded, self._get_scroll_height()):
                 break
-            last_height = new_height
             num_of_scrolls += 1
 
         self._logger.info('Finished scrolling')
 
+    def get_page_source(self, num_of_cities=None, scrolls=None, **kwargs):
+        """Scroll to the end of the main page and returns all the source code."""
+        for _ in self.iter_cities_lis(num_of_cities, scrolls):
+            pass
+
         return self._driver.page_source
@@ -0,0 +1,32 @@
+import os
+import tempfile
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The modules read their SQL files, and write their logs, relative to the root of the repository.
+os.chdir(ROOT)
+os.makedirs('files', exist_ok=True)
+
+# The tests run without services: the cities are stored in SQLite, and the other files are written in a temporary
+# directory. The configuration is read when conf is imported, so it's set before importing the modules.
+FILES_DIRECTORY = tempfile.mkdtemp(prefix='nomad_list_tests_')
+os.environ.update({
+    'NOMAD_LIST_STORAGE': 'sqlite',
+    'NOMAD_LIST_SQLITE_PATH': os.path.join(FILES_DIRECTORY, 'nomad_list.db'),
+    'NOMAD_LIST_QUERY_CACHE': 'off',
+    'NOMAD_LIST_HTTP_CACHE_DIRECTORY': os.path.join(FILES_DIRECTORY, 'http_cache'),
+    'NOMAD_LIST_PAGE_ARCHIVE_DIRECTORY': os.path.join(FILES_DIRECTORY, 'page_archive'),
+    'NOMAD_LIST_SNAPSHOT_DIRECTORY': os.path.join(FILES_DIRECTORY, 'snapshot'),
+    'NOMAD_LIST_DETAILS_FILE': os.path.join(FILES_DIRECTORY, 'details.jsonl.gz'),
+})
+
+
+@pytest.fixture
+def database():
+    """Creates an empty SQLite database, and returns its path."""
+    from db.sqlite_storage import SQLiteStorage
+
+    path = os.environ['NOMAD_LIST_SQLITE_PATH']
+    SQLiteStorage.create_database(path=path, force=True)
+    return path
@@ -0,0 +1,99 @@
+import os
+import pytest
+from db.bulk_load_benchmark import BulkLoadBenchmark
+from db.bulk_loader import BulkLoader, to_tsv_field
+from db.mysql_connector import MySQLConnector
+
+# The tests against a MySQL server run only when NOMAD_LIST_TEST_MYSQL is set. They use the database of the
+# NOMAD_LIST_MYSQL_* variables, which must have the schema and allow LOAD DATA LOCAL INFILE, and roll back every row.
+requires_mysql = pytest.mark.skipif(not os.getenv('NOMAD_LIST_TEST_MYSQL'),
+                                    reason="NOMAD_LIST_TEST_MYSQL is not set, so there is no MySQL server to test")
+
+
+@pytest.mark.parametrize('value, field', [
+    ('Coffee\tshop', 'Coffee\\tshop'),
+    ('First line\nSecond line\r', 'First line\\nSecond line\\r'),
+    ('C:\\nomad\\list', 'C:\\\\nomad\\\\list'),
+    ('Zero\0byte', 'Zero\\0byte'),
+    (None, '\\N'),
+    ('None', 'None'),
+    (2352.5, '2352.5'),
+])
+def test_the_fields_of_the_rows(value, field):
+    assert to_tsv_field(value) == field
+
+
+class RecordingCursor:
+    """Cursor that records the statements of the loader, and the staged file of LOAD DATA while it exists."""
+
+    def __init__(self, connection):
+        self._connection = connection
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+    def execute(self, query, params=None):
+        self._connection.statements.append(' '.join(query.split()))
+        if params is not None:
+            with open(params, encoding='utf-8') as tsv_file:
+                self._connection.staged_files.append((params, tsv_file.read()))
+
+
+class RecordingConnection:
+    def __init__(self):
+        self.statements = []
+        self.staged_files = []
+
+    def cursor(self):
+        return RecordingCursor(self)
+
+
+def test_the_rows_are_staged_and_merged_into_the_table():
+    connection = RecordingConnection()
+    rows = [(1, 2, 'Coffee\tshop', 2.5, 'https://nomadlist.com/lisbon'),
+            (1, 3, None, None, 'https://nomadlist.com/lisbon')]
+
+    BulkLoader(connection).load('city_attributes', rows)
+
+    columns = 'id_city, id_attribute, description, attribute_value, url'
+    (path, staged_rows), = connection.staged_files
+    assert connection.statements == [
+        f"CREATE TEMPORARY TABLE IF NOT EXISTS staging_city_attributes SELECT {columns} FROM city_attributes LIMIT 0",
+        "DELETE FROM staging_city_attributes;",
+        f"LOAD DATA LOCAL INFILE %s INTO TABLE staging_city_attributes CHARACTER SET utf8mb4 ({columns})",
+        f"INSERT INTO city_attributes ({columns}) SELECT * FROM (SELECT {columns} FROM staging_city_attributes) as new "
+        f"ON DUPLICATE KEY UPDATE description = new.description, attribute_value = new.attribute_value, url = new.url",
+    ]
+    assert staged_rows == ("1\t2\tCoffee\\tshop\t2.5\thttps://nomadlist.com/lisbon\n"
+                           "1\t3\t\\N\t\\N\thttps://nomadlist.com/lisbon\n")
+    assert not os.path.exists(path)
+
+
+def test_the_existing_rows_of_a_table_without_updated_columns_are_kept():
+    connection = RecordingConnection()
+
+    BulkLoader(connection).load('photos', [(1, 'https://nomadlist.com/lisbon.jpg')])
+
+    assert connection.statements[-1] == "INSERT IGNORE INTO photos (id_city, src) SELECT id_city, src FROM staging_photos"
+
+
+@requires_mysql
+def test_the_loaded_rows_are_the_staged_ones():
+    with MySQLConnector.connect(local_infile=True) as connection:
+        try:
+            rows = BulkLoadBenchmark(num_of_rows=4)._create_rows(connection)
+            descriptions = ['Coffee\tshop', 'First line\nSecond line', 'C:\\nomad\\list', None]
+            rows = [(id_city, id_attribute, description, value, url)
+                    for (id_city, id_attribute, __, value, url), description in zip(rows, descriptions)]
+
+            BulkLoader(connection).load('city_attributes', rows)
+
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT id_city, id_attribute, description, attribute_value, url FROM city_attributes "
+                               "WHERE url = %s ORDER BY id_attribute;", rows[0][-1])
+                assert [tuple(row) for row in cursor.fetchall()] == rows
+        finally:
+            connection.rollback()
@@ -0,0 +1,70 @@
+import os
+import sqlite3
+import pytest
+from logger import Logger
+from scrapper.city_scrapper import CityScrapper
+from db.climate import ClimateMatrix
+from db.sqlite_storage import SQLiteStorage
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+
+@pytest.fixture
+def stored_city(database):
+    with open(os.path.join(FIXTURES, 'city_page.html'), 'rb') as city_page_file:
+        details = CityScrapper(Logger().logger).get_city_details(city_page_file.read(), {}, {})
+
+    with SQLiteStorage(path=database) as storage:
+        storage.insert_city_info(details)
+
+    return database
+
+
+@pytest.fixture
+def climate(stored_city):
+    with SQLiteStorage(path=stored_city) as storage:
+        return ClimateMatrix.from_storage(storage)
+
+
+def test_the_numbers_of_the_weather_are_stored(climate, database):
+    connection = sqlite3.connect(database)
+    numbers = dict(connection.execute("""
+    SELECT weather.attribute_value, weather.value_number
+    FROM monthly_weathers_attributes weather
+    JOIN attributes attribute ON weather.id_attribute = attribute.id
+    WHERE attribute.name IN ('Feels', 'Air quality', 'Remote workers') AND weather.month_number = 1
+    """))
+    connection.close()
+
+    assert numbers == {'15°C': 15.0, 'US AQI 41': 41.0, '1,204': 1204.0}
+
+
+@pytest.mark.parametrize('conditions,months,cities', [
+    ([('Feels', 15, 22)], [1, 2, 3], [(1, 'Lisbon', 'Portugal', 17.33)]),
+    ([('feels', 20, None), ('Humidity', None, 60)], [3], [(1, 'Lisbon', 'Portugal', 21.0, 58.0)]),
+    ([('Humidity', None, 60)], [1, 3], []),
+    # The air quality of February is missing, so it doesn't match.
+    ([('Air quality', None, 100)], [1, 2], []),
+])
+def test_the_cities_match_the_conditions_in_every_month(stored_city, climate, conditions, months, cities):
+    with SQLiteStorage(path=stored_city) as storage:
+        matching_climate = ClimateMatrix.from_storage(storage, conditions, months)
+
+    assert list(climate.filter_cities_by(conditions, months)) == cities
+    assert list(matching_climate.filter_cities_by(conditions, months)) == cities
+
+
+def test_only_the_values_that_can_match_are_read(stored_city):
+    with SQLiteStorage(path=stored_city) as storage:
+        values = list(storage.get_weather_values([('feels', 16, None), ('Humidity', None, 60)], [1, 3]))
+
+    # Feels is 15°C in January, and the humidity is over 60% in January.
+    assert sorted((attribute, month) for __, attribute, month, __ in values) == [('Feels', 3), ('Humidity', 3)]
+
+
+def test_a_condition_on_a_missing_attribute(stored_city, climate):
+    with pytest.raises(ValueError):
+        list(climate.filter_cities_by([('Snow', 0, 10)]))
+
+    with SQLiteStorage(path=stored_city) as storage, pytest.raises(ValueError):
+        ClimateMatrix.from_storage(storage, [('Snow', 0, 10)])
@@ -0,0 +1,42 @@
+import pymysql
+import pytest
+from db.connection_pool import ConnectionPool
+
+
+class FakeConnection:
+    """Connection whose server can go away. Then, the ping can't open it again, and the connection is closed."""
+
+    def __init__(self):
+        self.open = True
+        self.server_is_up = True
+
+    def ping(self, reconnect=True):
+        if not self.server_is_up:
+            self.open = False
+            raise pymysql.err.OperationalError(2003, "Can't connect to MySQL server")
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.open = False
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(ConnectionPool, '_connect', lambda pool: FakeConnection())
+    with ConnectionPool(size=1) as pool:
+        yield pool
+
+
+def test_a_connection_that_cant_be_opened_again_is_discarded(pool):
+    connection = pool.acquire()
+    pool.release(connection)
+    connection.server_is_up = False
+
+    with pytest.raises(pymysql.err.OperationalError):
+        pool.acquire()
+
+    # The place of the broken connection is free, so the pool opens a new one instead of waiting forever.
+    new_connection = pool.acquire()
+    assert new_connection is not connection and new_connection.open
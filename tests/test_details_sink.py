@@ -0,0 +1,68 @@
+import gzip
+import json
+import zlib
+import pytest
+from scrapper.details_sink import DetailsSink, GZIP_WBITS
+
+
+def line(city):
+    return json.dumps({'url': f"https://nomadlist.com/{city}", 'details': {'city': city}}) + '\n'
+
+
+def save(path, *cities):
+    with DetailsSink(path=path) as sink:
+        for city in cities:
+            sink.write(f"https://nomadlist.com/{city}", {'city': city})
+
+
+def append_killed_run(path, *cities):
+    """Appends the member of a run killed while writing the last city: its lines were flushed, but not finished."""
+    compressor = zlib.compressobj(wbits=GZIP_WBITS)
+    data = compressor.compress(''.join(map(line, cities)).encode('utf-8'))
+    data += compressor.compress(line('killed')[:20].encode('utf-8')) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    with open(path, 'ab') as details_file:
+        details_file.write(data)
+
+
+def read(path, chunk_size=2):
+    return [details['city'] for __, details in DetailsSink(path=path).read(decoders=1, chunk_size=chunk_size)]
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'details.jsonl.gz')
+
+
+def test_the_runs_are_read_in_order(path):
+    save(path, 'lisbon', 'porto', 'madeira')
+    save(path, 'bangkok')
+
+    assert read(path) == ['lisbon', 'porto', 'madeira', 'bangkok']
+
+
+def test_the_complete_lines_of_a_killed_run_are_read(path):
+    save(path, 'lisbon', 'porto')
+    append_killed_run(path, 'bangkok', 'canggu', 'tbilisi')
+
+    assert read(path) == ['lisbon', 'porto', 'bangkok', 'canggu', 'tbilisi']
+
+
+def test_a_run_after_a_killed_one_keeps_its_lines(path):
+    save(path, 'lisbon')
+    append_killed_run(path, 'bangkok', 'canggu')
+    save(path, 'tbilisi')
+
+    assert read(path) == ['lisbon', 'bangkok', 'canggu', 'tbilisi']
+    with gzip.open(path, 'rt', encoding='utf-8') as details_file:
+        assert details_file.read() == ''.join(map(line, ['lisbon', 'bangkok', 'canggu', 'tbilisi']))
+
+
+def test_a_corrupt_file_is_read_until_the_corrupt_part_and_not_appended(path):
+    save(path, 'lisbon', 'porto', 'madeira')
+    with open(path, 'ab') as details_file:
+        details_file.write(b'\x1f\x8b\x08\x00not a deflate stream')
+
+    assert read(path) == ['lisbon', 'porto', 'madeira']
+    with pytest.raises(ValueError):
+        save(path, 'bangkok')
@@ -0,0 +1,111 @@
+import collections
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import pytest
+from requests import RequestException
+from scrapper.fetcher import AsyncFetcher
+from scrapper.http_cache import HttpCache
+
+
+class CityPageHandler(BaseHTTPRequestHandler):
+    """Serves a page for each path, with an ETag. Counts the statuses of each path, and answers 304 to a valid ETag."""
+
+    statuses = collections.Counter()
+    lock = threading.Lock()
+
+    def do_GET(self):
+        body = f"<html>{self.path}</html>".encode()
+        etag = f'"{self.path}"'
+        status = 304 if self.headers.get('If-None-Match') == etag else 200
+        with self.lock:
+            self.statuses[self.path, status] += 1
+
+        self.send_response(status)
+        self.send_header('ETag', etag)
+        if status == 304:
+            self.end_headers()
+            return
+
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope='module')
+def server_url():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), CityPageHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+def test_fetch_yields_every_response(server_url):
+    urls = [f"{server_url}/city-{i}" for i in range(10)]
+
+    responses = list(AsyncFetcher(concurrency=3).fetch(urls))
+
+    assert sorted(response.url for response in responses) == sorted(urls)
+    assert all(response.status_code == 200 for response in responses)
+
+
+def test_failed_requests_are_yielded_as_failures(server_url):
+    unreachable_url = 'http://127.0.0.1:1/city'
+
+    responses = {response.url: response
+                 for response in AsyncFetcher(concurrency=2).fetch([f"{server_url}/city", unreachable_url])}
+
+    assert responses[f"{server_url}/city"].status_code == 200
+    with pytest.raises(RequestException):
+        responses[unreachable_url].raise_for_status()
+
+
+def test_stopping_the_consumer_stops_the_event_loop(server_url):
+    threads = set(threading.enumerate())
+    fetched = AsyncFetcher(concurrency=2).fetch(f"{server_url}/city-{i}" for i in range(100))
+    next(fetched)
+
+    # The workers are waiting for room in the responses queue. Closing the generator must stop them.
+    closer = threading.Thread(target=fetched.close)
+    closer.start()
+    closer.join(timeout=5)
+
+    assert not closer.is_alive()
+    assert set(threading.enumerate()) - threads == set()
+
+
+def fetch_with_cache(cache, url):
+    response, = AsyncFetcher(concurrency=1, cache=cache).fetch([url])
+    return response
+
+
+def test_a_fresh_page_is_served_from_the_cache(server_url, tmp_path):
+    cache = HttpCache(directory=str(tmp_path), ttl=60)
+
+    responses = [fetch_with_cache(cache, f"{server_url}/fresh-city") for _ in range(2)]
+
+    assert all((response.status_code, response.content) == (200, b"<html>/fresh-city</html>") for response in responses)
+    assert CityPageHandler.statuses['/fresh-city', 200] == 1
+
+
+def test_a_stale_page_is_revalidated(server_url, tmp_path):
+    # Every entry is stale, so each fetch asks the server if the page changed.
+    cache = HttpCache(directory=str(tmp_path), ttl=0)
+
+    responses = [fetch_with_cache(cache, f"{server_url}/stale-city") for _ in range(2)]
+
+    assert all((response.status_code, response.content) == (200, b"<html>/stale-city</html>") for response in responses)
+    assert CityPageHandler.statuses['/stale-city', 200] == 1
+    assert CityPageHandler.statuses['/stale-city', 304] == 1
+
+
+def test_a_fetched_page_is_stored_with_its_etag(server_url, tmp_path):
+    cache = HttpCache(directory=str(tmp_path), ttl=60)
+
+    fetch_with_cache(cache, f"{server_url}/new-city")
+    entry = cache.get(f"{server_url}/new-city")
+
+    assert (entry.body, entry.etag) == (b"<html>/new-city</html>", '"/new-city"')
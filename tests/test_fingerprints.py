@@ -0,0 +1,45 @@
+from scrapper.fingerprints import CityFingerprints
+
+WEATHER = {'Real': [('Jan', '15°C', 'Cool'), ('Feb', '16°C', 'Cool')],
+           'Humidity': [('Jan', '78%', 'Humid'), ('Feb', '75%', 'Humid')]}
+# Costs as the scrapper returned them before it parsed their values: (text, None, url).
+COST_OF_LIVING = {'Nomad cost': ('$2,352 / mo', None, '/cost-of-living/in/lisbon'),
+                  'Coffee': ('$1.50', None, None)}
+
+
+def with_numbers(weather):
+    return {attribute: [(*entry, float(entry[1].rstrip('°C%'))) for entry in entries]
+            for attribute, entries in weather.items()}
+
+
+def test_the_parsed_numbers_dont_change_the_weather_hash():
+    hashes = CityFingerprints.tabs_hashes({'Weather': WEATHER})
+
+    assert CityFingerprints.tabs_hashes({'Weather': with_numbers(WEATHER)}) == hashes
+
+
+def test_a_changed_text_changes_the_weather_hash():
+    changed_weather = {**WEATHER, 'Real': [('Jan', '15°C', 'Cool'), ('Feb', '17°C', 'Cool')]}
+
+    hashes = CityFingerprints.tabs_hashes({'Weather': with_numbers(WEATHER)})
+    changed_hashes = CityFingerprints.tabs_hashes({'Weather': with_numbers(changed_weather)})
+
+    assert changed_hashes['Weather'] != hashes['Weather']
+    assert {tab for tab in hashes if changed_hashes[tab] != hashes[tab]} == {'Weather'}
+
+
+def test_the_parsed_costs_dont_change_the_cost_of_living_hash():
+    hashes = CityFingerprints.tabs_hashes({'CostOfLiving': COST_OF_LIVING})
+    parsed_cost_of_living = {'Nomad cost': ('$2,352 / mo', 2352.0, '/cost-of-living/in/lisbon'),
+                             'Coffee': ('$1.50', 1.5, None)}
+
+    assert CityFingerprints.tabs_hashes({'CostOfLiving': parsed_cost_of_living}) == hashes
+
+
+def test_a_changed_url_changes_the_cost_of_living_hash():
+    changed_cost_of_living = {**COST_OF_LIVING, 'Coffee': ('$1.50', None, '/cost-of-living/in/porto')}
+
+    hashes = CityFingerprints.tabs_hashes({'CostOfLiving': COST_OF_LIVING})
+    changed_hashes = CityFingerprints.tabs_hashes({'CostOfLiving': changed_cost_of_living})
+
+    assert {tab for tab in hashes if changed_hashes[tab] != hashes[tab]} == {'CostOfLiving'}
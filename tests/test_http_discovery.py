@@ -0,0 +1,139 @@
+import os
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+import pytest
+import scrapper.nomad_list_scrapper as nomad_list_scrapper
+from scrapper.http_discovery import HttpDiscovery
+from scrapper.nomad_list_scrapper import NomadListScrapper
+from scrapper.soup import make_soup, CITIES_LIST_STRAINER
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+
+def read_fixture(name):
+    with open(os.path.join(FIXTURES, name), 'rb') as fixture_file:
+        return fixture_file.read()
+
+
+class ListingHandler(BaseHTTPRequestHandler):
+    """Serves the recorded pages of the listing. /empty serves a listing without cities."""
+
+    requested_pages = []
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        page = parse_qs(url.query).get('page', ['1'])[0]
+        self.requested_pages.append(page)
+
+        name = f"listing_page_{page}.html"
+        if url.path.startswith('/empty') or not os.path.exists(os.path.join(FIXTURES, name)):
+            name = 'listing_page_empty.html'
+
+        body = read_fixture(name)
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope='module')
+def server_url():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), ListingHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+@pytest.fixture
+def requested_pages():
+    ListingHandler.requested_pages.clear()
+    return ListingHandler.requested_pages
+
+
+def slugs(lis):
+    return [li.attrs['data-slug'] for li in lis]
+
+
+def test_discovery_follows_the_pages_until_no_new_cities(server_url, requested_pages):
+    discovery = HttpDiscovery(listing_url=f"{server_url}/?page={{page}}")
+
+    # The third page only has cities of the previous pages, so it's the last one.
+    assert slugs(discovery.iter_cities_lis()) == ['lisbon', 'canggu', 'bangkok', '{slugName}', 'mexico-city',
+                                                  'berlin']
+    assert requested_pages == ['1', '2', '3']
+
+
+def test_discovery_skips_the_duplicated_slugs(server_url, requested_pages):
+    lis = list(HttpDiscovery(listing_url=f"{server_url}/?page={{page}}").iter_cities_lis())
+
+    assert len(slugs(lis)) == len(set(slugs(lis)))
+    assert all(li.attrs['data-type'] == 'city' for li in lis)
+
+
+def test_discovery_stops_at_the_number_of_cities_and_scrolls(server_url, requested_pages):
+    listing_url = f"{server_url}/?page={{page}}"
+
+    assert slugs(HttpDiscovery(listing_url=listing_url).iter_cities_lis(num_of_cities=2)) == ['lisbon', 'canggu']
+    assert requested_pages == ['1']
+
+    requested_pages.clear()
+    assert slugs(HttpDiscovery(listing_url=listing_url).iter_cities_lis(scrolls=0)) == ['lisbon', 'canggu', 'bangkok',
+                                                                                       '{slugName}']
+    assert requested_pages == ['1']
+
+
+class FakeWebDriver:
+    """Web driver that yields the cities of the first recorded page, as if the browser scrolled the home page."""
+
+    def __init__(self):
+        self.closed = False
+
+    def iter_cities_lis(self, num_of_cities=None, scrolls=None):
+        yield from make_soup(read_fixture('listing_page_1.html'), parse_only=CITIES_LIST_STRAINER).find_all('li')
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def web_driver():
+    return FakeWebDriver()
+
+
+@pytest.fixture
+def nomad_list(monkeypatch, web_driver):
+    monkeypatch.setattr(nomad_list_scrapper, 'SHOULD_USE_THE_HTML_FILE', False)
+    return NomadListScrapper(web_driver=web_driver)
+
+
+def use_listing(monkeypatch, listing_url):
+    monkeypatch.setattr(nomad_list_scrapper, 'HttpDiscovery',
+                        lambda logger: HttpDiscovery(logger, listing_url=listing_url))
+
+
+def test_an_empty_listing_falls_back_to_the_web_driver(server_url, requested_pages, nomad_list, web_driver,
+                                                       monkeypatch):
+    use_listing(monkeypatch, f"{server_url}/empty/?page={{page}}")
+
+    urls = list(nomad_list._discover_cities_urls(discovery='http'))
+
+    assert requested_pages == ['1']
+    # The template li is not a valid city, so it has no url.
+    assert urls == ['https://nomadlist.com/lisbon', 'https://nomadlist.com/canggu', 'https://nomadlist.com/bangkok']
+    assert web_driver.closed
+
+
+def test_the_http_discovery_does_not_use_the_web_driver(server_url, requested_pages, nomad_list, monkeypatch):
+    use_listing(monkeypatch, f"{server_url}/?page={{page}}")
+    monkeypatch.setattr(FakeWebDriver, 'iter_cities_lis', lambda *args: pytest.fail("The web driver was used."))
+
+    urls = list(nomad_list._discover_cities_urls(discovery='http'))
+
+    assert urls == [f"https://nomadlist.com/{slug}" for slug in ['lisbon', 'canggu', 'bangkok', 'mexico-city',
+                                                                  'berlin']]
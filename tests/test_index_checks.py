@@ -0,0 +1,50 @@
+from logger import Logger
+from db.index_checks import INDEX_CHECKS, check_indexes
+from db.migrator import split_statements
+from db.sqlite_storage import SQLiteStorage
+
+
+def test_the_queries_use_their_indexes(database):
+    with SQLiteStorage(path=database) as storage:
+        results = storage.check_indexes()
+
+    assert [result['index'] for result in results] == [check['index'] for check in INDEX_CHECKS]
+    assert all(result['status'] == 'used' and result['key'] == result['index'] for result in results)
+
+
+def test_the_status_of_the_mysql_plans():
+    # Rows of the EXPLAIN of MySQL of each query: the chosen key, or a possible one, or a MAX() optimized away.
+    plans = {
+        'idx_attributes_tab_name': [{'key': 'idx_attributes_tab_name', 'possible_keys': 'idx_attributes_tab_name',
+                                     'Extra': 'Using where'}],
+        'idx_reviews_city_published_date': [{'key': None, 'possible_keys': None,
+                                             'Extra': 'Select tables optimized away'}],
+        'idx_cities_rank': [{'key': None, 'possible_keys': 'idx_cities_rank', 'Extra': 'Using filesort'}],
+    }
+
+    def explain(query, params):
+        check, = [check for check in INDEX_CHECKS if check['query'] == query]
+        return plans.get(check['index'], [{'key': None, 'possible_keys': None, 'Extra': 'Using where'}])
+
+    statuses = {result['index']: result['status'] for result in check_indexes(explain, Logger().logger)}
+
+    assert statuses == {'idx_attributes_tab_name': 'used',
+                        'idx_reviews_city_published_date': 'used',
+                        'idx_cities_rank': 'possible',
+                        'idx_cities_relationships_related_city': 'missing',
+                        'idx_runs_cities_run_state': 'missing',
+                        'idx_monthly_weathers_attribute_month_value': 'missing'}
+
+
+def test_the_statements_of_a_migration():
+    script = """
+    -- The comment lines are skipped; the statements can span many lines.
+    CREATE INDEX idx_cities_rank ON cities (city_rank);
+    ALTER TABLE reviews
+      ADD INDEX idx_reviews_city_published_date (id_city, published_date);
+    """
+
+    assert split_statements(script) == [
+        'CREATE INDEX idx_cities_rank ON cities (city_rank)',
+        'ALTER TABLE reviews\n      ADD INDEX idx_reviews_city_published_date (id_city, published_date)',
+    ]
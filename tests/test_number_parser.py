@@ -0,0 +1,28 @@
+import subprocess
+import sys
+import pytest
+from bs4 import BeautifulSoup
+from scrapper.number_parser import to_number
+from conftest import ROOT
+
+
+@pytest.mark.parametrize('value, number', [
+    ('25°C', 25.0),
+    ('−3°C', -3.0),
+    ('US AQI 41', 41.0),
+    ('$2,352 / mo', 2352.0),
+    ('$1.50', 1.5),
+    ('Cheap', None),
+    (None, None),
+    (7, 7.0),
+    (BeautifulSoup('<span>70%</span>', 'html.parser').span, 70.0),
+])
+def test_the_first_number_of_a_value(value, number):
+    assert to_number(value) == number
+
+
+def test_the_scrapper_doesnt_import_the_database_layer():
+    code = "import sys, scrapper.tab_scrapper; print(sorted({'numpy', 'db.climate', 'db.storage'} & set(sys.modules)))"
+    output = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, check=True).stdout
+
+    assert output.strip() == '[]'
@@ -0,0 +1,74 @@
+import multiprocessing
+import pytest
+from scrapper.page_archive import PageArchive
+
+PAGES = 50
+# Pages stored by each process at the same time as the other ones.
+PAGES_PER_PROCESS = 500
+
+
+@pytest.fixture
+def directory(tmp_path):
+    return str(tmp_path / 'page_archive')
+
+
+def page(url, version=0):
+    return f"<html><body>{url} - version {version}</body></html>".encode()
+
+
+def test_the_stored_pages_are_read_again(directory):
+    urls = [f"https://nomadlist.com/city-{i}" for i in range(PAGES)]
+    with PageArchive(directory=directory) as archive:
+        for url in urls:
+            archive.store(url, page(url).decode())
+
+    with PageArchive(directory=directory) as archive:
+        assert len(archive) == PAGES
+        assert all(archive.get(url) == page(url) for url in urls)
+        assert archive.get('https://nomadlist.com/missing') is None
+
+
+def test_the_pages_stored_after_mapping_the_segment_are_read(directory):
+    with PageArchive(directory=directory) as archive:
+        archive.store('https://nomadlist.com/lisbon', page('lisbon'))
+        assert archive.get('https://nomadlist.com/lisbon') == page('lisbon')
+
+        # The segment grew after it was mapped, so it's mapped again.
+        archive.store('https://nomadlist.com/porto', page('porto'))
+        assert archive.get('https://nomadlist.com/porto') == page('porto')
+
+
+def test_the_snapshot_has_the_last_version_until_its_time(directory):
+    with PageArchive(directory=directory) as archive:
+        archive.store('https://nomadlist.com/lisbon', page('lisbon', 1), fetched_at=100)
+        archive.store('https://nomadlist.com/lisbon', page('lisbon', 2), fetched_at=200)
+        archive.store('https://nomadlist.com/porto', page('porto', 1), fetched_at=150)
+
+        versions = {url: archive.read(offset, size) for url, __, offset, size in archive.snapshot(at=160)}
+        latest_versions = {url: archive.read(offset, size) for url, __, offset, size in archive.snapshot()}
+
+        assert versions == {'https://nomadlist.com/lisbon': page('lisbon', 1),
+                            'https://nomadlist.com/porto': page('porto', 1)}
+        assert latest_versions['https://nomadlist.com/lisbon'] == page('lisbon', 2)
+        assert archive.snapshot(at=50) == []
+        assert archive.get('https://nomadlist.com/lisbon', at=150) == page('lisbon', 1)
+
+
+def store_pages(directory, worker):
+    with PageArchive(directory=directory) as archive:
+        for i in range(PAGES_PER_PROCESS):
+            url = f"https://nomadlist.com/worker-{worker}-city-{i}"
+            archive.store(url, page(url))
+
+
+def test_many_processes_store_pages_in_the_same_archive(directory):
+    context = multiprocessing.get_context('fork')
+    workers = [context.Process(target=store_pages, args=(directory, worker)) for worker in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    with PageArchive(directory=directory) as archive:
+        assert len(archive) == 4 * PAGES_PER_PROCESS
+        assert all(archive.read(offset, size) == page(url) for url, __, offset, size in archive.snapshot())
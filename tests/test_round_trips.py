@@ -0,0 +1,109 @@
+import pytest
+from db import sqlite_storage
+from db.sqlite_storage import SQLiteStorage, SQLiteConnection, SQLiteCursor
+
+ROWS = 50
+
+
+class CountingSQLiteCursor(SQLiteCursor):
+    """Cursor that counts its statements in its connection. Each one would be a round trip to MySQL."""
+
+    def execute(self, query, params=None):
+        self.connection.round_trips += 1
+        return super().execute(query, params)
+
+    def executemany(self, query, values):
+        self.connection.round_trips += 1
+        return super().executemany(query, values)
+
+
+class CountingSQLiteConnection(SQLiteConnection):
+    """
+    Connection that counts the commands that the CountingConnection would send to MySQL: statements, commits and
+    rollbacks. The storages share the same statements, so the counts are the ones of the MySQL connector.
+    """
+
+    def cursor(self, factory=CountingSQLiteCursor):
+        return super().cursor(factory)
+
+    def commit(self):
+        self.round_trips += 1
+        return super().commit()
+
+    def rollback(self):
+        self.round_trips += 1
+        return super().rollback()
+
+
+@pytest.fixture
+def storage(database, monkeypatch):
+    monkeypatch.setattr(sqlite_storage, 'SQLiteConnection', CountingSQLiteConnection)
+    with SQLiteStorage(path=database) as storage:
+        yield storage
+
+
+def count_round_trips(storage, function, *args, **kwargs):
+    before = storage.round_trips
+    function(*args, **kwargs)
+    return storage.round_trips - before
+
+
+def upsert_and_get_id_row_by_row(storage, table, values_dict, domain_identifier):
+    """
+    Copy of the per-row upsert that _upsert_and_get_ids replaced, in the dialect of SQLite: a SELECT of the row,
+    and then an UPDATE if a column changed, or an INSERT if the row is new.
+    """
+    columns = ', '.join(values_dict.keys())
+    values_tuple = tuple(values_dict.values())
+
+    with storage._connection.cursor() as cursor:
+        cursor.execute(f"SELECT id, {columns} FROM {table} WHERE {domain_identifier} = %s;",
+                       values_dict[domain_identifier])
+        result = cursor.fetchone()
+
+        if result:
+            row_id, *other_values = result
+            if any(other_value != values_tuple[i] for i, other_value in enumerate(other_values)):
+                cursor.execute(f"UPDATE OR IGNORE {table} SET {', '.join(f'{key} = %s' for key in values_dict)} "
+                               f"WHERE id = {row_id}", values_tuple)
+            return row_id
+
+        cursor.execute(f"INSERT OR IGNORE INTO {table} ({columns}) "
+                       f"VALUES ({', '.join(['%s'] * len(values_dict))})", values_tuple)
+        return cursor.lastrowid
+
+
+def test_upserting_many_rows_takes_the_round_trips_of_one(storage):
+    old_rows = [{'name': f"Continent {i}"} for i in range(ROWS)]
+    new_rows = [{'name': f"New continent {i}"} for i in range(ROWS)]
+
+    row_by_row = sum(count_round_trips(storage, upsert_and_get_id_row_by_row, storage, 'continents', row, 'name')
+                     for row in old_rows)
+    set_based = count_round_trips(storage, storage._upsert_and_get_ids, 'continents', new_rows)
+
+    # Each new row took a SELECT and an INSERT; the set-based path takes one upsert and one SELECT of the ids,
+    # whatever the number of rows.
+    assert row_by_row == 2 * ROWS
+    assert set_based == 2
+
+    # The rows exist now, as in an incremental run: the old path still selects each row.
+    row_by_row = sum(count_round_trips(storage, upsert_and_get_id_row_by_row, storage, 'continents', row, 'name')
+                     for row in new_rows)
+    set_based = count_round_trips(storage, storage._upsert_and_get_ids, 'continents', old_rows)
+
+    assert row_by_row == ROWS
+    assert set_based == 2
+
+
+def test_the_known_ids_are_not_selected(storage):
+    rows = [{'name': f"Continent {i}"} for i in range(ROWS)]
+    known_ids = storage._upsert_and_get_ids('continents', rows)
+
+    assert count_round_trips(storage, storage._upsert_and_get_ids, 'continents', rows, known_ids=known_ids) == 1
+
+
+def test_warming_the_caches_takes_one_round_trip_per_table(storage):
+    storage._upsert_and_get_ids('continents', [{'name': f"Continent {i}"} for i in range(ROWS)])
+
+    assert count_round_trips(storage, storage._warm_caches) == len(storage._get_caches())
+    assert len(storage.continents_cache) == ROWS
@@ -0,0 +1,105 @@
+import os
+import sqlite3
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import pytest
+import requests
+from apis.aviation_stack import AviationStackAPI
+from db.run_journal import RunJournal
+from scrapper.fetcher import get_request_url
+from scrapper.nomad_list_scrapper import NomadListScrapper
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+
+class CityPageHandler(BaseHTTPRequestHandler):
+    """Serves the fixture city page. The old urls redirect to the new ones, as when a city is renamed."""
+
+    def do_GET(self):
+        if self.path.startswith('/old-'):
+            self.send_response(301)
+            self.send_header('Location', self.path.replace('/old-', '/new-', 1))
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        with open(os.path.join(FIXTURES, 'city_page.html'), 'rb') as city_page_file:
+            body = city_page_file.read()
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope='module')
+def server_url():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), CityPageHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+@pytest.fixture
+def nomad_list(monkeypatch):
+    monkeypatch.setattr(AviationStackAPI, 'countries', lambda self: {})
+    monkeypatch.setattr(AviationStackAPI, 'cities', lambda self: {})
+    return NomadListScrapper()
+
+
+def test_the_request_url_of_a_redirected_response(server_url):
+    response = requests.get(f"{server_url}/old-lisbon")
+
+    assert response.url == f"{server_url}/new-lisbon"
+    assert get_request_url(response) == f"{server_url}/old-lisbon"
+
+
+@pytest.mark.parametrize('pipeline', [False, True])
+def test_the_redirected_cities_finish_the_run(database, server_url, nomad_list, pipeline):
+    urls = [f"{server_url}/old-lisbon", f"{server_url}/lisbon"]
+
+    with RunJournal() as journal:
+        nomad_list._scrap_cities_urls(journal.track(urls), journal, pool=None, fetch_backend='asyncio',
+                                      pipeline=pipeline, parsers=1)
+
+    connection = sqlite3.connect(database)
+    states = dict(connection.execute("SELECT url, state FROM runs_cities WHERE id_run = ?", (journal.id_run,)))
+    (finished_on,) = connection.execute("SELECT finished_on FROM runs WHERE id = ?", (journal.id_run,)).fetchone()
+
+    assert states == {url: RunJournal.STORED for url in urls}
+    assert finished_on is not None
+
+    with RunJournal(id_run=journal.id_run) as resumed_journal:
+        assert resumed_journal.get_unfinished_urls() == []
+
+
+def get_states(database, id_run):
+    connection = sqlite3.connect(database)
+    try:
+        return dict(connection.execute("SELECT url, state FROM runs_cities WHERE id_run = ?", (id_run,)))
+    finally:
+        connection.close()
+
+
+def test_a_killed_run_is_resumed_with_every_tracked_url(database):
+    urls = [f"https://nomadlist.com/city-{i}" for i in range(3)]
+
+    with RunJournal() as journal:
+        tracked = journal.track(urls)
+        # The run is killed while it processes the second url.
+        first_urls = [next(tracked), next(tracked)]
+        states = get_states(database, journal.id_run)
+
+    assert states == {url: RunJournal.PENDING for url in first_urls}
+
+    with RunJournal(id_run=journal.id_run) as resumed_journal:
+        assert resumed_journal.get_unfinished_urls() == first_urls
+
+
+def test_a_missing_run_cant_be_resumed(database):
+    with pytest.raises(ValueError):
+        with RunJournal(id_run=100):
+            pass
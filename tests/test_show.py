@@ -0,0 +1,122 @@
+import os
+import sqlite3
+import pytest
+from logger import Logger
+from scrapper.city_scrapper import CityScrapper
+from db.snapshot import CitySnapshot
+from db.sqlite_storage import SQLiteStorage
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+# Cities of the city_scores summary (id, rank, name, cost, overall score value), with repeated ranks and values, and
+# missing ones.
+CITIES = [
+    (1, 3, 'Lisbon', '$2,000', 4.5),
+    (2, 1, 'Bangkok', '$1,500', 4.8),
+    (3, 3, 'Porto', '$2,000', 4.5),
+    (4, None, 'Madeira', None, None),
+    (5, 2, 'Canggu', '$1,800', 4.8),
+    (6, 3, 'Valencia', '$2,000', None),
+    (7, None, 'Tbilisi', '$1,200', 4.1),
+    (8, 2, 'Chiang Mai', None, 4.8),
+]
+PAGE_SIZE = 3
+
+
+def get_city_details():
+    with open(os.path.join(FIXTURES, 'city_page.html'), 'rb') as city_page_file:
+        return CityScrapper(Logger().logger).get_city_details(city_page_file.read(), {}, {})
+
+
+@pytest.fixture
+def stored_cities(database):
+    connection = sqlite3.connect(database)
+    with connection:
+        connection.executemany("INSERT INTO cities (id, name, city_rank) VALUES (?, ?, ?)",
+                               [(id_city, name, rank) for id_city, rank, name, __, __ in CITIES])
+        connection.executemany("INSERT INTO city_scores (id_city, city_rank, name, cost, overall_score_value) "
+                               "VALUES (?, ?, ?, ?, ?)", CITIES)
+    connection.close()
+    return database
+
+
+@pytest.fixture
+def snapshot_directory(stored_cities, tmp_path):
+    with SQLiteStorage(path=stored_cities) as storage:
+        CitySnapshot(directory=str(tmp_path)).export(storage)
+    return str(tmp_path)
+
+
+def get_pages(source, **filters):
+    """Pages through the cities with the id of the last city of each page, and returns all of them."""
+    cities, after = [], None
+    while page := list(source.filter_cities_by(num_of_cities=PAGE_SIZE, after=after, **filters)):
+        cities += page
+        after = page[-1][0]
+
+    return cities
+
+
+@pytest.mark.parametrize('order', ['ASC', 'DESC'])
+@pytest.mark.parametrize('sorted_by', ['rank', 'name', 'cost', 'overall score'])
+def test_the_pages_have_every_city_once(stored_cities, snapshot_directory, sorted_by, order):
+    with SQLiteStorage(path=stored_cities) as storage:
+        cities = list(storage.filter_cities_by(sorted_by=sorted_by, order=order))
+        storage_pages = get_pages(storage, sorted_by=sorted_by, order=order)
+
+    with CitySnapshot(directory=snapshot_directory) as snapshot:
+        snapshot_cities = list(snapshot.filter_cities_by(sorted_by=sorted_by, order=order))
+        snapshot_pages = get_pages(snapshot, sorted_by=sorted_by, order=order)
+
+    assert sorted(city[0] for city in cities) == [id_city for id_city, *__ in CITIES]
+    assert storage_pages == cities
+    assert snapshot_cities == cities
+    assert snapshot_pages == cities
+
+
+def test_the_ties_of_the_rank_are_sorted_by_id(stored_cities):
+    with SQLiteStorage(path=stored_cities) as storage:
+        ids = [city[0] for city in storage.filter_cities_by(sorted_by='rank', order='ASC')]
+
+    assert ids == [4, 7, 2, 5, 8, 1, 3, 6]
+
+
+def test_a_missing_city_cant_be_the_last_one(stored_cities):
+    with SQLiteStorage(path=stored_cities) as storage, pytest.raises(ValueError):
+        list(storage.filter_cities_by(after=100, sorted_by='rank', order='ASC'))
+
+
+def test_the_snapshot_filters_by_the_costs_of_the_stored_cities(database, tmp_path):
+    details = get_city_details()
+    with SQLiteStorage(path=database) as storage:
+        storage.insert_city_info(details)
+        CitySnapshot(directory=str(tmp_path)).export(storage)
+
+    with CitySnapshot(directory=str(tmp_path)) as snapshot:
+        costs = list(snapshot.get_values('cost_of_living', 'nomad COST'))
+        cheap_cities = list(snapshot.filter_cities_by(where=['cost_of_living:Nomad cost::2500'], sorted_by='rank',
+                                                      order='ASC'))
+        cheaper_cities = list(snapshot.filter_cities_by(where=['cost_of_living:Nomad cost::2500',
+                                                               'cost_of_living:Coffee:2:'], sorted_by='rank',
+                                                        order='ASC'))
+
+    assert costs == [2352.0]
+    assert [city[2] for city in cheap_cities] == [details['city']]
+    assert cheaper_cities == []
+
+
+def test_a_condition_on_a_missing_attribute(stored_cities, snapshot_directory):
+    with CitySnapshot(directory=snapshot_directory) as snapshot, pytest.raises(ValueError):
+        list(snapshot.filter_cities_by(where=['cost_of_living:Rent::1000'], sorted_by='rank', order='ASC'))
+
+
+def test_the_snapshot_filters_by_rank(stored_cities, snapshot_directory):
+    filters = {'rank_from': 2, 'rank_to': 3, 'sorted_by': 'rank', 'order': 'DESC'}
+    with SQLiteStorage(path=stored_cities) as storage:
+        cities = list(storage.filter_cities_by(**filters))
+
+    with CitySnapshot(directory=snapshot_directory) as snapshot:
+        snapshot_cities = list(snapshot.filter_cities_by(**filters))
+
+    assert sorted(city[2] for city in cities) == sorted(name for __, rank, name, __, __ in CITIES if rank in (2, 3))
+    assert snapshot_cities == cities
@@ -0,0 +1,44 @@
+import logging
+import os
+import pytest
+from scrapper.city_scrapper import CityScrapper
+from scrapper.soup import make_soup, CITY_DETAILS_STRAINER
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+logger = logging.getLogger(__name__)
+
+
+@pytest.fixture(scope='module')
+def city_page_html():
+    with open(os.path.join(FIXTURES, 'city_page.html'), 'rb') as city_page_file:
+        return city_page_file.read()
+
+
+@pytest.fixture(scope='module')
+def html_parser_details(city_page_html):
+    """Details parsed as before the restricted parse: the whole page with the html.parser."""
+    return CityScrapper(logger, parser='html.parser', restricted_parse=False).get_city_details(city_page_html, {}, {})
+
+
+def test_the_fixture_has_every_tab(html_parser_details):
+    assert html_parser_details['city'] == 'Lisbon'
+    assert html_parser_details['rank'] == 1
+    assert {'Scores', 'DigitalNomadGuide', 'CostOfLiving', 'ProsAndCons', 'Reviews', 'Weather', 'Photos', 'Near',
+            'Next', 'Similar'} <= html_parser_details.keys()
+
+
+@pytest.mark.parametrize('parser,restricted_parse', [('lxml', True), ('lxml', False), ('html.parser', True)])
+def test_parsers_have_the_same_details(city_page_html, html_parser_details, parser, restricted_parse):
+    details = CityScrapper(logger, parser=parser, restricted_parse=restricted_parse).get_city_details(city_page_html,
+                                                                                                    {}, {})
+
+    assert details == html_parser_details
+
+
+def test_the_strainer_skips_the_rest_of_the_page(city_page_html):
+    soup = make_soup(city_page_html, parse_only=CITY_DETAILS_STRAINER, parser='lxml')
+
+    assert soup.find('script') is None
+    assert soup.find('nav') is None
+    assert soup.find(class_='text').h1.text == 'Lisbon'
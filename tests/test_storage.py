@@ -0,0 +1,76 @@
+import os
+import sqlite3
+from logger import Logger
+from scrapper.city_scrapper import CityScrapper
+from db.sqlite_storage import SQLiteStorage
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+CITY_TABLES = ['cities', 'city_attributes', 'monthly_weathers_attributes', 'reviews']
+
+
+def get_city_details():
+    with open(os.path.join(FIXTURES, 'city_page.html'), 'rb') as city_page_file:
+        return CityScrapper(Logger().logger).get_city_details(city_page_file.read(), {}, {})
+
+
+def count_rows(database, table):
+    connection = sqlite3.connect(database)
+    try:
+        (count,) = connection.execute(f"SELECT COUNT(*) FROM {table}").fetchone()
+        return count
+    finally:
+        connection.close()
+
+
+def test_a_stored_city_is_shown(database):
+    details = get_city_details()
+
+    with SQLiteStorage() as storage:
+        storage.insert_city_info(details)
+        cities = list(storage.filter_cities_by(sorted_by='rank', order='ASC'))
+
+    assert [city[1:4] for city in cities] == [(details['rank'], details['city'], details['country']['name'])]
+
+
+def test_storing_a_city_again_updates_its_rows(database):
+    details = get_city_details()
+
+    with SQLiteStorage() as storage:
+        storage.insert_city_info(details)
+        counts = {table: count_rows(database, table) for table in CITY_TABLES}
+        storage.insert_city_info(details)
+
+    assert {table: count_rows(database, table) for table in CITY_TABLES} == counts
+    assert all(counts.values())
+
+
+def test_a_city_twice_in_a_batch_stores_its_reviews_once(database):
+    details = get_city_details()
+
+    with SQLiteStorage() as storage:
+        ids = storage.insert_cities_info([details, details])
+
+    assert ids[0] == ids[1]
+    assert count_rows(database, 'reviews') == len(details['Reviews'])
+
+
+def test_the_costs_saved_without_values_are_parsed(database):
+    details = get_city_details()
+    # The details saved before the scrapper parsed the costs have no values.
+    details['CostOfLiving'] = {key: [description, None, url]
+                               for key, (description, __, url) in details['CostOfLiving'].items()}
+
+    with SQLiteStorage() as storage:
+        storage.insert_city_info(details)
+
+    connection = sqlite3.connect(database)
+    costs = dict(connection.execute("""
+    SELECT attribute.name, city_attribute.attribute_value
+    FROM city_attributes city_attribute
+    JOIN attributes attribute ON attribute.id = city_attribute.id_attribute
+    JOIN tabs tab ON tab.id = attribute.id_tab
+    WHERE tab.name = 'Cost of Living'
+    """))
+    connection.close()
+
+    assert costs == {'Nomad cost': 2352.0, 'Coworking': 180.0, 'Coffee': 1.5, 'Beer': None}
@@ -0,0 +1,113 @@
+import collections
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import pytest
+from db.run_journal import RunJournal
+from db.work_queue import WorkQueue
+from conftest import ROOT, FILES_DIRECTORY
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+
+class CityPageHandler(BaseHTTPRequestHandler):
+    """Serves the fixture city page, and counts the requests of each path. The old urls redirect to the new ones."""
+
+    requests = collections.Counter()
+    lock = threading.Lock()
+
+    def do_GET(self):
+        with self.lock:
+            self.requests[self.path] += 1
+
+        if self.path.startswith('/old-'):
+            self.send_response(301)
+            self.send_header('Location', self.path.replace('/old-', '/new-', 1))
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        with open(os.path.join(FIXTURES, 'city_page.html'), 'rb') as city_page_file:
+            body = city_page_file.read()
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server_url():
+    CityPageHandler.requests.clear()
+    server = ThreadingHTTPServer(('127.0.0.1', 0), CityPageHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+def get_states(database):
+    connection = sqlite3.connect(database)
+    try:
+        return {url: (state, attempts)
+                for url, state, attempts in connection.execute("SELECT url, state, attempts FROM work_queue")}
+    finally:
+        connection.close()
+
+
+def test_recording_states_extends_the_lease(database):
+    with WorkQueue(lease_seconds=3) as work_queue:
+        work_queue.enqueue(['https://nomadlist.com/lisbon'])
+        work_queue.lease()
+
+        connection = sqlite3.connect(database)
+        (leased_until,) = connection.execute("SELECT lease_expires_on FROM work_queue").fetchone()
+        time.sleep(1.5)
+        work_queue.record('https://nomadlist.com/lisbon', RunJournal.FETCHED)
+        (extended_until,) = connection.execute("SELECT lease_expires_on FROM work_queue").fetchone()
+        connection.close()
+
+    assert extended_until > leased_until
+
+
+def test_the_redirected_urls_are_done(database):
+    with WorkQueue() as work_queue:
+        work_queue.enqueue(['https://nomadlist.com/old-lisbon'])
+        work_queue.lease()
+        # The scrapper records the requested url, not the one of the redirect.
+        work_queue.record('https://nomadlist.com/old-lisbon', RunJournal.STORED)
+        work_queue.complete()
+
+    assert get_states(database) == {'https://nomadlist.com/old-lisbon': (WorkQueue.DONE, 1)}
+
+
+def test_many_worker_processes_scrap_every_url_once(database, server_url, tmp_path):
+    urls = [f"{server_url}/city-{i}" for i in range(10)] + [f"{server_url}/old-city-{i}" for i in range(4)]
+    with WorkQueue() as work_queue:
+        work_queue.enqueue(urls)
+
+    # The workers read the Aviation Stack info from files, without requests to the API.
+    for resource in ['countries', 'cities']:
+        (tmp_path / f"{resource}.json").write_text(json.dumps({'-': {}}))
+
+    env = {**os.environ,
+           'AVIATION_STACK_COUNTRIES_FILENAME': str(tmp_path / 'countries.json'),
+           'AVIATION_STACK_CITIES_FILENAME': str(tmp_path / 'cities.json'),
+           'NOMAD_LIST_WORK_QUEUE_POLL_INTERVAL': '1'}
+    workers = [subprocess.Popen([sys.executable, 'main.py', 'scrape-worker', '--batch-size', '3',
+                                 '--fetch-backend', 'asyncio'], cwd=ROOT, env=env, stdout=subprocess.DEVNULL)
+               for _ in range(2)]
+
+    for worker in workers:
+        assert worker.wait(timeout=120) == 0
+
+    assert get_states(database) == {url: (WorkQueue.DONE, 1) for url in urls}
+    # Each url was fetched by only one of the workers.
+    assert all(CityPageHandler.requests[url.replace(server_url, '')] == 1 for url in urls)